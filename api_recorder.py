@@ -0,0 +1,207 @@
+# ============================================================
+# MÓDULO: API RECORDER — Proxy que graba respuestas de API-Sports
+# Versión: 1.0 | Compatible con api_standin.py
+# ============================================================
+#
+# Proxy HTTP local entre el bot y API-Sports. Reenvía cada GET al
+# upstream (con la x-apisports-key que manda el bot), devuelve la
+# respuesta tal cual y guarda las de RECORD_PATHS en un directorio
+# de fixtures que api_standin.load_recordings() sabe reproducir:
+#
+#   fixtures/
+#     _meta.json                      {"day": "YYYY-MM-DD", ...}
+#     fixtures/<hash>.json            [grabación, grabación, ...]
+#     odds/<hash>.json
+#     teams_statistics/<hash>.json
+#     ...
+#
+# Un fichero por clave (path + params); si el bot repite la request
+# (p.ej. /odds del partido en el scan y al cierre) las respuestas se
+# añaden en orden y el stand-in las sirve en ese orden.
+#
+# Solo se guardan respuestas 200 sin "errors": un 429 o la cuota
+# agotada del día de grabación no deben reproducirse como si fueran
+# datos. Tampoco se guardan la clave ni las cabeceras de cuota (el
+# stand-in genera las suyas con --rate-per-min / --daily-limit).
+#
+# USO:
+#   python api_recorder.py fixtures/ --port 8098
+#   API_SPORTS_BASE=http://127.0.0.1:8098 python main.py     # un día normal
+#   python api_standin.py fixtures/ --port 8099              # después, offline
+#
+#   # desde un script (ver bench_e2e.py --record):
+#   with Recorder("fixtures/", upstream=api.base) as rec:
+#       os.environ["API_SPORTS_BASE"] = rec.base
+# ============================================================
+
+import os
+import sys
+import json
+import hashlib
+import argparse
+import threading
+from datetime import date, datetime, timezone
+from urllib.parse import urlsplit, parse_qsl
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from api_standin import META_FILE
+
+
+# ── CONSTANTES ───────────────────────────────────────────────
+UPSTREAM     = "https://v3.football.api-sports.io"
+RECORD_PATHS = ("/fixtures", "/odds", "/injuries", "/teams", "/teams/statistics", "/status")
+FORWARD_HEADERS = ("x-apisports-key",)
+QUOTA_HEADERS   = ("x-ratelimit-requests-limit", "x-ratelimit-requests-remaining",
+                   "X-RateLimit-Limit", "X-RateLimit-Remaining")
+TIMEOUT = 20
+
+
+def recording_file(out_dir, path, params):
+    """Fichero de la clave (path, params) dentro del directorio de fixtures."""
+    canon  = json.dumps([path, sorted((str(k), str(v)) for k, v in params.items())])
+    folder = path.strip("/").replace("/", "_") or "root"
+    return os.path.join(out_dir, folder, hashlib.sha1(canon.encode()).hexdigest()[:16] + ".json")
+
+
+class Recorder:
+    def __init__(self, out_dir, upstream=UPSTREAM, host="127.0.0.1", port=0,
+                 paths=RECORD_PATHS):
+        self.out_dir  = out_dir
+        self.upstream = upstream.rstrip("/")
+        self.paths    = set(paths)
+        self.saved    = 0
+        self.skipped  = []          # (path, params, status) no guardados
+        self._seq     = 0
+        self._lock    = threading.Lock()
+        self._open_session()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._thread = None
+
+    def _open_session(self):
+        day  = date.today().isoformat()
+        meta = os.path.join(self.out_dir, META_FILE)
+        if os.path.exists(meta):
+            with open(meta) as f:
+                prev = json.load(f)
+            # mezclar días rompería el desplazamiento de fechas al reproducir
+            if prev.get("day") != day:
+                raise ValueError(f"{self.out_dir} ya tiene una grabación del {prev.get('day')}")
+            self._seq = prev.get("requests", 0)
+        os.makedirs(self.out_dir, exist_ok=True)
+        self._write_meta(day)
+
+    def _write_meta(self, day=None):
+        with open(os.path.join(self.out_dir, META_FILE), "w") as f:
+            json.dump({"day": day or date.today().isoformat(), "upstream": self.upstream,
+                       "requests": self._seq}, f, indent=1)
+
+    @property
+    def base(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _fetch(self, path, params, headers):
+        from http_client import get_session
+        return get_session(self.upstream).get(self.upstream + path, params=params,
+                                              headers=headers, timeout=TIMEOUT)
+
+    def _save(self, path, params, status, body):
+        if path not in self.paths:
+            return
+        errors = body.get("errors") if isinstance(body, dict) else "no JSON"
+        if status != 200 or errors:
+            with self._lock:
+                self.skipped.append((path, params, status))
+            print(f"  ⚠️  recorder: {path} {params} no grabado ({status} {errors})")
+            return
+        name = recording_file(self.out_dir, path, params)
+        with self._lock:
+            self._seq += 1
+            rec = {"path": path, "params": params, "status": status, "seq": self._seq,
+                   "recorded_at": datetime.now(timezone.utc).isoformat(), "body": body}
+            os.makedirs(os.path.dirname(name), exist_ok=True)
+            recs = []
+            if os.path.exists(name):
+                with open(name) as f:
+                    recs = json.load(f)
+            recs.append(rec)
+            with open(name, "w") as f:
+                json.dump(recs, f)
+            self.saved += 1
+            self._write_meta()
+
+    def _handler(self):
+        recorder = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url     = urlsplit(self.path)
+                params  = dict(parse_qsl(url.query))
+                fwd     = {k: self.headers[k] for k in FORWARD_HEADERS if self.headers.get(k)}
+                try:
+                    r = recorder._fetch(url.path, params, fwd)
+                except Exception as e:
+                    payload = json.dumps({"errors": {"recorder": str(e)}, "response": []})
+                    self.send_response(502)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(payload)))
+                    self.end_headers()
+                    self.wfile.write(payload.encode())
+                    return
+                try:
+                    body = r.json()
+                except ValueError:
+                    body = None
+                recorder._save(url.path, params, r.status_code, body)
+                payload = r.content
+                self.send_response(r.status_code)
+                self.send_header("Content-Type",
+                                 r.headers.get("Content-Type", "application/json"))
+                self.send_header("Content-Length", str(len(payload)))
+                for k in QUOTA_HEADERS:
+                    if r.headers.get(k) is not None:
+                        self.send_header(k, r.headers[k])
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Proxy que graba respuestas de API-Sports")
+    ap.add_argument("out_dir", help="directorio de fixtures (se crea si no existe)")
+    ap.add_argument("--upstream", default=UPSTREAM)
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8098)
+    args = ap.parse_args()
+    try:
+        rec = Recorder(args.out_dir, args.upstream, args.host, args.port)
+    except ValueError as e:
+        print(f"  ❌ {e}")
+        sys.exit(1)
+    print(f"  🎙️  Grabando {args.upstream} en {args.out_dir} — proxy en {rec.base}")
+    try:
+        rec._server.serve_forever()
+    except KeyboardInterrupt:
+        rec.stop()
+        print(f"  💾 {rec.saved} respuestas grabadas, {len(rec.skipped)} descartadas")
+        sys.exit(0)
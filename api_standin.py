@@ -0,0 +1,327 @@
+# ============================================================
+# MÓDULO: API STAND-IN — Servidor HTTP local con respuestas grabadas
+# Versión: 1.0 | Compatible con http_client.py
+# ============================================================
+#
+# Sustituto local de API-Sports para probar el bot sin red ni cuota.
+# Sirve respuestas grabadas (JSON) casando método GET + path +
+# parámetros de la query. Lo que no esté grabado devuelve 404 con
+# un cuerpo estilo API-Sports ({"errors": ..., "response": []}).
+#
+# FORMATO DE GRABACIÓN (lista JSON):
+#   [{"path": "/odds",
+#     "params": {"league": "39", "season": "2025", "bookmaker": "8", "page": "1"},
+#     "status": 200, "headers": {...}, "body": {...}}, ...]
+#
+# Varias grabaciones con la misma clave se sirven en orden (la
+# última se repite): así se reproduce /odds de un partido en el scan,
+# a mediodía y al cierre.
+#
+# USO:
+#   # como proceso (fichero JSON o directorio de api_recorder.py):
+#   python api_standin.py recordings/ --port 8099 --delay 0.1 --rate-per-min 10
+#   API_SPORTS_BASE=http://127.0.0.1:8099 TELEGRAM_BASE=http://127.0.0.1:8099 python main.py
+#
+#   # desde un script (ver check_odds_loader.py):
+#   with StandIn(recordings) as api:
+#       os.environ["API_SPORTS_BASE"] = api.base   # antes de importar http_client
+#
+# paged_recordings() trocea una lista de items en páginas con el
+# bloque "paging" que devuelve la API real. load_recordings() lee un
+# directorio grabado por api_recorder.py y mueve sus fechas al día
+# de hoy (el bot pide /fixtures por fecha relativa a hoy).
+#
+# fallback(path, params) → grabación | None responde lo que no esté
+# grabado (mundos sintéticos, ver check_capture_concurrency.py).
+#
+# CONDICIONES DE RED (solo GET, reproducibles con seed):
+#   delay / jitter   latencia fija + uniforme [0, jitter) por respuesta
+#   rate_per_min     ventana de 60 s; al pasarse → 429 como API-Sports.
+#                    Manda X-RateLimit-Limit / -Remaining (las lee
+#                    budget.GOVERNOR)
+#   daily_limit      al agotarse → 200 con {"errors": {"requests": ...}}
+#                    como la API real; manda x-ratelimit-requests-*
+#                    y /status devuelve el contador del stand-in
+#   error_rate       fracción de GET que responden uno de error_statuses
+#                    (500/502/503 → http_client reintenta)
+#   api_error_rate   fracción de GET que responden 200 con "errors"
+#
+# Los POST (Telegram: /bot<token>/sendMessage) responden {"ok": true}
+# y quedan en hits como "/bot/<método>", sin el token.
+# ============================================================
+
+import os
+import re
+import sys
+import json
+import glob
+import time
+import random
+import argparse
+import threading
+from collections import deque
+from datetime import date, timedelta
+from urllib.parse import urlsplit, parse_qsl
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+# ── CONSTANTES ───────────────────────────────────────────────
+META_FILE      = "_meta.json"
+ERROR_STATUSES = (500, 502, 503)
+RATE_WINDOW_S  = 60.0
+
+_DATE_RE = re.compile(r"^\d{4}-\d{2}-\d{2}")
+
+
+def _key(path, params):
+    return path, tuple(sorted((str(k), str(v)) for k, v in (params or {}).items()))
+
+
+def paged_recordings(path, params, items, page_size=10):
+    """Grabaciones de /path paginadas como API-Sports (page=1..N)."""
+    pages = [items[i:i + page_size] for i in range(0, len(items), page_size)] or [[]]
+    out = []
+    for n, chunk in enumerate(pages, start=1):
+        q = {**params, "page": n}
+        out.append({
+            "path": path, "params": q, "status": 200,
+            "body": {"get": path.strip("/"), "parameters": {k: str(v) for k, v in q.items()},
+                     "errors": [], "results": len(chunk),
+                     "paging": {"current": n, "total": len(pages)},
+                     "response": chunk},
+        })
+    return out
+
+
+def shift_dates(obj, days):
+    """Copia de obj con cada string que empieza por YYYY-MM-DD movida `days` días."""
+    if isinstance(obj, dict):
+        return {k: shift_dates(v, days) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [shift_dates(v, days) for v in obj]
+    if isinstance(obj, str) and _DATE_RE.match(obj):
+        try:
+            d = date.fromisoformat(obj[:10]) + timedelta(days=days)
+        except ValueError:
+            return obj
+        return d.isoformat() + obj[10:]
+    return obj
+
+
+def load_recordings(path, today=None):
+    """
+    Grabaciones de un fichero JSON (lista) o de un directorio de
+    api_recorder.py. Si el directorio trae _meta.json, las fechas se
+    mueven para que el día grabado pase a ser `today` (por defecto hoy).
+    """
+    if not os.path.isdir(path):
+        with open(path) as f:
+            return json.load(f)
+    recs = []
+    for name in sorted(glob.glob(os.path.join(path, "**", "*.json"), recursive=True)):
+        if os.path.basename(name) == META_FILE:
+            continue
+        with open(name) as f:
+            recs.extend(json.load(f))
+    recs.sort(key=lambda r: r.get("seq", 0))
+    try:
+        with open(os.path.join(path, META_FILE)) as f:
+            day = date.fromisoformat(json.load(f)["day"])
+    except (OSError, KeyError, ValueError):
+        return recs
+    days = ((today or date.today()) - day).days
+    return [shift_dates(r, days) for r in recs] if days else recs
+
+
+class StandIn:
+    def __init__(self, recordings, host="127.0.0.1", port=0, fallback=None, delay=0.0,
+                 jitter=0.0, rate_per_min=0, daily_limit=0, error_rate=0.0,
+                 api_error_rate=0.0, error_statuses=ERROR_STATUSES, seed=0):
+        self.routes   = {}
+        self.hits     = []          # (path, params, status)
+        self.fallback = fallback
+        self.delay    = delay
+        self.jitter   = jitter
+        self.rate_per_min   = rate_per_min
+        self.daily_limit    = daily_limit
+        self.error_rate     = error_rate
+        self.api_error_rate = api_error_rate
+        self.error_statuses = tuple(error_statuses)
+        self.seed    = seed
+        self._served = {}           # clave → respuestas ya servidas de su secuencia
+        self._tries  = {}           # clave → GET recibidos (sorteo de fallos)
+        self._window = deque()      # instantes de los GET del último minuto
+        self._used   = 0            # GET a la API (cuota diaria)
+        self._lock  = threading.Lock()
+        for rec in recordings:
+            self.add(rec)
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._thread = None
+
+    @property
+    def base(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def add(self, rec):
+        self.routes.setdefault(_key(rec["path"], rec.get("params")), []).append(rec)
+
+    def _lookup(self, path, params):
+        key = _key(path, params)
+        with self._lock:
+            seq = self.routes.get(key)
+            if seq:
+                n = self._served.get(key, 0)
+                self._served[key] = n + 1
+                return seq[min(n, len(seq) - 1)]
+        if self.fallback:
+            return self.fallback(path, params)
+        return None
+
+    def _admit(self, path, params):
+        """
+        Cuenta el GET contra los límites. Devuelve (latencia, fallo, cabeceras):
+        fallo es una respuesta ya hecha (429, cuota, error inyectado) o None.
+        Latencia y fallos se sortean por (seed, request, intento): no
+        dependen del orden en que lleguen los hilos del bot.
+        """
+        now = time.monotonic()
+        key = _key(path, params)
+        with self._lock:
+            n = self._tries.get(key, 0)
+            self._tries[key] = n + 1
+            rnd  = random.Random(f"{self.seed}|{key}|{n}")
+            wait = self.delay + rnd.random() * self.jitter
+            roll, api_roll = rnd.random(), rnd.random()
+            headers = {}
+            if self.rate_per_min:
+                while self._window and now - self._window[0] >= RATE_WINDOW_S:
+                    self._window.popleft()
+                if len(self._window) >= self.rate_per_min:
+                    headers = {"X-RateLimit-Limit": self.rate_per_min, "X-RateLimit-Remaining": 0}
+                    return wait, {"status": 429, "headers": headers, "body": {
+                        "message": f"Too many requests. Your rate limit is "
+                                   f"{self.rate_per_min} requests per minute."}}, headers
+                self._window.append(now)
+                headers["X-RateLimit-Limit"]     = self.rate_per_min
+                headers["X-RateLimit-Remaining"] = self.rate_per_min - len(self._window)
+            if self.daily_limit:
+                if self._used >= self.daily_limit:
+                    headers["x-ratelimit-requests-limit"]     = self.daily_limit
+                    headers["x-ratelimit-requests-remaining"] = 0
+                    return wait, {"status": 200, "headers": headers, "body": {
+                        "errors": {"requests": "You have reached the request limit for the day"},
+                        "response": []}}, headers
+                self._used += 1
+                headers["x-ratelimit-requests-limit"]     = self.daily_limit
+                headers["x-ratelimit-requests-remaining"] = self.daily_limit - self._used
+        if roll < self.error_rate:
+            status = self.error_statuses[int(roll / self.error_rate * len(self.error_statuses))]
+            return wait, {"status": status, "headers": headers, "body": {
+                "errors": {"standin": f"error inyectado {status}"}, "response": []}}, headers
+        if api_roll < self.api_error_rate:
+            return wait, {"status": 200, "headers": headers, "body": {
+                "errors": {"standin": "error API inyectado"}, "response": []}}, headers
+        return wait, None, headers
+
+    def _status_body(self, body):
+        """/status con el contador del stand-in cuando hay cuota diaria."""
+        resp = body.get("response") if isinstance(body, dict) else None
+        if not self.daily_limit or not isinstance(resp, dict):
+            return body
+        return {**body, "response": {**resp, "requests": {"current": self._used,
+                                                          "limit_day": self.daily_limit}}}
+
+    def _handler(self):
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _reply(self, status, headers, body):
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                for k, v in headers.items():
+                    self.send_header(k, str(v))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_GET(self):
+                url    = urlsplit(self.path)
+                params = dict(parse_qsl(url.query))
+                wait, rec, quota = standin._admit(url.path, params)
+                if rec is None:
+                    rec = standin._lookup(url.path, params)
+                if wait:
+                    time.sleep(wait)
+                if rec is None:
+                    status, headers = 404, quota
+                    body = {"errors": {"standin": f"sin grabación para {self.path}"},
+                            "response": []}
+                else:
+                    status  = rec.get("status", 200)
+                    headers = {**(rec.get("headers") or {}), **quota}
+                    body    = rec.get("body", {})
+                    if url.path == "/status":
+                        body = standin._status_body(body)
+                with standin._lock:
+                    standin.hits.append((url.path, params, status))
+                self._reply(status, headers, body)
+
+            def do_POST(self):
+                url    = urlsplit(self.path)
+                length = int(self.headers.get("Content-Length") or 0)
+                if length:
+                    self.rfile.read(length)
+                # /bot<token>/<método> → /bot/<método>: el token no queda en hits
+                path = re.sub(r"^/bot[^/]*", "/bot", url.path)
+                with standin._lock:
+                    standin.hits.append((path, {}, 200))
+                    n = len(standin.hits)
+                self._reply(200, {}, {"ok": True, "result": {"message_id": n}})
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Stand-in local de API-Sports")
+    ap.add_argument("recordings", help="fichero JSON o directorio de api_recorder.py")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8099)
+    ap.add_argument("--delay", type=float, default=0.0, help="latencia fija (s)")
+    ap.add_argument("--jitter", type=float, default=0.0, help="latencia extra aleatoria (s)")
+    ap.add_argument("--rate-per-min", type=int, default=0, help="429 al pasarse (0 = sin límite)")
+    ap.add_argument("--daily-limit", type=int, default=0, help="cuota diaria (0 = sin límite)")
+    ap.add_argument("--error-rate", type=float, default=0.0, help="fracción de 5xx")
+    ap.add_argument("--api-error-rate", type=float, default=0.0, help="fracción de 200 con errors")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+    api = StandIn(load_recordings(args.recordings), args.host, args.port,
+                  delay=args.delay, jitter=args.jitter, rate_per_min=args.rate_per_min,
+                  daily_limit=args.daily_limit, error_rate=args.error_rate,
+                  api_error_rate=args.api_error_rate, seed=args.seed)
+    print(f"  🧪 Stand-in API-Sports en {api.base} ({len(api.routes)} grabaciones)")
+    try:
+        api._server.serve_forever()
+    except KeyboardInterrupt:
+        api.stop()
+        sys.exit(0)
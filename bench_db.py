@@ -0,0 +1,179 @@
+# ============================================================
+# BENCHMARK: consultas calientes de quant_v5.db con y sin índices
+# ============================================================
+#
+# Crea una DB temporal con el esquema de init_db(), la llena con N
+# picks sintéticos (cada uno con su closing_line y ~10 filas de
+# decision_log) y mide las consultas que el bot lanza en caliente:
+#
+#   clv_market   get_avg_clv_by_market(market)
+#   clv_global   get_avg_clv_by_market(None)
+#   clv_sharpe   get_clv_sharpe()
+#   burn_in      burn_in_evaluator.get_clv_sample()
+#   close_key    lookup por (fixture_id, market, selection_key)
+#   morgue       GROUP BY reason del arranque
+#
+# Cada tamaño se mide dos veces: esquema sin índices (v0) y tras
+# run_migrations().
+#
+# Al final compara 500 log_rejection() con el patrón antiguo
+# (connect + commit por fila, journal DELETE) contra la conexión
+# persistente de db.py dentro de un unit_of_work().
+#
+# USO:
+#   python bench_db.py                 # 10k, 50k, 100k, 200k picks
+#   python bench_db.py 1000 100000
+# ============================================================
+
+import os
+import sys
+import time
+import random
+import shutil
+import sqlite3
+import tempfile
+
+_TMP = tempfile.mkdtemp(prefix="bench_db_")
+os.environ["DB_DIR"] = _TMP
+
+import main  # noqa: E402  (DB_DIR debe fijarse antes de importar)
+
+MARKETS = ["OVER", "UNDER", "1X2", "BTTS"]
+REPEATS = 20
+
+QUERIES = {
+    "clv_market": ("""SELECT AVG((p.odd_open - c.odd_close)/p.odd_open)
+                      FROM picks_log p JOIN closing_lines c
+                        ON p.fixture_id=c.fixture_id AND p.market=c.market
+                           AND p.selection_key=c.selection_key
+                      WHERE p.market=? AND p.clv_captured=1
+                      ORDER BY p.id DESC LIMIT ?""", ("OVER", 30)),
+    "clv_global": ("""SELECT AVG((p.odd_open - c.odd_close)/p.odd_open)
+                      FROM picks_log p JOIN closing_lines c
+                        ON p.fixture_id=c.fixture_id AND p.market=c.market
+                           AND p.selection_key=c.selection_key
+                      WHERE p.clv_captured=1
+                      ORDER BY p.id DESC LIMIT ?""", (30,)),
+    "clv_sharpe": ("""SELECT (p.odd_open - c.odd_close)/p.odd_open
+                      FROM picks_log p JOIN closing_lines c
+                        ON p.fixture_id=c.fixture_id AND p.clv_captured=1
+                      ORDER BY p.id DESC LIMIT 50""", ()),
+    "burn_in":    ("""SELECT p.id, (p.odd_open - c.odd_close) / p.odd_open
+                      FROM picks_log p JOIN closing_lines c
+                        ON p.fixture_id = c.fixture_id AND p.market = c.market
+                           AND p.selection_key = c.selection_key
+                      WHERE p.clv_captured = 1 ORDER BY p.id ASC""", ()),
+    "close_key":  ("""SELECT odd_close FROM closing_lines
+                      WHERE fixture_id=? AND market=? AND selection_key=?""",
+                   None),
+    "morgue":     ("""SELECT reason, COUNT(*) FROM decision_log
+                      GROUP BY reason ORDER BY COUNT(*) DESC LIMIT 10""", ()),
+}
+
+
+def populate(conn, n):
+    rnd = random.Random(n)
+    picks, closes, decisions = [], [], []
+    for i in range(n):
+        fid  = 100000 + i
+        mkt  = rnd.choice(MARKETS)
+        skey = f"{rnd.choice([1, 5, 8])}|Over 2.5"
+        odd  = round(rnd.uniform(1.5, 3.5), 2)
+        picks.append((fid, "L", "H", "A", mkt, "sel", skey, odd, 0.5, 0.03, 0.01,
+                      1.4, 1.2, 2.6, "2026-01-01", "2026-01-02",
+                      rnd.choice([0, 1, 1, 1, -1]), 0.5, 0.01, "last6"))
+        closes.append((fid, mkt, skey, round(odd * rnd.uniform(0.9, 1.1), 2), 0.5, "2026-01-02"))
+        for _ in range(10):
+            decisions.append((fid, "H vs A", mkt, odd, -0.02,
+                              rnd.choice(["LOW_EV", "XG_SANITY_FAIL", "KILL_SWITCH_OVER"]),
+                              "2026-01-01"))
+    conn.executemany("""INSERT INTO picks_log
+        (fixture_id, league, home_team, away_team, market, selection, selection_key,
+         odd_open, prob_model, ev_open, stake_pct, xg_home, xg_away, xg_total,
+         pick_time, kickoff_time, clv_captured, urs, model_gap, xg_source)
+        VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)""", picks)
+    conn.executemany("INSERT INTO closing_lines VALUES (NULL,?,?,?,?,?,?)", closes)
+    conn.executemany("INSERT INTO decision_log VALUES (NULL,?,?,?,?,?,?,?)", decisions)
+    conn.commit()
+    return closes
+
+
+def time_queries(conn, closes):
+    rnd = random.Random(0)
+    out = {}
+    for name, (sql, args) in QUERIES.items():
+        t0 = time.perf_counter()
+        for _ in range(REPEATS):
+            a = args if args is not None else rnd.choice(closes)[:3]
+            conn.execute(sql, a).fetchall()
+        out[name] = (time.perf_counter() - t0) / REPEATS * 1000
+    return out
+
+
+def bench(n):
+    path = os.path.join(_TMP, f"bench_{n}.db")
+    main.DB_PATH, main.DB = path, main.get_db(path)
+    migrations, main.MIGRATIONS = main.MIGRATIONS, []
+    try:
+        main.init_db()                   # esquema v0, sin índices
+    finally:
+        main.MIGRATIONS = migrations
+    conn = sqlite3.connect(path)
+    closes = populate(conn, n)
+    before = time_queries(conn, closes)
+    t0 = time.perf_counter()
+    main.run_migrations(conn)
+    mig_ms = (time.perf_counter() - t0) * 1000
+    conn.execute("ANALYZE")
+    after = time_queries(conn, closes)
+    conn.close()
+    return before, after, mig_ms
+
+
+def bench_writes(n=500):
+    row = (1, "H vs A", "OVER", 1.9, -0.01, "LOW_EV", "2026-01-01")
+    legacy = os.path.join(_TMP, "legacy.db")
+    conn = sqlite3.connect(legacy)
+    conn.execute("""CREATE TABLE decision_log (id INTEGER PRIMARY KEY AUTOINCREMENT,
+        fixture_id INTEGER, match TEXT, market TEXT,
+        odd REAL, ev REAL, reason TEXT, timestamp DATETIME)""")
+    conn.close()
+    t0 = time.perf_counter()
+    for _ in range(n):
+        conn = sqlite3.connect(legacy)
+        conn.execute("INSERT INTO decision_log VALUES (NULL,?,?,?,?,?,?,?)", row)
+        conn.commit()
+        conn.close()
+    old_ms = (time.perf_counter() - t0) * 1000
+
+    path = os.path.join(_TMP, "uow.db")
+    main.DB_PATH, main.DB = path, main.get_db(path)
+    main.init_db()
+    t0 = time.perf_counter()
+    with main.DB.unit_of_work():
+        for _ in range(n):
+            main.log_rejection(*row[:6])
+    new_ms = (time.perf_counter() - t0) * 1000
+    print(f"\n{n} log_rejection: connect+commit por fila {old_ms:.0f}ms | "
+          f"unit_of_work {new_ms:.0f}ms ({old_ms / max(new_ms, 1e-6):.0f}x)")
+
+
+def run(sizes):
+    print(f"\n{'N picks':>9} {'consulta':<12} {'sin índices':>12} {'migrado':>10} {'x':>8}")
+    print("-" * 56)
+    for n in sizes:
+        before, after, mig_ms = bench(n)
+        for name in QUERIES:
+            b, a = before[name], after[name]
+            print(f"{n:>9} {name:<12} {b:>10.2f}ms {a:>8.2f}ms {b / max(a, 1e-6):>7.1f}x")
+        print(f"{n:>9} {'(migración)':<12} {mig_ms:>10.0f}ms")
+        print("-" * 56)
+
+
+if __name__ == "__main__":
+    sizes = [int(a) for a in sys.argv[1:]] or [10_000, 50_000, 100_000, 200_000]
+    try:
+        run(sizes)
+        bench_writes()
+    finally:
+        shutil.rmtree(_TMP, ignore_errors=True)
@@ -0,0 +1,339 @@
+# ============================================================
+# BENCHMARK: jobs del bot de punta a punta contra el stand-in
+# ============================================================
+#
+# Cada repetición es un proceso nuevo con DB temporal y su propio
+# api_standin (API-Sports + Telegram) y ejecuta, en orden:
+#
+#   arranque   startup_diagnostics() (/status + fixtures D+0..D+2)
+#   warmup     weekly_xg_cache()
+#   factores   _refresh_league() de las 9 ligas (/teams + stats)
+#   scan       run_daily_scan() (incluye el ingest FT del final)
+#   captura    capture_midday_lines() + capture_closing_lines() de
+#              los partidos con picks (lo que dispara CLOSING)
+#
+# Para cada fase: pared, GET a la API que ve el stand-in (reintentos
+# incluidos) por endpoint, respuestas de error (429 / 5xx / 404 sin
+# grabación), mensajes de Telegram y filas escritas en SQLite
+# (total_changes de todas las conexiones del proceso). Al final,
+# si los picks/cierres salen idénticos entre repeticiones.
+#
+# MUNDOS:
+#   por defecto    sintético y determinista (seed): 180 equipos en 9
+#                  ligas, 30 días de FT, partidos de hoy a 0.75-20 h
+#                  del momento de ejecución y cuotas que derivan en
+#                  cada /odds del mismo partido (hay CLV que capturar)
+#   --fixtures D   día real grabado con api_recorder.py
+#   --record D     graba el mundo sintético a través de api_recorder
+#                  en D y luego mide la reproducción desde D (debe
+#                  dar los mismos picks que la grabación)
+#
+# USO:
+#   python bench_e2e.py                                # 3 repeticiones
+#   python bench_e2e.py 5 --delay 0.1 --jitter 0.05
+#   python bench_e2e.py --rate-per-min 60 --error-rate 0.05 --api-error-rate 0.02
+#   python bench_e2e.py --fixtures fixtures/ --json e2e.json
+#   python bench_e2e.py --record /tmp/fixtures_demo
+# ============================================================
+
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import hashlib
+import tempfile
+import argparse
+import statistics
+import subprocess
+from datetime import datetime, timedelta, timezone
+
+PHASES  = ("arranque", "warmup", "factores", "scan", "captura")
+LEAGUES = [39, 140, 135, 78, 61, 2, 3, 88, 94]
+TEAMS_PER_LEAGUE = 20
+DAYS_BACK = 30
+TODAY_KO_H = (0.75, 3.0, 4.5, 7.0, 10.0, 20.0)
+
+
+# ── mundo sintético ──────────────────────────────────────────
+def _season(now):
+    return now.year if now.month >= 8 else now.year - 1
+
+
+class World:
+    """API-Sports sintética para StandIn(fallback=...)."""
+
+    def __init__(self, seed=25, now=None):
+        self.rnd   = random.Random(seed)
+        self.now   = now or datetime.now(timezone.utc)
+        self.days  = {}
+        self.calls = {}             # fixture_id → /odds servidos (deriva)
+        self.league_teams = {lid: [k * TEAMS_PER_LEAGUE + t + 1 for t in range(TEAMS_PER_LEAGUE)]
+                             for k, lid in enumerate(LEAGUES)}
+        fid = 500000
+        for back in range(-2, DAYS_BACK + 1):
+            day  = (datetime.now() - timedelta(days=back)).strftime("%Y-%m-%d")
+            rows = []
+            for n, (lid, teams) in enumerate(self.league_teams.items()):
+                picked = self.rnd.sample(teams, 4)
+                for j, (h, a) in enumerate(zip(picked[::2], picked[1::2])):
+                    fid += 1
+                    if back == 0:
+                        ko = self.now + timedelta(hours=TODAY_KO_H[(2 * n + j) % len(TODAY_KO_H)])
+                    else:
+                        ko = (self.now - timedelta(days=back)).replace(hour=18, minute=0,
+                                                                       second=0, microsecond=0)
+                    done = back > 0
+                    rows.append({
+                        "fixture": {"id": fid, "date": ko.isoformat(),
+                                    "status": {"short": "FT" if done else "NS"}},
+                        "league": {"id": lid, "season": self.season},
+                        "teams": {"home": {"id": h, "name": f"T{h}"},
+                                  "away": {"id": a, "name": f"T{a}"}},
+                        "goals": {"home": self.rnd.randint(0, 4) if done else None,
+                                  "away": self.rnd.randint(0, 3) if done else None},
+                    })
+            self.days[day] = rows
+        self.upcoming = {}
+        for rows in self.days.values():
+            for fx in rows:
+                if fx["fixture"]["status"]["short"] == "NS":
+                    self.upcoming.setdefault(fx["league"]["id"], []).append(fx)
+
+    @property
+    def season(self):
+        return _season(self.now)
+
+    def bets(self, fid):
+        r     = random.Random(fid)
+        n     = self.calls.get(fid, 0)
+        self.calls[fid] = n + 1
+        drift = 1.0 - 0.015 * n * r.choice((-1, 1))
+        f = lambda lo, hi: f"{r.uniform(lo, hi) * drift:.2f}"
+        return [
+            {"id": 1, "name": "Match Winner", "values": [
+                {"value": "Home", "odd": f(1.5, 4)}, {"value": "Draw", "odd": f(3, 4)},
+                {"value": "Away", "odd": f(1.8, 5)}]},
+            {"id": 5, "name": "Goals Over/Under", "values": [
+                {"value": "Over 2.5", "odd": f(1.6, 2.4)},
+                {"value": "Under 2.5", "odd": f(1.6, 2.4)}]},
+            {"id": 8, "name": "Both Teams Score", "values": [
+                {"value": "Yes", "odd": f(1.6, 2.2)}, {"value": "No", "odd": f(1.6, 2.2)}]},
+        ]
+
+    def odds_item(self, fx):
+        fid = fx["fixture"]["id"]
+        return {"fixture": {"id": fid, "date": fx["fixture"]["date"]},
+                "league": {"id": fx["league"]["id"], "season": self.season},
+                "bookmakers": [{"id": 8, "name": "Bet365", "bets": self.bets(fid)}]}
+
+    def team_stats(self, team_id):
+        r = random.Random(team_id)
+        return {"shots": {"total": r.randint(250, 450), "on": r.randint(80, 160)},
+                "goals": {"for": {"total": {"total": r.randint(20, 60)}}},
+                "fixtures": {"played": {"total": r.randint(30, 38)}}}
+
+    def route(self, path, params):
+        ok = lambda body: {"status": 200, "body": {"errors": [], **body}}
+        if path == "/status":
+            return ok({"response": {"requests": {"current": 0, "limit_day": 100000},
+                                    "subscription": {"plan": "Stand-in", "active": True}}})
+        if path == "/fixtures" and "date" in params:
+            return ok({"response": self.days.get(params["date"], [])})
+        if path == "/odds" and "fixture" in params:
+            fx = next((f for rows in self.upcoming.values() for f in rows
+                       if f["fixture"]["id"] == int(params["fixture"])), None)
+            return ok({"response": [self.odds_item(fx)] if fx else []})
+        if path == "/odds" and "league" in params:
+            items = [self.odds_item(f) for f in self.upcoming.get(int(params["league"]), [])]
+            page  = int(params.get("page", 1))
+            pages = [items[i:i + 10] for i in range(0, len(items), 10)] or [[]]
+            return ok({"paging": {"current": page, "total": len(pages)},
+                       "response": pages[page - 1] if page <= len(pages) else []})
+        if path == "/injuries" and "fixture" in params:
+            fid = int(params["fixture"])
+            fx  = next((f for rows in self.upcoming.values() for f in rows
+                        if f["fixture"]["id"] == fid), None)
+            if fx is None:
+                return ok({"response": []})
+            r = random.Random(-fid)
+            return ok({"response": [{"team": {"id": fx["teams"][side]["id"]}}
+                                    for side in ("home", "away")
+                                    for _ in range(r.randint(0, 3))]})
+        if path == "/teams" and "league" in params:
+            return ok({"response": [{"team": {"id": t, "name": f"T{t}"}}
+                                    for t in self.league_teams.get(int(params["league"]), [])]})
+        if path == "/teams/statistics" and "team" in params:
+            return ok({"response": self.team_stats(int(params["team"]))})
+        return None
+
+
+# ── proceso hijo: una repetición ─────────────────────────────
+def child(cfg):
+    from api_standin import StandIn, load_recordings
+    from api_recorder import Recorder
+
+    os.environ["DB_DIR"] = tempfile.mkdtemp(prefix="bench_e2e_")
+    os.environ.setdefault("API_RATE_PER_MIN", "0")
+    os.environ.setdefault("API_DAILY_LIMIT", "100000")
+    os.environ["TELEGRAM_TOKEN"] = "standin"
+
+    world = None
+    if cfg.get("fixtures"):
+        recs, fallback = load_recordings(cfg["fixtures"]), None
+    else:
+        world = World(cfg["seed"])
+        recs, fallback = [], world.route
+    api = StandIn(recs, fallback=fallback, delay=cfg["delay"], jitter=cfg["jitter"],
+                  rate_per_min=cfg["rate_per_min"], daily_limit=cfg["daily_limit"],
+                  error_rate=cfg["error_rate"], api_error_rate=cfg["api_error_rate"],
+                  seed=cfg["seed"]).start()
+    recorder = None
+    if cfg.get("record"):
+        recorder = Recorder(cfg["record"], upstream=api.base).start()
+    os.environ["API_SPORTS_BASE"] = recorder.base if recorder else api.base
+    os.environ["TELEGRAM_BASE"]   = api.base
+
+    import main
+    bot = main.QuantFundEuropean()
+
+    def captures():
+        bot.capture_midday_lines()
+        fids = {r[0] for r in main.DB.fetchall(
+            "SELECT DISTINCT fixture_id FROM picks_log WHERE clv_captured = 0")}
+        bot.capture_closing_lines(fids)
+
+    season = _season(datetime.now(timezone.utc))
+    jobs = {
+        "arranque": bot.startup_diagnostics,
+        "warmup":   bot.weekly_xg_cache,
+        "factores": lambda: [bot._refresh_league(lid, name, season, datetime.now(timezone.utc))
+                             for lid, name in main.TARGET_LEAGUES.items()],
+        "scan":     bot.run_daily_scan,
+        "captura":  captures,
+    }
+    out = {}
+    for phase in PHASES:
+        n0, w0 = len(api.hits), main.DB.total_changes()
+        t0 = time.perf_counter()
+        try:
+            jobs[phase]()
+            error = None
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        wall = time.perf_counter() - t0
+        main.GOVERNOR.flush()
+        hits = api.hits[n0:]
+        gets = [h for h in hits if not h[0].startswith("/bot")]
+        by_path = {}
+        for path, _, _ in gets:
+            by_path[path] = by_path.get(path, 0) + 1
+        out[phase] = {
+            "wall": wall, "requests": len(gets), "by_path": by_path,
+            "rate_limited": sum(1 for h in gets if h[2] == 429),
+            "server_errors": sum(1 for h in gets if h[2] >= 500),
+            "missing": sum(1 for h in gets if h[2] == 404),
+            "telegram": len(hits) - len(gets),
+            "db_rows": main.DB.total_changes() - w0,
+            "error": error,
+        }
+
+    picks  = main.DB.fetchall("SELECT fixture_id, market, selection_key, odd_open, stake_pct "
+                              "FROM picks_log ORDER BY fixture_id, market, selection_key")
+    closes = main.DB.fetchall("SELECT fixture_id, market, selection_key, odd_close "
+                              "FROM closing_lines ORDER BY 1, 2, 3")
+    out["_result"] = {"picks": len(picks), "closes": len(closes),
+                      "hash": hashlib.md5(repr((picks, closes)).encode()).hexdigest()[:12],
+                      "recorded": recorder.saved if recorder else None}
+    if recorder:
+        recorder.stop()
+    api.stop()
+    main.DB.close_all()
+    shutil.rmtree(os.environ["DB_DIR"], ignore_errors=True)
+    print("BENCH " + json.dumps(out))
+
+
+# ── proceso padre ────────────────────────────────────────────
+def spawn(cfg):
+    out = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", json.dumps(cfg)],
+                         capture_output=True, text=True)
+    line = next((l for l in out.stdout.splitlines() if l.startswith("BENCH ")), None)
+    if line is None:
+        sys.stderr.write(out.stdout[-2000:] + out.stderr[-2000:])
+        raise SystemExit("  ❌ el proceso hijo no devolvió resultados")
+    return json.loads(line[6:])
+
+
+def report(runs, cfg):
+    source = cfg.get("fixtures") or f"sintético (seed {cfg['seed']})"
+    print(f"\n  Jobs de punta a punta — {len(runs)} repeticiones, mundo {source}")
+    print(f"  stand-in: latencia {cfg['delay'] * 1000:.0f}+{cfg['jitter'] * 1000:.0f} ms, "
+          f"{cfg['rate_per_min'] or '∞'} req/min, cuota {cfg['daily_limit'] or '∞'}, "
+          f"5xx {cfg['error_rate']:.0%}, errors {cfg['api_error_rate']:.0%}")
+    print(f"  {'fase':<9} {'mediana':>9} {'máx':>9} {'GET':>6} {'429':>5} {'5xx':>5} "
+          f"{'404':>5} {'tg':>4} {'filas DB':>9}")
+    for phase in PHASES:
+        rows = [r[phase] for r in runs]
+        med  = lambda k: statistics.median(x[k] for x in rows)
+        walls = [x["wall"] * 1000 for x in rows]
+        print(f"  {phase:<9} {statistics.median(walls):>7.0f}ms {max(walls):>7.0f}ms "
+              f"{med('requests'):>6.0f} {med('rate_limited'):>5.0f} {med('server_errors'):>5.0f} "
+              f"{med('missing'):>5.0f} {med('telegram'):>4.0f} {med('db_rows'):>9.0f}")
+        errors = {x["error"] for x in rows if x["error"]}
+        for e in errors:
+            print(f"  {'':<9} ⚠️  {e}")
+    paths = {}
+    for phase in PHASES:
+        for path, n in runs[0][phase]["by_path"].items():
+            paths.setdefault(path, []).append(f"{phase} {n}")
+    for path, parts in sorted(paths.items()):
+        print(f"  {path:<18} {' | '.join(parts)}")
+    hashes = {r["_result"]["hash"] for r in runs}
+    res = runs[0]["_result"]
+    print(f"  resultado: {res['picks']} picks, {res['closes']} cierres — "
+          f"idéntico entre repeticiones: {'✅' if len(hashes) == 1 else '❌'}")
+    return hashes
+
+
+def run(args):
+    cfg = {"seed": args.seed, "delay": args.delay, "jitter": args.jitter,
+           "rate_per_min": args.rate_per_min, "daily_limit": args.daily_limit,
+           "error_rate": args.error_rate, "api_error_rate": args.api_error_rate,
+           "fixtures": args.fixtures}
+    recorded = None
+    if args.record:
+        shutil.rmtree(args.record, ignore_errors=True)
+        recorded = spawn({**cfg, "record": os.path.abspath(args.record)})
+        print(f"\n  🎙️  Grabadas {recorded['_result']['recorded']} respuestas en {args.record}")
+        cfg["fixtures"] = os.path.abspath(args.record)
+    runs = [spawn(cfg) for _ in range(args.repeats)]
+    hashes = report(runs, cfg)
+    ok = len(hashes) == 1
+    if recorded:
+        same = hashes == {recorded["_result"]["hash"]}
+        print(f"  reproducción == grabación: {'✅' if same else '❌'}")
+        ok &= same
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"config": cfg, "runs": runs}, f, indent=1)
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2 and sys.argv[1] == "--child":
+        child(json.loads(sys.argv[2]))
+        sys.exit(0)
+    ap = argparse.ArgumentParser(description="Benchmark de punta a punta contra api_standin")
+    ap.add_argument("repeats", nargs="?", type=int, default=3)
+    ap.add_argument("--fixtures", help="directorio grabado con api_recorder.py")
+    ap.add_argument("--record", help="graba el mundo sintético en este directorio y lo reproduce")
+    ap.add_argument("--seed", type=int, default=25)
+    ap.add_argument("--delay", type=float, default=0.05)
+    ap.add_argument("--jitter", type=float, default=0.0)
+    ap.add_argument("--rate-per-min", type=int, default=0)
+    ap.add_argument("--daily-limit", type=int, default=0)
+    ap.add_argument("--error-rate", type=float, default=0.0)
+    ap.add_argument("--api-error-rate", type=float, default=0.0)
+    ap.add_argument("--json", help="guarda todas las repeticiones en este fichero")
+    sys.exit(run(ap.parse_args()))
@@ -0,0 +1,210 @@
+# ============================================================
+# BENCHMARK: ingest de resultados FT en team_xg_cache
+# ============================================================
+#
+# Genera una temporada sintética (9 ligas × 20 equipos, ida y
+# vuelta → 380 partidos por liga) y la ingesta de dos formas sobre
+# DBs temporales con el esquema de init_db():
+#
+#   loop       patrón anterior: por cada (fixture, equipo) SELECT en
+#              xg_result_log, SELECT de la serie, INSERT OR REPLACE
+#              en team_xg_cache e INSERT en xg_result_log
+#   bloque     main.apply_ft_results(): 2 SELECT + 2 executemany
+#
+# Dos escenarios:
+#   temporada  toda la temporada en una llamada
+#   jornadas   una llamada por jornada (como el ingest diario)
+#
+# Para cada uno: tiempo, llamadas a SQLite (execute/executemany) y si
+# las filas finales de team_xg_cache coinciden entre ambos.
+#
+# USO:
+#   python bench_ingest.py
+#   python bench_ingest.py 3         # repeticiones (mediana)
+# ============================================================
+
+import os
+import sys
+import time
+import random
+import shutil
+import statistics
+import tempfile
+import contextlib
+from datetime import datetime, timedelta, timezone
+
+_TMP = tempfile.mkdtemp(prefix="bench_ingest_")
+os.environ["DB_DIR"] = _TMP
+
+import main  # noqa: E402  (DB_DIR debe fijarse antes de importar)
+from xg_state import XgState, SERIES_MAX  # noqa: E402
+from xg_series import pack_goals, pack_days, pack_leagues, unpack_goals, unpack_days  # noqa: E402
+
+LEAGUES = list(main.TARGET_LEAGUES)[:9]
+TEAMS   = 20
+
+
+def season(seed=0):
+    """Jornadas (lista de listas de fixtures API) en orden de fecha."""
+    rnd    = random.Random(seed)
+    start  = datetime(2025, 8, 16, 15, 0, tzinfo=timezone.utc)
+    rounds = [[] for _ in range(2 * (TEAMS - 1))]
+    fid    = 1_000_000
+    for li, lid in enumerate(LEAGUES):
+        teams = [lid * 1000 + t for t in range(TEAMS)]
+        for r in range(TEAMS - 1):                      # método del círculo
+            pairs = [(teams[i], teams[-1 - i]) for i in range(TEAMS // 2)]
+            for leg in (0, 1):
+                ko = start + timedelta(days=7 * (r + leg * (TEAMS - 1)), minutes=15 * li)
+                for h, a in pairs:
+                    fid += 1
+                    if leg:
+                        h, a = a, h
+                    rounds[r + leg * (TEAMS - 1)].append({
+                        "fixture": {"id": fid, "date": ko.isoformat(),
+                                    "status": {"short": "FT"}},
+                        "league":  {"id": lid},
+                        "teams":   {"home": {"id": h}, "away": {"id": a}},
+                        "goals":   {"home": rnd.randint(0, 4), "away": rnd.randint(0, 3)},
+                    })
+            teams = [teams[0]] + [teams[-1]] + teams[1:-1]
+    for rd in rounds:
+        rd.sort(key=lambda f: (f["fixture"]["date"], f["fixture"]["id"]))
+    return rounds
+
+
+def legacy_ingest(conn, days_fixtures):
+    """Bucle anterior: cuatro sentencias por (fixture, equipo)."""
+    ingested = 0
+    cc = conn.cursor()
+    for fixtures in days_fixtures:
+        for fix in fixtures:
+            if fix["fixture"]["status"]["short"] != "FT":
+                continue
+            if fix["league"]["id"] not in main.TARGET_LEAGUES:
+                continue
+            h_id, a_id = fix["teams"]["home"]["id"], fix["teams"]["away"]["id"]
+            h_goals, a_goals = fix["goals"]["home"], fix["goals"]["away"]
+            fid = fix["fixture"]["id"]
+            for team_id, gf, ga in [(h_id, h_goals, a_goals), (a_id, a_goals, h_goals)]:
+                cc.execute("SELECT 1 FROM xg_result_log WHERE fixture_id=? AND team_id=?",
+                           (fid, team_id))
+                if cc.fetchone():
+                    continue
+                cc.execute(
+                    "SELECT gf_pack, ga_pack, day_pack, league_pack, xg_num_for, "
+                    "xg_num_against, xg_den, xg_matches, last_match_day "
+                    "FROM team_xg_cache WHERE team_id=?", (team_id,))
+                row = cc.fetchone()
+                gf_pack, ga_pack, day_pack, league_pack = (
+                    (p or b"") for p in (row[:4] if row else (None,) * 4))
+                day = fix["fixture"]["date"][:10]
+                state = (XgState.from_row(*row[4:]) if row else XgState()) or \
+                    main._xg_state(unpack_goals(gf_pack), unpack_goals(ga_pack),
+                                   unpack_days(day_pack))
+                full    = len(gf_pack) >= SERIES_MAX and len(ga_pack) >= SERIES_MAX
+                evicted = (gf_pack[SERIES_MAX - 1], ga_pack[SERIES_MAX - 1],
+                           (unpack_days(day_pack[2 * (SERIES_MAX - 1):2 * SERIES_MAX])
+                            or [None])[0]) if full else None
+                state.push(gf, ga, day, evicted, decay=main.XG_DECAY_FACTOR,
+                           mode=main.XG_DECAY_MODE, half_life=main.XG_HALF_LIFE_DAYS)
+                keep        = SERIES_MAX - 1
+                gf_pack     = pack_goals([gf]) + gf_pack[:keep]
+                ga_pack     = pack_goals([ga]) + ga_pack[:keep]
+                day_pack    = pack_days([day]) + day_pack[:2 * keep]
+                league_pack = pack_leagues([fix["league"]["id"]]) + league_pack[:2 * keep]
+                cc.execute("""INSERT OR REPLACE INTO team_xg_cache
+                    (team_id, gf_pack, ga_pack, day_pack, league_pack,
+                     xg_num_for, xg_num_against, xg_den, xg_matches, last_match_day,
+                     xg_for, xg_against, confidence, updated_at, depth)
+                    VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)""",
+                    (team_id, gf_pack, ga_pack, day_pack, league_pack,
+                     *state.as_row(), state.xg_for, state.xg_against,
+                     "HIGH" if len(gf_pack) >= 4 else "MED",
+                     datetime.now(timezone.utc).isoformat(), len(gf_pack)))
+                cc.execute("INSERT OR IGNORE INTO xg_result_log VALUES (?,?,?)",
+                           (fid, team_id, datetime.now(timezone.utc).isoformat()))
+                ingested += 1
+    return ingested
+
+
+class CountingConn:
+    """Cuenta las llamadas execute/executemany (también vía cursor())."""
+    def __init__(self, conn):
+        self.conn  = conn
+        self.calls = 0
+
+    def cursor(self):
+        return self
+
+    def execute(self, sql, params=()):
+        self.calls += 1
+        self._cur = self.conn.execute(sql, params)
+        return self._cur
+
+    def executemany(self, sql, rows):
+        self.calls += 1
+        return self.conn.executemany(sql, rows)
+
+    def fetchone(self):
+        return self._cur.fetchone()
+
+
+def bulk_ingest(conn, days_fixtures):
+    return main.apply_ft_results(conn, main._ft_results(days_fixtures))
+
+
+def run_once(name, ingest, batches):
+    path = os.path.join(_TMP, f"{name}.db")
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    main.DB_PATH, main.DB = path, main.get_db(path)
+    with contextlib.redirect_stdout(None):
+        main.init_db()
+    calls = 0
+    n  = 0
+    t0 = time.perf_counter()
+    for batch in batches:
+        with main.DB.unit_of_work() as c:
+            counting = CountingConn(c)
+            n += ingest(counting, batch)
+            calls += counting.calls
+    elapsed = time.perf_counter() - t0
+    rows = main.DB.connection().execute(
+        "SELECT team_id, gf_pack, ga_pack, day_pack, league_pack, xg_num_for, "
+        "xg_num_against, xg_den, xg_matches, last_match_day, xg_for, xg_against, "
+        "confidence, depth FROM team_xg_cache ORDER BY team_id").fetchall()
+    main.DB.close_all()
+    return elapsed, calls, n, rows
+
+
+def run(repeats):
+    rounds = season()
+    fixtures = sum(len(r) for r in rounds)
+    scenarios = {"temporada": [rounds], "jornadas": [[r] for r in rounds]}
+    print(f"\n  Temporada sintética: {len(LEAGUES)} ligas × {TEAMS} equipos → "
+          f"{fixtures} partidos, {2 * fixtures} resultados")
+    print(f"  {'escenario':<10} {'modo':<7} {'tiempo':>9} {'llamadas':>9} "
+          f"{'resultados':>11} {'x':>7}")
+    for scen, batches in scenarios.items():
+        out = {}
+        for name, fn in (("loop", legacy_ingest), ("bloque", bulk_ingest)):
+            times = []
+            for _ in range(repeats):
+                elapsed, calls, n, rows = run_once(f"{scen}_{name}", fn, batches)
+                times.append(elapsed)
+            out[name] = (statistics.median(times), calls, n, rows)
+        base = out["loop"][0]
+        for name, (t, calls, n, _) in out.items():
+            print(f"  {scen:<10} {name:<7} {t * 1000:>7.0f}ms {calls:>9} {n:>11} "
+                  f"{base / max(t, 1e-9):>6.1f}x")
+        same = out["loop"][3] == out["bloque"][3]
+        print(f"  {'':<10} filas team_xg_cache idénticas: {'✅' if same else '❌'}")
+
+
+if __name__ == "__main__":
+    try:
+        run(int(sys.argv[1]) if len(sys.argv) > 1 else 1)
+    finally:
+        shutil.rmtree(_TMP, ignore_errors=True)
@@ -0,0 +1,105 @@
+# ============================================================
+# BENCHMARK: arranque en frío de main.py
+# ============================================================
+#
+# Lanza N procesos nuevos (caché de disco caliente, intérprete frío)
+# contra api_standin con DELAY_S de latencia por request y mide en
+# cada uno:
+#
+#   import      import main (sin DB, sin red, sin numpy/scipy/requests)
+#   init        QuantFundEuropean(): init_db + migraciones + attach
+#   ready       runner montado y primer run_pending() despachado
+#   diag        diagnóstico en segundo plano terminado (/status +
+#               fixtures D+0..D+2 en paralelo, Telegram)
+#   process     pared total del proceso hijo
+#
+# y qué módulos pesados quedaron cargados tras el import.
+#
+# USO:
+#   python bench_startup.py            # 5 procesos
+#   python bench_startup.py 10
+# ============================================================
+
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import statistics
+import subprocess
+from datetime import datetime, timedelta
+
+HEAVY   = ("numpy", "scipy", "requests", "asyncio")
+DELAY_S = 0.15
+
+
+def child():
+    t0 = time.perf_counter()
+    import main
+    t_import = time.perf_counter()
+    loaded = [m for m in HEAVY if m in sys.modules]
+
+    from job_runner import JobRunner, PRIORITY_CLOSING, PRIORITY_SCAN
+    bot = main.QuantFundEuropean()
+    t_init = time.perf_counter()
+
+    runner = JobRunner()
+    runner.source("closing", bot.closing.run_due, bot.closing.seconds_until_due,
+                  PRIORITY_CLOSING)
+    runner.once("diagnostics", bot.startup_diagnostics, PRIORITY_SCAN, group="api")
+    runner.run_pending()
+    t_ready = time.perf_counter()
+
+    runner.wait_idle(60)
+    t_diag = time.perf_counter()
+    runner.stop()
+    print("BENCH " + json.dumps({"import": t_import - t0, "init": t_init - t_import,
+                                 "ready": t_ready - t0, "diag": t_diag - t0,
+                                 "loaded": loaded}))
+
+
+def recordings():
+    recs = [{"path": "/status", "params": {}, "body": {"response": {
+        "requests": {"current": 0, "limit_day": 100},
+        "subscription": {"plan": "Stand-in", "active": True}}}}]
+    for d in range(5):
+        day = (datetime.now() + timedelta(days=d)).strftime("%Y-%m-%d")
+        recs.append({"path": "/fixtures", "params": {"date": day}, "body": {"response": [
+            {"fixture": {"id": 100 * d + k}, "league": {"id": lid}}
+            for k, lid in enumerate((39, 140, 135, 78))]}})
+    return recs
+
+
+def run(n):
+    from api_standin import StandIn
+    rows = []
+    with StandIn(recordings(), delay=DELAY_S) as api:
+        for _ in range(n):
+            tmp = tempfile.mkdtemp(prefix="bench_startup_")
+            env = {**os.environ, "DB_DIR": tmp, "API_SPORTS_BASE": api.base,
+                   "API_RATE_PER_MIN": "0", "TELEGRAM_TOKEN": ""}
+            t0  = time.perf_counter()
+            out = subprocess.run([sys.executable, __file__, "--child"], env=env,
+                                 capture_output=True, text=True, check=True).stdout
+            wall = time.perf_counter() - t0
+            shutil.rmtree(tmp, ignore_errors=True)
+            row = json.loads(next(l for l in out.splitlines() if l.startswith("BENCH "))[6:])
+            row["process"] = wall
+            rows.append(row)
+        hits = len(api.hits) // n
+
+    print(f"\n  Arranque en frío — {n} procesos, latencia stand-in {DELAY_S*1000:.0f} ms, "
+          f"{hits} requests/arranque")
+    print(f"  {'fase':<10} {'mediana':>9} {'máx':>9}")
+    for k in ("import", "init", "ready", "diag", "process"):
+        vals = [r[k] * 1000 for r in rows]
+        print(f"  {k:<10} {statistics.median(vals):>7.1f}ms {max(vals):>7.1f}ms")
+    print(f"  módulos pesados tras import: {rows[0]['loaded'] or 'ninguno'}")
+
+
+if __name__ == "__main__":
+    if "--child" in sys.argv:
+        child()
+    else:
+        run(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
@@ -0,0 +1,252 @@
+# ============================================================
+# MÓDULO: BUDGET GOVERNOR — Rate limit + presupuesto diario
+# Versión: 1.0 | Compatible con quant_v5.db
+# ============================================================
+#
+# Contabilidad de requests en memoria. Sustituye a track_requests(),
+# que hacía SELECT/UPDATE/COMMIT/SELECT en SQLite por cada llamada.
+#
+#   - Límite por minuto: token bucket (capacidad = req/min).
+#   - Límite diario: contador en memoria, sincronizado con las
+#     cabeceras que devuelve API-Sports en cada respuesta:
+#         x-ratelimit-requests-limit / -remaining   (día)
+#         X-RateLimit-Limit / X-RateLimit-Remaining (minuto)
+#   - Persistencia: request_log se escribe por lotes (cada
+#     FLUSH_EVERY requests o FLUSH_SECS segundos) y al salir.
+#
+# RESERVAS:
+#   Un job puede apartar un trozo del presupuesto al empezar:
+#
+#       with GOVERNOR.reserve("weekly_xg_cache", 44) as budget:
+#           ...
+#           if budget.exhausted: break
+#
+#   Lo reservado no lo puede gastar otro job. strict=True convierte
+#   la reserva en un techo duro (BudgetExceeded al pasarse);
+#   strict=False deja gastar del pool común cuando se acaba.
+# ============================================================
+
+import os
+import time
+import atexit
+import threading
+import contextvars
+from datetime import datetime, timezone
+
+from db import get_db
+
+
+# ── CONSTANTES ───────────────────────────────────────────────
+DAILY_LIMIT      = int(os.getenv("API_DAILY_LIMIT", "100"))
+API_RATE_PER_MIN = int(os.getenv("API_RATE_PER_MIN", "30"))
+FLUSH_EVERY      = 10     # requests entre escrituras a request_log
+FLUSH_SECS       = 60.0
+
+_ACTIVE_RESERVATION = contextvars.ContextVar("active_reservation", default=None)
+
+
+class BudgetExceeded(Exception):
+    pass
+
+
+def _today():
+    return datetime.now(timezone.utc).strftime("%Y-%m-%d")
+
+
+class TokenBucket:
+    """Bucket de `capacity` tokens que se rellena a `capacity` por minuto."""
+
+    def __init__(self, per_minute, clock=time.monotonic):
+        self.clock    = clock
+        self.capacity = float(max(per_minute, 0))
+        self.tokens   = self.capacity
+        self._last    = clock()
+
+    def set_capacity(self, per_minute):
+        self.capacity = float(max(per_minute, 0))
+        self.tokens   = min(self.tokens, self.capacity)
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity,
+                          self.tokens + (now - self._last) * self.capacity / 60.0)
+        self._last = now
+
+    def take(self):
+        """Consume un token. Devuelve 0.0 o los segundos a esperar."""
+        if self.capacity <= 0:
+            return 0.0
+        self._refill()
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return 0.0
+        return (1.0 - self.tokens) * 60.0 / self.capacity
+
+    def clamp(self, remaining):
+        self._refill()
+        self.tokens = min(self.tokens, float(remaining))
+
+
+class Reservation:
+    def __init__(self, governor, job, limit, strict):
+        self.governor = governor
+        self.job      = job
+        self.limit    = limit
+        self.strict   = strict
+        self.spent    = 0
+        self._token   = None
+
+    @property
+    def remaining(self):
+        return max(self.limit - self.spent, 0)
+
+    @property
+    def exhausted(self):
+        return self.spent >= self.limit
+
+    def __enter__(self):
+        self._token = _ACTIVE_RESERVATION.set(self)
+        return self
+
+    def __exit__(self, *exc):
+        _ACTIVE_RESERVATION.reset(self._token)
+        self.governor._release(self)
+        return False
+
+
+class BudgetGovernor:
+    def __init__(self, daily_limit=DAILY_LIMIT, per_minute=API_RATE_PER_MIN,
+                 clock=time.monotonic):
+        self.clock        = clock
+        self.daily_limit  = daily_limit
+        self.minute       = TokenBucket(per_minute, clock)
+        self.db           = None
+        self._day         = _today()
+        self._used        = 0
+        self._dirty       = 0
+        self._last_flush  = clock()
+        self._reservations = []
+        self._lock        = threading.Lock()
+
+    # ── persistencia ─────────────────────────────────────────
+    def attach(self, db_path):
+        """Carga el contador de hoy desde request_log y activa los flush."""
+        self.db = get_db(db_path)
+        try:
+            row = self.db.fetchone(
+                "SELECT count FROM request_log WHERE date=? ORDER BY id DESC LIMIT 1",
+                (self._day,)
+            )
+            with self._lock:
+                self._used = max(self._used, int(row[0]) if row else 0)
+        except:
+            pass
+
+    def flush(self):
+        with self._lock:
+            if not self._dirty or not self.db:
+                return
+            day, used = self._day, self._used
+            self._dirty = 0
+            self._last_flush = self.clock()
+        try:
+            with self.db.unit_of_work():
+                self.db.execute("DELETE FROM request_log WHERE date=?", (day,))
+                self.db.execute("INSERT INTO request_log VALUES (NULL,?,?)", (day, used))
+        except:
+            pass
+
+    def _maybe_flush(self):
+        if (self._dirty >= FLUSH_EVERY or
+                (self._dirty and self.clock() - self._last_flush >= FLUSH_SECS)):
+            self.flush()
+
+    def _rollover(self):
+        today = _today()
+        if today != self._day:
+            self._day, self._used, self._dirty = today, 0, 1
+
+    # ── consultas ────────────────────────────────────────────
+    def used_today(self):
+        with self._lock:
+            self._rollover()
+            return self._used
+
+    def remaining(self):
+        with self._lock:
+            self._rollover()
+            return max(self.daily_limit - self._used, 0)
+
+    def _held_by_others(self, res):
+        return sum(r.remaining for r in self._reservations if r is not res)
+
+    # ── gasto ────────────────────────────────────────────────
+    def acquire(self):
+        """Bloquea hasta tener token de minuto y apunta 1 request al día."""
+        res = _ACTIVE_RESERVATION.get()
+        while True:
+            with self._lock:
+                self._rollover()
+                free = self.daily_limit - self._used - self._held_by_others(res)
+                if res is not None and res.strict and res.exhausted:
+                    raise BudgetExceeded(f"reserva {res.job} agotada ({res.limit})")
+                if free <= 0:
+                    raise BudgetExceeded(f"presupuesto diario agotado ({self.daily_limit})")
+                wait = self.minute.take()
+                if wait == 0.0:
+                    self._used  += 1
+                    self._dirty += 1
+                    if res is not None:
+                        res.spent += 1
+                    break
+            time.sleep(wait)
+        self._maybe_flush()
+
+    def observe(self, headers):
+        """Ajusta contadores con las cabeceras de cuota de API-Sports."""
+        try:
+            day_limit  = headers.get("x-ratelimit-requests-limit")
+            day_remain = headers.get("x-ratelimit-requests-remaining")
+            min_limit  = headers.get("X-RateLimit-Limit")
+            min_remain = headers.get("X-RateLimit-Remaining")
+        except:
+            return
+        with self._lock:
+            if day_limit is not None and day_remain is not None:
+                self.daily_limit = int(day_limit)
+                used = int(day_limit) - int(day_remain)
+                if used != self._used:
+                    self._used, self._dirty = used, self._dirty + 1
+            if min_limit is not None:
+                self.minute.set_capacity(int(min_limit))
+            if min_remain is not None:
+                self.minute.clamp(int(min_remain))
+
+    def sync(self, current, limit=None):
+        """Fija el contador con el valor de /status."""
+        with self._lock:
+            self._rollover()
+            if limit:
+                self.daily_limit = int(limit)
+            self._used  = int(current)
+            self._dirty += 1
+        self.flush()
+
+    def reserve(self, job, n, strict=True):
+        """Aparta hasta n requests del pool común para `job`."""
+        with self._lock:
+            self._rollover()
+            free  = self.daily_limit - self._used - self._held_by_others(None)
+            res   = Reservation(self, job, max(min(n, free), 0), strict)
+            self._reservations.append(res)
+        return res
+
+    def _release(self, res):
+        with self._lock:
+            if res in self._reservations:
+                self._reservations.remove(res)
+        self.flush()
+
+
+GOVERNOR = BudgetGovernor()
+atexit.register(GOVERNOR.flush)
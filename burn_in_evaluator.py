@@ -20,8 +20,6 @@
 # ============================================================
 
 import sqlite3
-import numpy as np
-from scipy import stats
 from datetime import datetime, timezone
 
 
@@ -122,6 +120,11 @@ def evaluate_burn_in(db_path):
         return result
 
     # ── CÁLCULO DEL CLV ──────────────────────────────────────
+    # numpy/scipy solo con muestra suficiente: importarlos cuesta más
+    # que todo el resto del arranque
+    import numpy as np
+    from scipy import stats
+
     clvs = np.array([row[6] for row in rows], dtype=float)
     clv_mean = float(np.mean(clvs))
     clv_std  = float(np.std(clvs, ddof=1))
@@ -0,0 +1,190 @@
+# ============================================================
+# CHECK OFFLINE: scan + captura de cierres a la vez sin bloqueos
+# ============================================================
+#
+# Levanta api_standin con un mundo sintético (fixtures pasados y
+# próximos de las ligas objetivo, cuotas por partido y por liga) y
+# lanza EN PARALELO:
+#
+#   - bot.run_daily_scan()          (log_rejection, request_log, picks...)
+#   - bot.capture_closing_lines()   (PICKS partidos a 30 min del KO)
+#   - una sonda que escribe en decision_log cada 50 ms
+#
+# Con la captura antigua (red + pausas dentro de la transacción) la
+# fase de red dura más que busy_timeout y los demás escritores
+# acaban en "database is locked". Se mide la espera de cada escritura
+# y se exige: cero "locked", espera máxima < MAX_WAIT_S y todos los
+# picks sembrados capturados.
+#
+# USO:
+#   python check_capture_concurrency.py
+# ============================================================
+
+import os
+import sys
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+os.environ["DB_DIR"]           = tempfile.mkdtemp(prefix="qf_conc_")
+os.environ["API_RATE_PER_MIN"] = "0"
+os.environ["API_DAILY_LIMIT"]  = "100000"
+os.environ.setdefault("TELEGRAM_TOKEN", "")
+
+from api_standin import StandIn  # noqa: E402
+
+LEAGUES    = [39, 140, 135, 78, 61, 2, 3, 88, 94]
+PICKS      = 120                # 120 × latencia > busy_timeout (5 s)
+MAX_WAIT_S = 1.0
+DELAY_S    = 0.05
+
+
+# ── mundo sintético ──────────────────────────────────────────
+def make_world(days_back=30, days_ahead=3, teams=60):
+    rnd, now, fid, world = random.Random(7), datetime.now(timezone.utc), 1000, {}
+    for back in range(-days_ahead, days_back + 1):
+        day  = now - timedelta(days=back)
+        ids  = rnd.sample(range(1, teams + 1), 20)
+        rows = []
+        for h, a in zip(ids[::2], ids[1::2]):
+            fid += 1
+            done = back > 0
+            rows.append({
+                "fixture": {"id": fid, "date": day.replace(hour=18, minute=0).isoformat(),
+                            "status": {"short": "FT" if done else "NS"}},
+                "league": {"id": LEAGUES[h % len(LEAGUES)]},
+                "teams": {"home": {"id": h, "name": f"T{h}"}, "away": {"id": a, "name": f"T{a}"}},
+                "goals": {"home": rnd.randint(0, 4) if done else None,
+                          "away": rnd.randint(0, 3) if done else None},
+            })
+        world[day.strftime("%Y-%m-%d")] = rows
+    return world
+
+
+def bets(fid):
+    r = random.Random(fid)
+    f = lambda lo, hi: f"{r.uniform(lo, hi):.2f}"
+    return [
+        {"id": 1, "name": "Match Winner", "values": [
+            {"value": "Home", "odd": f(1.5, 4)}, {"value": "Draw", "odd": f(3, 4)},
+            {"value": "Away", "odd": f(1.8, 5)}]},
+        {"id": 5, "name": "Goals Over/Under", "values": [
+            {"value": "Over 2.5", "odd": f(1.6, 2.4)}, {"value": "Under 2.5", "odd": f(1.6, 2.4)}]},
+        {"id": 8, "name": "Both Teams Score", "values": [
+            {"value": "Yes", "odd": f(1.6, 2.2)}, {"value": "No", "odd": f(1.6, 2.2)}]},
+    ]
+
+
+def odds_item(fid):
+    return {"fixture": {"id": fid}, "bookmakers": [{"id": 8, "name": "Bet365", "bets": bets(fid)}]}
+
+
+def world_api(world):
+    upcoming = {}
+    for rows in world.values():
+        for fx in rows:
+            if fx["fixture"]["status"]["short"] == "NS":
+                upcoming.setdefault(fx["league"]["id"], []).append(fx["fixture"]["id"])
+
+    def ok(body):
+        return {"status": 200, "body": {"errors": [], **body}}
+
+    def route(path, params):
+        if path == "/status":
+            return ok({"response": {"requests": {"current": 0, "limit_day": 100000},
+                                    "subscription": {"plan": "Stand-in", "active": True}}})
+        if path == "/fixtures" and "date" in params:
+            return ok({"response": world.get(params["date"], [])})
+        if path == "/odds" and "fixture" in params:
+            return ok({"response": [odds_item(int(params["fixture"]))]})
+        if path == "/odds" and "league" in params:
+            items = [odds_item(f) for f in upcoming.get(int(params["league"]), [])]
+            return ok({"paging": {"current": 1, "total": 1}, "response": items})
+        return ok({"response": []})
+
+    return route
+
+
+# ── medición de escrituras ───────────────────────────────────
+class WriteProbe:
+    def __init__(self, db):
+        self.db     = db
+        self.waits  = []
+        self.locked = 0
+        self._stop  = threading.Event()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            t0 = time.monotonic()
+            try:
+                self.db.execute(
+                    "INSERT INTO decision_log VALUES (NULL,?,?,?,?,?,?,?)",
+                    (0, "probe", "-", 0.0, 0.0, "probe", datetime.now(timezone.utc).isoformat())
+                )
+            except sqlite3.OperationalError as e:
+                if "locked" in str(e):
+                    self.locked += 1
+            self.waits.append(time.monotonic() - t0)
+            self._stop.wait(0.05)
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        return False
+
+
+def main():
+    with StandIn([], fallback=world_api(make_world()), delay=DELAY_S) as api:
+        os.environ["API_SPORTS_BASE"] = api.base
+        import main as bot_main
+
+        bot = bot_main.QuantFundEuropean()
+        ko  = (datetime.now(timezone.utc) + timedelta(minutes=30)).isoformat()
+        with bot_main.DB.unit_of_work():
+            bot_main.DB.executemany(
+                "INSERT INTO picks_log (fixture_id, home_team, away_team, market, "
+                "selection_key, odd_open, kickoff_time, clv_captured) VALUES (?,?,?,?,?,?,?,0)",
+                [(900000 + i, "H", "A", "OVER", "5|Over 2.5", 2.0, ko) for i in range(PICKS)]
+            )
+
+        jobs = [threading.Thread(target=bot.run_daily_scan, name="scan"),
+                threading.Thread(target=bot.capture_closing_lines, name="capture")]
+        t0 = time.monotonic()
+        with WriteProbe(bot_main.DB) as probe:
+            for j in jobs:
+                j.start()
+            for j in jobs:
+                j.join()
+        elapsed = time.monotonic() - t0
+
+        pending = bot_main.DB.fetchone(
+            "SELECT COUNT(*) FROM picks_log WHERE fixture_id >= 900000 AND clv_captured = 0"
+        )[0]
+        hits = len(api.hits)
+
+    worst  = max(probe.waits) if probe.waits else 0.0
+    checks = [
+        (f"sin 'database is locked' en la sonda ({len(probe.waits)} escrituras)",
+         probe.locked == 0),
+        (f"espera máxima de escritura {worst*1000:.0f} ms < {MAX_WAIT_S*1000:.0f} ms",
+         worst < MAX_WAIT_S),
+        (f"{PICKS} picks sembrados capturados", pending == 0),
+    ]
+    ok = True
+    for label, passed in checks:
+        print(f"  {'✅' if passed else '❌'} {label}")
+        ok &= passed
+    print(f"\n  scan + captura en {elapsed:.1f}s | {hits} requests al stand-in")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,154 @@
+# ============================================================
+# CHECK OFFLINE: conexiones SQLite estables entre scans
+# ============================================================
+#
+# Cada hilo abre su propia conexión (db.py) y los pools del scan
+# (asyncio.run, ThreadPoolExecutor de lesiones, refresh de ligas)
+# crean hilos nuevos en cada pasada. Levanta api_standin con un
+# mundo sintético y repite ROUNDS veces scan + refresh de una liga:
+#
+#   - conexiones abiertas (DB.open_connections()) y descriptores
+#     sobre la DB no crecen después de la primera pasada
+#   - los hilos ya terminados no dejan conexión en DB._conns
+#   - DB.total_changes() sigue contando lo escrito por conexiones
+#     ya cerradas
+#
+# USO:
+#   python check_db_connections.py
+# ============================================================
+
+import os
+import sys
+import random
+import tempfile
+import threading
+from datetime import datetime, timedelta, timezone
+
+os.environ["DB_DIR"]           = tempfile.mkdtemp(prefix="qf_conns_")
+os.environ["API_RATE_PER_MIN"] = "0"
+os.environ["API_DAILY_LIMIT"]  = "100000"
+os.environ.setdefault("TELEGRAM_TOKEN", "")
+
+from api_standin import StandIn  # noqa: E402
+
+LEAGUES = [39, 140, 135, 78, 61]
+ROUNDS  = 5
+SEASON  = 2025
+
+
+def make_world(days_back=20, days_ahead=2, teams=40):
+    rnd, now, fid, world = random.Random(11), datetime.now(timezone.utc), 5000, {}
+    for back in range(-days_ahead, days_back + 1):
+        day  = now - timedelta(days=back)
+        ids  = rnd.sample(range(1, teams + 1), 16)
+        rows = []
+        for h, a in zip(ids[::2], ids[1::2]):
+            fid += 1
+            done = back > 0
+            rows.append({
+                "fixture": {"id": fid, "date": day.replace(hour=19, minute=0).isoformat(),
+                            "status": {"short": "FT" if done else "NS"}},
+                "league": {"id": LEAGUES[h % len(LEAGUES)], "season": SEASON},
+                "teams": {"home": {"id": h, "name": f"T{h}"}, "away": {"id": a, "name": f"T{a}"}},
+                "goals": {"home": rnd.randint(0, 4) if done else None,
+                          "away": rnd.randint(0, 3) if done else None},
+            })
+        world[day.strftime("%Y-%m-%d")] = rows
+    return world
+
+
+def odds_item(fid):
+    r = random.Random(fid)
+    f = lambda lo, hi: f"{r.uniform(lo, hi):.2f}"
+    return {"fixture": {"id": fid}, "bookmakers": [{"id": 8, "name": "Bet365", "bets": [
+        {"id": 1, "name": "Match Winner", "values": [
+            {"value": "Home", "odd": f(1.5, 4)}, {"value": "Draw", "odd": f(3, 4)},
+            {"value": "Away", "odd": f(1.8, 5)}]},
+        {"id": 5, "name": "Goals Over/Under", "values": [
+            {"value": "Over 2.5", "odd": f(1.6, 2.4)}, {"value": "Under 2.5", "odd": f(1.6, 2.4)}]},
+    ]}]}
+
+
+def world_api(world):
+    def ok(body):
+        return {"status": 200, "body": {"errors": [], **body}}
+
+    def route(path, params):
+        if path == "/status":
+            return ok({"response": {"requests": {"current": 0, "limit_day": 100000},
+                                    "subscription": {"plan": "Stand-in", "active": True}}})
+        if path == "/fixtures" and "date" in params:
+            return ok({"response": world.get(params["date"], [])})
+        if path == "/odds" and "fixture" in params:
+            return ok({"response": [odds_item(int(params["fixture"]))]})
+        if path == "/teams":
+            return ok({"response": [{"team": {"id": t, "name": f"T{t}"}} for t in range(1, 21)]})
+        if path == "/teams/statistics":
+            return ok({"response": {"shots": {"total": 300, "on": 110},
+                                    "goals": {"for": {"total": {"total": 40}}},
+                                    "fixtures": {"played": {"total": 34}}}})
+        return ok({"response": []})
+
+    return route
+
+
+def db_fds():
+    """Descriptores del proceso sobre la DB (.db, -wal, -shm); None sin /proc."""
+    try:
+        fds = os.listdir("/proc/self/fd")
+    except OSError:
+        return None
+    n = 0
+    for fd in fds:
+        try:
+            n += os.readlink(f"/proc/self/fd/{fd}").startswith(os.environ["DB_DIR"])
+        except OSError:
+            pass
+    return n
+
+
+def main():
+    with StandIn([], fallback=world_api(make_world())) as api:
+        os.environ["API_SPORTS_BASE"] = api.base
+        import main as bot_main
+
+        bot   = bot_main.QuantFundEuropean()
+        name  = bot_main.TARGET_LEAGUES[39]
+        conns, fds = [], []
+        for _ in range(ROUNDS):
+            bot.run_daily_scan()
+            bot_main.DB.execute("DELETE FROM league_team_stats")
+            bot._refresh_league(39, name, SEASON, datetime.now(timezone.utc))
+            conns.append(bot_main.DB.open_connections())
+            fds.append(db_fds())
+
+        before = bot_main.DB.total_changes()
+        worker = threading.Thread(target=bot_main.log_rejection,
+                                  args=(0, "probe", "-", 0.0, 0.0, "probe"))
+        worker.start()
+        worker.join()
+        after_thread = bot_main.DB.open_connections()
+        written      = bot_main.DB.total_changes() - before
+        hits = len(api.hits)
+
+    print(f"     conexiones por pasada: {conns}")
+    print(f"     descriptores de la DB por pasada: {fds}")
+    checks = [
+        (f"conexiones estables tras la 1ª pasada ({conns[0]} → {conns[-1]})",
+         max(conns[1:]) <= conns[0]),
+        ("conexiones: solo la del hilo principal (el resto ya terminó)", conns[-1] == 1),
+        (f"descriptores de la DB estables tras la 1ª pasada ({fds[0]} → {fds[-1]})",
+         fds[0] is None or max(fds[1:]) <= fds[0]),
+        ("hilo terminado: su conexión se cierra", after_thread == conns[-1]),
+        (f"total_changes cuenta la conexión cerrada ({written} fila)", written == 1),
+    ]
+    ok = True
+    for label, passed in checks:
+        print(f"  {'✅' if passed else '❌'} {label}")
+        ok &= passed
+    print(f"\n  {ROUNDS} pasadas de scan + refresh de liga | {hits} requests al stand-in")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,87 @@
+# ============================================================
+# CHECK OFFLINE: prefiltro de /injuries del scan
+# ============================================================
+#
+# Sin red. Partidos sintéticos (xG base y cuotas aleatorias de las
+# ligas objetivo) pasan por bot._injury_prefilter(). Para cada
+# partido que el prefiltro deja SIN /injuries se evalúa de verdad
+# (bot._evaluate_fixture, con Kelly y kill-switch) con varios
+# recuentos de lesionados 0..8 por lado y se exige que ninguno dé
+# candidato: saltarse la request nunca cambia los picks.
+#
+# Informa de cuántas /injuries se ahorran con estas cuotas.
+#
+# USO:
+#   python check_injury_prefilter.py
+# ============================================================
+
+import os
+import sys
+import random
+import tempfile
+import contextlib
+
+os.environ["DB_DIR"] = tempfile.mkdtemp(prefix="qf_inj_")
+os.environ.setdefault("TELEGRAM_TOKEN", "")
+
+import main  # noqa: E402  (DB_DIR debe fijarse antes de importar)
+from fixture_odds import FixtureOdds  # noqa: E402
+
+FIXTURES = 300
+INJURIES = [(0, 0), (0, 8), (8, 0), (8, 8), (1, 3), (3, 1), (2, 2), (5, 6)]
+
+
+def bets(rnd):
+    f = lambda lo, hi: round(rnd.uniform(lo, hi), 2)
+    return [
+        {"id": 1, "name": "Match Winner", "values": [
+            {"value": "Home", "odd": f(1.4, 5)}, {"value": "Draw", "odd": f(2.8, 4.5)},
+            {"value": "Away", "odd": f(1.6, 6)}]},
+        {"id": 5, "name": "Goals Over/Under", "values": [
+            {"value": "Over 2.5", "odd": f(1.5, 2.6)}, {"value": "Under 2.5", "odd": f(1.5, 2.6)}]},
+        {"id": 8, "name": "Both Teams Score", "values": [
+            {"value": "Yes", "odd": f(1.5, 2.3)}, {"value": "No", "odd": f(1.5, 2.3)}]},
+    ]
+
+
+def world(seed=24):
+    rnd, leagues, ready = random.Random(seed), list(main.TARGET_LEAGUES), []
+    for k in range(FIXTURES):
+        m = {"fixture": {"id": 7000 + k, "date": "2026-10-18T18:00:00+00:00"},
+             "league": {"id": rnd.choice(leagues)},
+             "teams": {"home": {"id": 2 * k, "name": f"H{k}"},
+                       "away": {"id": 2 * k + 1, "name": f"A{k}"}}}
+        inp = {"odds": FixtureOdds.from_bets(bets(rnd), bookmaker=8),
+               "base_h": rnd.uniform(0.5, 2.8), "base_a": rnd.uniform(0.4, 2.4),
+               "conf": rnd.choice(["HIGH", "HIGH", "MED", "LOW"]), "xg_src": "synthetic"}
+        ready.append((m, inp))
+    return ready
+
+
+def main_():
+    bot   = main.QuantFundEuropean()
+    ready = world()
+    need  = bot._injury_prefilter(ready)
+    skipped = [(m, inp) for m, inp in ready if m["fixture"]["id"] not in need]
+
+    wrong = 0
+    with contextlib.redirect_stdout(None):
+        for m, inp in skipped:
+            fid = m["fixture"]["id"]
+            for inj in INJURIES:
+                if bot._evaluate_fixture(m, bot._finish_inputs(m, inp, {fid: inj})) is not None:
+                    wrong += 1
+    checks = [
+        (f"sin /injuries: {len(skipped)}/{len(ready)} partidos", 0 < len(skipped) < len(ready)),
+        (f"ningún partido saltado da candidato con lesiones reales "
+         f"({len(skipped) * len(INJURIES)} evaluaciones)", wrong == 0),
+    ]
+    ok = True
+    for label, passed in checks:
+        print(f"  {'✅' if passed else '❌'} {label}")
+        ok &= passed
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main_())
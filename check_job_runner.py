@@ -0,0 +1,138 @@
+# ============================================================
+# CHECK OFFLINE: JobRunner con reloj falso
+# ============================================================
+#
+# Sin red ni DB. Los jobs son funciones que bloquean en un Event
+# para simular un scan o un warmup largos mientras avanza el
+# FakeClock:
+#
+#   - solape: un job cada 60 s que tarda "200 s" no se lanza dos
+#     veces; al acabar se recupera UNA vez (catch-up) y cuenta 2
+#     periodos perdidos
+#   - prioridad: con 2 workers (1 reservado) y dos warmups vencidos,
+#     solo corre uno y el cierre entra en el worker reservado
+#   - group: scan y warmup del group "api" no se solapan
+#   - calendario diario/semanal y estadísticas de retraso
+#
+# USO:
+#   python check_job_runner.py
+# ============================================================
+
+import sys
+import threading
+from datetime import datetime
+
+from job_runner import (JobRunner, FakeClock, daily_at, weekly_at,
+                        PRIORITY_CLOSING, PRIORITY_SCAN, PRIORITY_WARMUP)
+
+
+def blocking(log, name):
+    gate, started = threading.Event(), threading.Event()
+
+    def fn():
+        log.append(("start", name))
+        started.set()
+        gate.wait(5)
+        log.append(("end", name))
+    fn.started = started
+    return fn, gate
+
+
+def check_overlap():
+    clock, log = FakeClock(0), []
+    runner = JobRunner(workers=2, clock=clock)
+    fn, gate = blocking(log, "slow")
+    runner.every("slow", fn, 60, PRIORITY_WARMUP)
+    clock.advance(60)
+    runner.run_pending()
+    fn.started.wait(2)
+    clock.advance(200)
+    runner.run_pending()                    # vencido pero en marcha → no se lanza
+    starts_during = sum(1 for e in log if e == ("start", "slow"))
+    gate.set()
+    runner.wait_idle(5)
+    runner.run_pending()                    # catch-up único
+    runner.wait_idle(5)
+    st = runner.stats()["slow"]
+    runner.stop()
+    return [
+        ("solape: una sola ejecución mientras corre", starts_during == 1),
+        ("catch-up: 2 ejecuciones en total", st["runs"] == 2),
+        ("catch-up: 2 periodos perdidos contados", st["missed"] == 2),
+        ("catch-up: retraso registrado (260 - 120 = 140 s)",
+         abs(st["last_late_s"] - 140) < 1e-6),
+    ]
+
+
+def check_priority():
+    clock, log = FakeClock(0), []
+    runner = JobRunner(workers=2, reserved=1, clock=clock)
+    fa, ga = blocking(log, "warm_a")
+    fb, gb = blocking(log, "warm_b")
+    closing = threading.Event()
+    due = {"wait": None}
+    runner.every("warm_a", fa, 60, PRIORITY_WARMUP)
+    runner.every("warm_b", fb, 60, PRIORITY_WARMUP)
+    runner.source("closing", closing.set, lambda: due["wait"], PRIORITY_CLOSING)
+    clock.advance(60)
+    runner.run_pending()
+    (fa.started if runner.jobs["warm_a"].running else fb.started).wait(2)
+    due["wait"] = 0.0
+    runner.run_pending()
+    ran_closing = closing.wait(2)
+    due["wait"] = None
+    warm_started = [n for e, n in log if e == "start"]
+    ga.set(); gb.set()
+    runner.wait_idle(5)
+    runner.stop()
+    return [
+        ("reserva: solo un warmup ocupa el pool", len(warm_started) == 1),
+        ("prioridad: el cierre corre con el warmup en marcha", ran_closing),
+    ]
+
+
+def check_group():
+    clock, log = FakeClock(0), []
+    runner = JobRunner(workers=3, clock=clock)
+    fs, gs = blocking(log, "scan")
+    fw, gw = blocking(log, "warm")
+    runner.every("scan", fs, 60, PRIORITY_SCAN, group="api")
+    runner.every("warm", fw, 60, PRIORITY_WARMUP, group="api")
+    clock.advance(60)
+    runner.run_pending()
+    fs.started.wait(2)
+    runner.run_pending()
+    first = [n for e, n in log if e == "start"]
+    gs.set()
+    runner.wait_idle(5)
+    runner.run_pending()
+    gw.set()
+    runner.wait_idle(5)
+    order = [n for e, n in log if e == "start"]
+    runner.stop()
+    return [
+        ("group: con el scan en marcha el warmup espera", first == ["scan"]),
+        ("group: el warmup arranca al acabar el scan", order == ["scan", "warm"]),
+    ]
+
+
+def check_calendar():
+    base = datetime(2026, 10, 14, 10, 0).timestamp()          # miércoles 10:00
+    nxt_day  = datetime.fromtimestamp(daily_at("09:00")(base))
+    nxt_week = datetime.fromtimestamp(weekly_at("monday", "08:00")(base))
+    return [
+        ("daily 09:00 tras las 10:00 → mañana", nxt_day == datetime(2026, 10, 15, 9, 0)),
+        ("weekly lunes 08:00 → lunes siguiente", nxt_week == datetime(2026, 10, 19, 8, 0)),
+    ]
+
+
+def main():
+    ok = True
+    for label, passed in check_overlap() + check_priority() + check_group() + check_calendar():
+        print(f"  {'✅' if passed else '❌'} {label}")
+        ok &= passed
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
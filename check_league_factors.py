@@ -0,0 +1,177 @@
+# ============================================================
+# CHECK OFFLINE: refresh de league_advanced_factors en paralelo
+# ============================================================
+#
+# Levanta api_standin con /teams (20 equipos) y /teams/statistics
+# sintéticos con DELAY_S de latencia, y ejecuta el refresh de una
+# liga varias veces:
+#
+#   1. con MANY equipos devolviendo error API-Sports ({"errors":...}),
+#      por debajo de LEAGUE_STATS_MIN_SHARE → no se tocan los
+#      factores, las stats buenas quedan en league_team_stats y la
+#      liga queda pendiente
+#   2. con FAIL equipos fallando → solo se piden los MANY que faltaban
+#      (reanuda), los FAIL se saltan como en el bucle anterior y los
+#      factores salen iguales que el bucle serie sobre los demás; la
+#      liga ya no queda pendiente
+#   3. sin errores → solo se piden los FAIL; factores == bucle serie
+#   4. de nuevo → 0 stats pedidas (todas frescas)
+#   5. stats de hace más de LEAGUE_STATS_MAX_AGE_D días → la liga deja
+#      de estar pendiente (no se reintenta a diario para siempre)
+#
+# y mide la pared del refresh completo contra el suelo del bucle
+# anterior (sleep(1.1) + latencia por equipo).
+#
+# USO:
+#   python check_league_factors.py
+# ============================================================
+
+import os
+import sys
+import math
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+os.environ["DB_DIR"]           = tempfile.mkdtemp(prefix="qf_league_")
+os.environ["API_RATE_PER_MIN"] = "0"
+os.environ["API_DAILY_LIMIT"]  = "100000"
+os.environ.setdefault("TELEGRAM_TOKEN", "")
+
+from api_standin import StandIn  # noqa: E402
+
+LEAGUE  = 39
+SEASON  = 2025
+TEAMS   = 20
+FAIL    = 3                 # por encima del mínimo: se saltan
+MANY    = 10                # por debajo: no se actualiza
+DELAY_S = 0.2
+
+
+def team_stats(team_id):
+    r = random.Random(team_id)
+    return {"shots": {"total": r.randint(250, 450), "on": r.randint(80, 160)},
+            "goals": {"for": {"total": {"total": r.randint(20, 60)}}},
+            "fixtures": {"played": {"total": r.randint(30, 38)}}}
+
+
+def world(failing):
+    teams = [{"team": {"id": 500 + i, "name": f"T{i}"}} for i in range(TEAMS)]
+
+    def route(path, params):
+        if path == "/teams":
+            return {"status": 200, "body": {"errors": [], "response": teams}}
+        if path == "/teams/statistics":
+            tid = int(params["team"])
+            if tid in failing:
+                return {"status": 200, "body": {"errors": {"requests": "rate limit"},
+                                                "response": []}}
+            return {"status": 200, "body": {"errors": [], "response": team_stats(tid)}}
+        return None
+    return route, [t["team"]["id"] for t in teams]
+
+
+def legacy_factors(team_ids):
+    """Agregado del bucle anterior (sumas en Python, equipo a equipo)."""
+    t_shots = t_sot = t_goals = 0
+    match_counts = []
+    for tid in team_ids:
+        s   = team_stats(tid)
+        sh  = s["shots"].get("total", 0)
+        sot = s["shots"].get("on", 0)
+        gls = s["goals"]["for"]["total"].get("total", 0)
+        m   = s["fixtures"]["played"].get("total", 0)
+        if sh and gls and m > 0:
+            t_shots += sh
+            t_sot   += (sot or 0)
+            t_goals += gls
+            match_counts.append(m)
+    m_total = sum(match_counts) / 2
+    sh_avg  = t_shots / m_total
+    gps     = t_goals / t_shots
+    return (round(sh_avg, 2), round(t_sot / m_total, 2), round(math.sqrt(gps * sh_avg), 3))
+
+
+def main():
+    failing = set()
+    route, team_ids = world(failing)
+    with StandIn([], fallback=route, delay=DELAY_S) as api:
+        os.environ["API_SPORTS_BASE"] = api.base
+        import main as bot_main
+
+        bot  = bot_main.QuantFundEuropean()
+        name = bot_main.TARGET_LEAGUES[LEAGUE]
+        row  = lambda: bot_main.DB.fetchone(
+            "SELECT shots_avg, shots_on_target_avg, goal_std, last_updated "
+            "FROM league_advanced_factors WHERE league=?", (name,))
+        stats_calls = lambda: sum(1 for p, _, _ in api.hits if p == "/teams/statistics")
+        today = datetime.now(timezone.utc)
+
+        before = row()
+        failing.update(team_ids[:MANY])
+        bot._refresh_league(LEAGUE, name, SEASON, today)
+        after_many = row()
+        stored     = bot_main.DB.fetchone("SELECT COUNT(*) FROM league_team_stats")[0]
+        pending    = bot._pending_league_refreshes(SEASON)
+
+        failing.clear()
+        failing.update(team_ids[:FAIL])
+        n0 = stats_calls()
+        t0 = time.perf_counter()
+        bot._refresh_league(LEAGUE, name, SEASON, today)
+        resumed_s    = time.perf_counter() - t0
+        resumed      = stats_calls() - n0
+        after_skip   = row()
+        pending_skip = bot._pending_league_refreshes(SEASON)
+
+        failing.clear()
+        n0 = stats_calls()
+        bot._refresh_league(LEAGUE, name, SEASON, today)
+        retried  = stats_calls() - n0
+        after_ok = row()
+
+        n0 = stats_calls()
+        bot._refresh_league(LEAGUE, name, SEASON, today)
+        again = stats_calls() - n0
+
+        days_ago = lambda d: (datetime.now(timezone.utc) - timedelta(days=d)).isoformat()
+        bot_main.DB.execute("UPDATE league_advanced_factors SET last_updated=? WHERE league=?",
+                            (days_ago(10), name))
+        bot_main.DB.execute("UPDATE league_team_stats SET fetched_at=?", (days_ago(1),))
+        pending_recent = bot._pending_league_refreshes(SEASON)
+        bot_main.DB.execute("UPDATE league_team_stats SET fetched_at=?",
+                            (days_ago(bot_main.LEAGUE_STATS_MAX_AGE_D + 1),))
+        pending_stale = bot._pending_league_refreshes(SEASON)
+
+        bot_main.DB.execute("DELETE FROM league_team_stats")
+        t0 = time.perf_counter()
+        bot._refresh_league(LEAGUE, name, SEASON, datetime.now(timezone.utc))
+        full_s = time.perf_counter() - t0
+
+    floor_s = TEAMS * (1.1 + DELAY_S) + DELAY_S
+    checks = [
+        (f"{MANY}/{TEAMS} fallos: factores sin tocar", after_many == before),
+        (f"{MANY}/{TEAMS} fallos: {TEAMS - MANY} stats guardadas", stored == TEAMS - MANY),
+        (f"{MANY}/{TEAMS} fallos: liga pendiente de reanudar", pending == [LEAGUE]),
+        (f"reanuda: solo {MANY} stats pedidas ({resumed})", resumed == MANY),
+        (f"{FAIL}/{TEAMS} fallos: se saltan, factores == bucle anterior sin ellos",
+         after_skip != before and tuple(after_skip[:3]) == legacy_factors(team_ids[FAIL:])),
+        (f"{FAIL}/{TEAMS} fallos: ya no queda pendiente", pending_skip == []),
+        (f"sin fallos: solo {FAIL} stats pedidas ({retried})", retried == FAIL),
+        ("sin fallos: factores == bucle anterior", tuple(after_ok[:3]) == legacy_factors(team_ids)),
+        (f"stats frescas: 0 pedidas ({again})", again == 0),
+        ("stats de ayer más nuevas que los factores: pendiente", pending_recent == [LEAGUE]),
+        ("stats caducadas: deja de reintentarse", pending_stale == []),
+    ]
+    ok = True
+    for label, passed in checks:
+        print(f"  {'✅' if passed else '❌'} {label}")
+        ok &= passed
+    print(f"\n  refresh de {TEAMS} equipos: {full_s:.1f}s "
+          f"(bucle anterior ≥ {floor_s:.1f}s) | reanudación {resumed_s:.1f}s")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
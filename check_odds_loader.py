@@ -0,0 +1,104 @@
+# ============================================================
+# CHECK OFFLINE: odds_loader contra el stand-in local
+# ============================================================
+#
+# Levanta api_standin con grabaciones paginadas de /odds por liga y
+# comprueba el paginador y el índice por fixture_id de OddsIndex:
+#
+#   - liga 39: 23 partidos (3 páginas); los 4 del scan están en las
+#     páginas 1-2 → se para en la 2
+#   - liga 140: 4 partidos (1 página) + 1 del scan sin cuotas →
+#     liga completa, lookup() vacío
+#   - liga 61: un solo partido en el scan → sin bloque, lookup() None
+#   - liga 135: 25 partidos (3 páginas); los 2 del scan están en la 3
+#     → 1 página y lookup() None para ambos
+#   - liga 78: 35 partidos (4 páginas); los 3 del scan están en la 4
+#     → 1 página + 3 por fixture = odds_requests_bound(3), no 2n-1
+#   - en todas: páginas + partidos sin cuotas en bloque <= tope
+#
+# USO:
+#   python check_odds_loader.py
+# ============================================================
+
+import os
+import sys
+
+os.environ.setdefault("API_RATE_PER_MIN", "0")
+
+from api_standin import StandIn, paged_recordings  # noqa: E402
+
+SEASON = 2025
+
+
+def odds_item(fid, home=2.10):
+    return {"fixture": {"id": fid}, "league": {"season": SEASON},
+            "bookmakers": [{"id": 8, "name": "Bet365", "bets": [
+                {"id": 1, "name": "Match Winner",
+                 "values": [{"value": "Home", "odd": f"{home:.2f}"},
+                            {"value": "Draw", "odd": "3.40"},
+                            {"value": "Away", "odd": "3.60"}]}]}]}
+
+
+def match(fid, lid):
+    return {"fixture": {"id": fid, "date": "2025-10-18T15:00:00+00:00"},
+            "league": {"id": lid, "season": SEASON}}
+
+
+def recordings():
+    recs  = paged_recordings("/odds", {"league": 39, "season": SEASON, "bookmaker": 8},
+                             [odds_item(39000 + i, 1.5 + i / 10) for i in range(23)])
+    recs += paged_recordings("/odds", {"league": 140, "season": SEASON, "bookmaker": 8},
+                             [odds_item(140000 + i) for i in range(4)])
+    recs += paged_recordings("/odds", {"league": 135, "season": SEASON, "bookmaker": 8},
+                             [odds_item(135000 + i) for i in range(25)])
+    recs += paged_recordings("/odds", {"league": 78, "season": SEASON, "bookmaker": 8},
+                             [odds_item(78000 + i) for i in range(35)])
+    return recs
+
+
+def main():
+    with StandIn(recordings()) as api:
+        os.environ["API_SPORTS_BASE"] = api.base
+        from odds_loader import OddsIndex, odds_requests_bound
+
+        leagues = {39: (39001, 39004, 39012, 39015), 140: (140000, 140003, 140999),
+                   61: (61001,), 135: (135021, 135023), 78: (78031, 78032, 78034)}
+        scan = [match(f, lid) for lid, fids in leagues.items() for f in fids]
+        idx = OddsIndex().load({}, scan)
+
+        def league_cost(lid):
+            pages = sum(1 for _, p, _ in api.hits if p.get("league") == str(lid))
+            return pages + sum(1 for f in leagues[lid] if idx.lookup(f) is None)
+
+        checks = [
+            ("requests en bloque = 5 (2 págs liga 39 + 1 liga 140 + 1 liga 135 + 1 liga 78)",
+             idx.requests == 5),
+            ("hits del stand-in = 5", len(api.hits) == 5),
+            ("39015 indexado desde la página 2",
+             idx.lookup(39015).odd(1, "Home") == 3.00),
+            ("140003 indexado", idx.lookup(140003) is not None),
+            ("140999 sin cuotas en liga completa → vacío",
+             idx.lookup(140999) is not None and len(idx.lookup(140999)) == 0),
+            ("61001 liga con 1 partido → None (camino por fixture)",
+             idx.lookup(61001) is None),
+            ("página 3 de la liga 39 no pedida",
+             not any(p.get("page") == "3" for _, p, _ in api.hits)),
+            ("liga 135 con 2 partidos → 1 página y el resto por fixture",
+             idx.lookup(135021) is None and idx.lookup(135023) is None),
+            (f"liga 78 con 3 partidos en la pág. 4 → {league_cost(78)} requests "
+             f"(tope {odds_requests_bound(3)})", league_cost(78) == odds_requests_bound(3)),
+            ("ninguna liga pasa de odds_requests_bound(n)",
+             all(league_cost(lid) <= odds_requests_bound(len(f)) for lid, f in leagues.items())),
+        ]
+
+    ok = True
+    for label, passed in checks:
+        print(f"  {'✅' if passed else '❌'} {label}")
+        ok &= passed
+    print(f"\n  {len(idx)} partidos indexados | hits: "
+          + ", ".join(f"{p['league']}#{p['page']}" for _, p, _ in api.hits))
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
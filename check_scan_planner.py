@@ -0,0 +1,161 @@
+# ============================================================
+# CHECK OFFLINE: scan_planner con candidatos sintéticos
+# ============================================================
+#
+# Sin red. Partidos sintéticos de varias ligas con xG en caché
+# fresca, caducada o ausente y kickoffs a 0.5-47 h:
+#
+#   - con cuota de sobra entran todos y en el orden de entrada
+#   - /odds en bloque se cobra con el peor caso de odds_loader
+#     (odds_requests_bound): 2 partidos de una liga = 3 /odds
+#   - con cuota justa, el plan más el peor caso de odds no se pasa
+#   - los días de /fixtures del xG se cobran una sola vez
+#   - con cuota justa el plan no se pasa y saca más picks esperados
+#     por request que el corte por kickoff de antes
+#   - league_yields: la liga con más picks por partido puntúa más
+#
+# USO:
+#   python check_scan_planner.py
+# ============================================================
+
+import sys
+import random
+import sqlite3
+from datetime import datetime, timedelta, timezone
+
+from xg_series import XgMatrix
+from odds_loader import odds_requests_bound
+from scan_planner import (plan_scan, league_yields, _xg_quality, _horizon_weight,
+                          DEFAULT_YIELD, DEFAULT_LIQUIDITY)
+
+NOW     = datetime(2026, 10, 17, 9, 0, tzinfo=timezone.utc)
+LEAGUES = {39: "🇬🇧 PREMIER", 140: "🇪🇸 LA LIGA", 88: "🇳🇱 EREDIVISIE", 94: "🇵🇹 PRIMEIRA"}
+LIQ     = {"🇬🇧 PREMIER": 1.00, "🇪🇸 LA LIGA": 1.00, "🇳🇱 EREDIVISIE": 0.75, "🇵🇹 PRIMEIRA": 0.75}
+
+
+def fixture(fid, lid, hours, home, away):
+    return {"fixture": {"id": fid, "date": (NOW + timedelta(hours=hours)).isoformat()},
+            "league": {"id": lid},
+            "teams": {"home": {"id": home, "name": f"T{home}"},
+                      "away": {"id": away, "name": f"T{away}"}}}
+
+
+def world(n=30, seed=1):
+    rnd, matches, ids, upd, conf = random.Random(seed), [], [], [], []
+    for k in range(n):
+        h, a = 2 * k + 1, 2 * k + 2
+        matches.append(fixture(1000 + k, rnd.choice(list(LEAGUES)), rnd.uniform(0.5, 47), h, a))
+        for t in (h, a):
+            state = rnd.random()
+            if state < 0.6:                                      # fresca
+                ids.append(t); upd.append((NOW - timedelta(hours=3)).isoformat())
+                conf.append("HIGH" if rnd.random() < 0.7 else "MED")
+            elif state < 0.8:                                    # caducada
+                ids.append(t); upd.append((NOW - timedelta(hours=40)).isoformat())
+                conf.append("HIGH")
+    matches.sort(key=lambda m: m["fixture"]["date"])
+    return matches, XgMatrix(ids, None, None, None, conf, upd)
+
+
+def value(m, xg, yields):
+    q, _ = _xg_quality((m["teams"]["home"]["id"], m["teams"]["away"]["id"]), xg, 20, NOW)
+    hours = (datetime.fromisoformat(m["fixture"]["date"]) - NOW).total_seconds() / 3600
+    lid = m["league"]["id"]
+    return (yields.get(lid, DEFAULT_YIELD) * LIQ.get(LEAGUES[lid], DEFAULT_LIQUIDITY)
+            * q * _horizon_weight(hours))
+
+
+def by_kickoff(matches, budget, xg, yields, gap):
+    """Corte anterior: por kickoff hasta que no cabe, con el mismo modelo de coste."""
+    spent, per_league, paid, picks = 0, {}, False, 0.0
+    for m in matches:
+        lid = m["league"]["id"]
+        k = per_league.get(lid, 0)
+        _, miss = _xg_quality((m["teams"]["home"]["id"], m["teams"]["away"]["id"]), xg, 20, NOW)
+        cost = (1 + odds_requests_bound(k + 1) - odds_requests_bound(k)
+                + (gap if miss and not paid else 0))
+        if spent + cost > budget:
+            break
+        spent += cost
+        per_league[lid] = k + 1
+        paid = paid or miss
+        picks += value(m, xg, yields)
+    return picks, spent
+
+
+def check_plans():
+    matches, xg = world()
+    yields = {39: 0.20, 140: 0.12, 88: 0.05, 94: 0.08}
+    full = plan_scan(matches, 10_000, LEAGUES, LIQ, yields, xg, xg_gap_cost=8, now=NOW)
+    order_ok = [m["fixture"]["id"] for m in full.selected] == [m["fixture"]["id"] for m in matches]
+
+    two = [fixture(1, 39, 5, 1, 2), fixture(2, 39, 6, 3, 4)]
+    shared = plan_scan(two, 100, LEAGUES, LIQ, yields, None, xg_gap_cost=0, now=NOW)
+    gap    = plan_scan(two, 100, LEAGUES, LIQ, yields, None, xg_gap_cost=5, now=NOW)
+    no_bulk = plan_scan(two, 100, LEAGUES, LIQ, yields, None, xg_gap_cost=0,
+                        bulk_odds=False, now=NOW)
+
+    tight = 20
+    plan  = plan_scan(matches, tight, LEAGUES, LIQ, yields, xg, xg_gap_cost=8, now=NOW)
+    old_picks, old_spent = by_kickoff(matches, tight, xg, yields, 8)
+    # peor caso de lo que el scan gastará con lo elegido: /injuries +
+    # odds_requests_bound por liga + los días de xG si falta alguno
+    per_league = {}
+    for m in plan.selected:
+        per_league[m["league"]["id"]] = per_league.get(m["league"]["id"], 0) + 1
+    misses = [_xg_quality((m["teams"]["home"]["id"], m["teams"]["away"]["id"]), xg, 20, NOW)[1]
+              for m in plan.selected]
+    worst = (len(plan.selected) + sum(odds_requests_bound(k) for k in per_league.values())
+             + (8 if any(misses) else 0))
+    new_rate = plan.expected / max(plan.requests, 1)
+    old_rate = old_picks / max(old_spent, 1)
+    print(f"     cuota {tight}: plan {plan.summary()}")
+    print(f"     cuota {tight}: por kickoff {old_picks:.2f} picks en {old_spent} req")
+    return [
+        ("cuota de sobra: entran todos", len(full.selected) == len(matches) and not full.skipped),
+        ("cuota de sobra: orden de entrada", order_ok),
+        ("odds en bloque: 2 partidos de una liga = 3 /odds + 2 /injuries", shared.requests == 5),
+        ("odds sin bloque: 2 partidos de una liga = 2 /odds + 2 /injuries",
+         no_bulk.requests == 4),
+        ("días de /fixtures del xG cobrados una vez", gap.requests == 5 + 5),
+        (f"cuota justa: peor caso real ({worst}) ≤ {tight}", worst <= tight),
+        (f"cuota justa: el plan no se pasa ({plan.requests} ≤ {tight})", plan.requests <= tight),
+        (f"cuota justa: más picks por request ({new_rate:.3f} vs {old_rate:.3f})",
+         new_rate > old_rate),
+        ("cuota justa: más picks esperados en total", plan.expected > old_picks),
+    ]
+
+
+def check_yields():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE decision_log (id INTEGER PRIMARY KEY, fixture_id INTEGER, "
+                 "match TEXT, market TEXT, odd REAL, ev REAL, reason TEXT, timestamp TEXT)")
+    conn.execute("CREATE TABLE picks_log (fixture_id INTEGER, league TEXT, pick_time TEXT)")
+    ts = (datetime.now(timezone.utc) - timedelta(days=3)).isoformat()
+    for fid in range(40):
+        lid = 39 if fid < 20 else 88
+        conn.execute("INSERT INTO decision_log VALUES (NULL,?,?,?,?,?,?,?)",
+                     (fid, f"A vs B ({LEAGUES[lid]})", "OVER", 1.9, -0.1, "LOW_EV", ts))
+        if (lid == 39 and fid % 4 == 0) or (lid == 88 and fid % 20 == 0):
+            conn.execute("INSERT INTO picks_log VALUES (?,?,?)", (fid, LEAGUES[lid], ts))
+
+    class DB:
+        fetchall = staticmethod(lambda sql, p=(): conn.execute(sql, p).fetchall())
+
+    y = league_yields(DB, LEAGUES)
+    return [
+        (f"yield PREMIER {y[39]:.3f} > EREDIVISIE {y[88]:.3f}", y[39] > y[88]),
+        (f"liga sin historial → tasa global ({y[140]:.3f})", abs(y[140] - 6 / 40) < 1e-12),
+    ]
+
+
+def main():
+    ok = True
+    for label, passed in check_plans() + check_yields():
+        print(f"  {'✅' if passed else '❌'} {label}")
+        ok &= passed
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
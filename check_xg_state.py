@@ -0,0 +1,181 @@
+# ============================================================
+# CHECK OFFLINE: estado xG incremental vs _weighted_avg
+# ============================================================
+#
+# Sin red. Compara XgState con el cálculo completo de main.py:
+#
+#   - from_series en modo "index" da el mismo float que
+#     _weighted_avg (bit a bit) para series de 0..10 partidos
+#   - pushes sucesivos (con el valor saliente de la ventana) siguen
+#     a _weighted_avg de la serie truncada a 10 con error < 1e-12
+#   - modo "days": push (con la misma ventana de 10 que la serie)
+#     contra la suma directa 0.5**(edad/half_life) y contra
+#     from_series de la serie guardada, incluidos resultados atrasados
+#   - sync_xg_state_params: un estado calculado con otro modo o vida
+#     media se rehace al arrancar; con los mismos, no se toca
+#   - ingest: XgMatrix.decayed con el estado de la DB da lo mismo que
+#     rehacer desde las series (rebuild_xg_state)
+#
+# USO:
+#   python check_xg_state.py
+# ============================================================
+
+import sys
+import random
+import sqlite3
+from datetime import date, timedelta
+
+import main
+from xg_state import XgState, SERIES_MAX
+from xg_series import pack_series, XgMatrix
+
+DECAY = main.XG_DECAY_FACTOR
+TOL   = 1e-12
+
+
+def check_from_series(rng):
+    same = True
+    for _ in range(2000):
+        k  = rng.randint(0, SERIES_MAX)
+        gf = [rng.randint(0, 6) for _ in range(k)]
+        ga = [rng.randint(0, 6) for _ in range(k)]
+        st = XgState.from_series(gf, ga, decay=DECAY)
+        same &= (st.xg_for == main._weighted_avg(gf)
+                 and st.xg_against == main._weighted_avg(ga))
+    return [("from_series == _weighted_avg (bit a bit)", same)]
+
+
+def check_push(rng):
+    worst = 0.0
+    for _ in range(300):
+        gf, ga, st = [], [], XgState()
+        for _ in range(rng.randint(1, 60)):
+            f, a = rng.randint(0, 6), rng.randint(0, 6)
+            evicted = (gf[SERIES_MAX - 1], ga[SERIES_MAX - 1]) if len(gf) >= SERIES_MAX else None
+            st.push(f, a, evicted=evicted, decay=DECAY)
+            gf = ([f] + gf)[:SERIES_MAX]
+            ga = ([a] + ga)[:SERIES_MAX]
+            worst = max(worst, abs(st.xg_for - main._weighted_avg(gf)),
+                        abs(st.xg_against - main._weighted_avg(ga)))
+    return [(f"push == _weighted_avg(serie[:10]) (error máx {worst:.1e})", worst < TOL)]
+
+
+def check_days(rng):
+    hl, worst, rebuilt = 45.0, 0.0, 0.0
+    for _ in range(200):
+        day, hist, st = date(2026, 1, 1), [], XgState()
+        for _ in range(rng.randint(1, 40)):
+            late = hist and rng.random() < 0.1
+            d    = (day - timedelta(days=rng.randint(1, 20))) if late else day
+            f, a = rng.randint(0, 6), rng.randint(0, 6)
+            evicted = hist[SERIES_MAX - 1] if len(hist) >= SERIES_MAX else None
+            st.push(f, a, d.isoformat(), mode="days", half_life=hl,
+                    evicted=evicted and (evicted[1], evicted[2], evicted[0].isoformat()))
+            hist = ([(d, f, a)] + hist)[:SERIES_MAX]       # serie guardada, la más nueva 1ª
+            if not late:
+                day += timedelta(days=rng.randint(0, 14))
+            last = max(h[0] for h in hist)
+            w    = [0.5 ** ((last - h[0]).days / hl) for h in hist]
+            xf   = sum(wi * h[1] for wi, h in zip(w, hist)) / sum(w)
+            xa   = sum(wi * h[2] for wi, h in zip(w, hist)) / sum(w)
+            worst = max(worst, abs(st.xg_for - xf), abs(st.xg_against - xa))
+            full = XgState.from_series([h[1] for h in hist], [h[2] for h in hist],
+                                       [h[0].isoformat() for h in hist], mode="days",
+                                       half_life=hl)
+            rebuilt = max(rebuilt, abs(st.xg_for - full.xg_for),
+                          abs(st.xg_against - full.xg_against))
+    return [(f"modo days == suma directa sobre la ventana (error máx {worst:.1e})",
+             worst < TOL),
+            (f"modo days: push == from_series de la serie (error máx {rebuilt:.1e})",
+             rebuilt < TOL)]
+
+
+class _MemDB:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def fetchall(self, sql, params=()):
+        return self.conn.execute(sql, params).fetchall()
+
+
+def _cache_db():
+    conn = sqlite3.connect(":memory:", isolation_level=None)
+    conn.execute("""CREATE TABLE team_xg_cache (team_id INTEGER PRIMARY KEY,
+        gf_pack BLOB, ga_pack BLOB, day_pack BLOB, league_pack BLOB,
+        xg_num_for REAL, xg_num_against REAL, xg_den REAL, xg_matches INTEGER,
+        last_match_day TEXT, xg_for REAL, xg_against REAL, confidence TEXT,
+        updated_at TEXT, depth INTEGER)""")
+    return conn
+
+
+def check_matrix(rng):
+    conn = _cache_db()
+    for tid in range(1, 200):
+        k  = rng.randint(1, SERIES_MAX)
+        gf = [rng.randint(0, 6) for _ in range(k)]
+        ga = [rng.randint(0, 6) for _ in range(k)]
+        conn.execute("INSERT INTO team_xg_cache (team_id, gf_pack, ga_pack, day_pack, "
+                     "league_pack, confidence) VALUES (?,?,?,?,?,'MED')",
+                     (tid, *pack_series(gf, ga)))
+    db = _MemDB(conn)
+    plain = XgMatrix.load(db).decayed(DECAY)           # sin estado: suma por columnas
+    main.rebuild_xg_state(conn)
+    state = XgMatrix.load(db).decayed(DECAY)           # con estado: num/den
+    same  = (plain[0] == state[0]).all() and (plain[1] == state[1]).all()
+    return [("XgMatrix: estado == series (bit a bit)", bool(same))]
+
+
+def check_params(rng):
+    conn = _cache_db()
+    for sql in dict(main.MIGRATIONS)[7]:
+        conn.execute(sql)
+    series = {}
+    for tid in range(1, 50):
+        k    = rng.randint(1, SERIES_MAX)
+        gf   = [rng.randint(0, 6) for _ in range(k)]
+        ga   = [rng.randint(0, 6) for _ in range(k)]
+        days = [(date(2026, 10, 1) - timedelta(days=5 * i + rng.randint(0, 4))).isoformat()
+                for i in range(k)]
+        series[tid] = (gf, ga, days)
+        conn.execute("INSERT INTO team_xg_cache (team_id, gf_pack, ga_pack, day_pack, "
+                     "league_pack, confidence) VALUES (?,?,?,?,?,'MED')",
+                     (tid, *pack_series(gf, ga, days)))
+
+    def state_is(mode, hl):
+        rows = conn.execute("SELECT team_id, xg_for, xg_against FROM team_xg_cache").fetchall()
+        return all(abs(xf - st.xg_for) < TOL and abs(xa - st.xg_against) < TOL
+                   for tid, xf, xa in rows
+                   for st in [XgState.from_series(*series[tid], decay=DECAY, mode=mode,
+                                                  half_life=hl)])
+
+    saved = main.XG_DECAY_MODE, main.XG_HALF_LIFE_DAYS
+    try:
+        main.XG_DECAY_MODE, main.XG_HALF_LIFE_DAYS = "index", 45.0
+        first  = main.sync_xg_state_params(conn)
+        again  = main.sync_xg_state_params(conn)
+        index_ok = state_is("index", 45.0)
+        main.XG_DECAY_MODE = "days"
+        to_days = main.sync_xg_state_params(conn) and state_is("days", 45.0)
+        main.XG_HALF_LIFE_DAYS = 20.0
+        to_hl   = main.sync_xg_state_params(conn) and state_is("days", 20.0)
+        stored  = conn.execute("SELECT mode, half_life FROM xg_state_params").fetchone()
+    finally:
+        main.XG_DECAY_MODE, main.XG_HALF_LIFE_DAYS = saved
+    return [("sin parámetros guardados → se rehace", first and index_ok),
+            ("mismos parámetros → no se rehace", not again),
+            ("cambio de modo index→days → se rehace", to_days),
+            ("cambio de vida media 45→20 → se rehace", to_hl),
+            ("parámetros guardados = config", stored == ("days", 20.0))]
+
+
+def main_():
+    rng, ok = random.Random(20), True
+    for label, passed in (check_from_series(rng) + check_push(rng)
+                          + check_days(rng) + check_matrix(rng) + check_params(rng)):
+        print(f"  {'✅' if passed else '❌'} {label}")
+        ok &= passed
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main_())
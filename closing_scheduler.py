@@ -0,0 +1,167 @@
+# ============================================================
+# MÓDULO: CLOSING SCHEDULER — Cola de cierres por kickoff
+# Versión: 1.0 | Compatible con main.py V5.13
+# ============================================================
+#
+# capture_closing_lines corría cada 30 min, cargaba todos los picks
+# con clv_captured = 0 y parseaba todos los kickoffs. La ventana de
+# captura quedaba imprecisa hasta en 30 minutos.
+#
+# Aquí cada fixture con picks pendientes entra en un heap:
+#
+#   (kickoff − CLOSE_LEAD_MIN, fixture_id)
+#
+#   - seconds_until_due() dice cuánto puede dormir el bucle principal
+#   - run_due() dispara UNA captura con todos los fixtures vencidos
+#   - si tras la captura el fixture sigue pendiente (API caída, sin
+#     cuotas aún) se reintenta cada CLOSE_RETRY_MIN hasta
+#     CLOSE_GRACE_MIN después del kickoff
+#   - pasado ese margen el cierre se da por perdido: se avisa, queda
+#     en `missed` y on_missed(fixture_ids) lo registra (main marca los
+#     picks con clv_captured = -1, como un cierre sin cuota)
+#   - rebuild() reconstruye la cola desde picks_log al arrancar; los
+#     fixtures ya vencidos salen en el primer run_due() y los que
+#     pasaron el margen se dan por perdidos sin capturar cuotas de
+#     después del partido
+#
+# La función de captura recibe la lista de fixture_id y devuelve el
+# subconjunto que sigue pendiente.
+# ============================================================
+
+import time
+import heapq
+import threading
+from datetime import datetime
+
+
+# ── CONSTANTES ───────────────────────────────────────────────
+CLOSE_LEAD_MIN  = 60
+CLOSE_RETRY_MIN = 5
+CLOSE_GRACE_MIN = 10      # reintentos tras el kickoff antes de darlo por perdido
+
+
+def _ts(kickoff):
+    if isinstance(kickoff, (int, float)):
+        return float(kickoff)
+    return datetime.fromisoformat(str(kickoff).replace("Z", "+00:00")).timestamp()
+
+
+class ClosingScheduler:
+    def __init__(self, capture, lead_min=CLOSE_LEAD_MIN, retry_min=CLOSE_RETRY_MIN,
+                 grace_min=CLOSE_GRACE_MIN, on_missed=None, clock=time.time):
+        self.capture = capture
+        self.lead    = lead_min * 60
+        self.retry   = retry_min * 60
+        self.grace   = grace_min * 60
+        self.on_missed = on_missed
+        self.clock   = clock
+        self.missed  = []       # fixture_id cuyo cierre se dio por perdido
+        self._heap    = []      # (due_ts, fixture_id)
+        self._due     = {}      # fixture_id → due_ts vigente (las demás son obsoletas)
+        self._kickoff = {}      # fixture_id → kickoff_ts
+        self._lock    = threading.Lock()
+
+    # ── cola ─────────────────────────────────────────────────
+    def _push(self, fid, due):
+        self._due[fid] = due
+        heapq.heappush(self._heap, (due, fid))
+
+    def add(self, fixture_id, kickoff):
+        """Programa el cierre de un fixture (si ya estaba, gana el más temprano)."""
+        try:
+            ko = _ts(kickoff)
+        except (TypeError, ValueError):
+            return
+        with self._lock:
+            due = ko - self.lead
+            if fixture_id in self._due and self._due[fixture_id] <= due:
+                return
+            self._kickoff[fixture_id] = ko
+            self._push(fixture_id, due)
+
+    def rebuild(self, db):
+        """Cola desde picks_log: un evento por fixture con picks sin capturar."""
+        rows = db.fetchall(
+            "SELECT fixture_id, MIN(kickoff_time) FROM picks_log "
+            "WHERE clv_captured = 0 GROUP BY fixture_id"
+        )
+        with self._lock:
+            self._heap, self._due, self._kickoff = [], {}, {}
+        now, late = self.clock(), []
+        for fid, ko in rows:
+            try:
+                if _ts(ko) + self.grace < now:
+                    late.append((fid, _ts(ko)))
+                    continue
+            except (TypeError, ValueError):
+                pass
+            self.add(fid, ko)
+        self._give_up(late)
+        return len(self._due)
+
+    def _give_up(self, lost):
+        """[(fixture_id, kickoff_ts)] sin cierre tras el margen: aviso + on_missed."""
+        if not lost:
+            return
+        for fid, ko in lost:
+            print(f"  ⚠️  Cierre perdido: fixture {fid} "
+                  f"(kickoff {datetime.fromtimestamp(ko):%d/%m %H:%M})")
+        fids = [fid for fid, _ in lost]
+        self.missed.extend(fids)
+        if self.on_missed:
+            try:
+                self.on_missed(fids)
+            except Exception as e:
+                print(f"  ⚠️  on_missed error: {e}")
+
+    def _drop_stale(self):
+        while self._heap and self._due.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+
+    def seconds_until_due(self):
+        """Segundos hasta el próximo cierre (0 si ya hay alguno vencido), None si vacía."""
+        with self._lock:
+            self._drop_stale()
+            if not self._heap:
+                return None
+            return max(self._heap[0][0] - self.clock(), 0.0)
+
+    def pop_due(self):
+        now, out = self.clock(), []
+        with self._lock:
+            while True:
+                self._drop_stale()
+                if not self._heap or self._heap[0][0] > now:
+                    break
+                _, fid = heapq.heappop(self._heap)
+                del self._due[fid]
+                out.append(fid)
+        return out
+
+    def __len__(self):
+        with self._lock:
+            return len(self._due)
+
+    # ── disparo ──────────────────────────────────────────────
+    def run_due(self):
+        """Captura los fixtures vencidos; reprograma los que sigan pendientes."""
+        fids = self.pop_due()
+        if not fids:
+            return []
+        try:
+            still = set(self.capture(fids) or ())
+        except Exception as e:
+            print(f"  ⚠️  closing capture error: {e}")
+            still = set(fids)
+        now, lost = self.clock(), []
+        with self._lock:
+            for fid in fids:
+                ko = self._kickoff.get(fid)
+                if fid in still and ko is not None and now + self.retry <= ko + self.grace:
+                    self._push(fid, now + self.retry)
+                elif fid not in self._due:
+                    self._kickoff.pop(fid, None)
+                    if fid in still and ko is not None:
+                        lost.append((fid, ko))
+        self._give_up(lost)
+        return fids
@@ -0,0 +1,200 @@
+# ============================================================
+# MÓDULO: CLV STATS — Ventanas móviles de CLV materializadas
+# Versión: 1.0 | Compatible con quant_v5.db
+# ============================================================
+#
+# get_avg_clv_by_market y get_clv_sharpe recalculaban el join
+# picks_log ⋈ closing_lines entero en cada llamada, y además el
+# ORDER BY ... LIMIT iba después del AVG: la ventana de 30/50 picks
+# nunca se aplicaba y el coste crecía con el histórico.
+#
+# Aquí cada ventana es un buffer circular de los últimos N CLVs con
+# suma y suma de cuadrados acumuladas:
+#
+#   - por mercado:  últimos CLV_WINDOW_MARKET (30) picks del mercado
+#   - global:       últimos CLV_WINDOW_MARKET (30) picks   → media
+#                   últimos CLV_WINDOW_SHARPE (50) picks   → Sharpe
+#
+# Media, std y Sharpe son O(1) sin importar el tamaño del histórico.
+# capture_closing_lines() empuja cada CLV nuevo (en orden de
+# captura) y guarda las ventanas en la tabla clv_rolling dentro de
+# su misma transacción. Si la tabla está vacía (primer arranque) se
+# rellena desde el join, en orden de picks_log.id.
+#
+# CLV = (odd_open - odd_close) / odd_open
+# ============================================================
+
+import json
+import math
+import threading
+from collections import deque
+from datetime import datetime, timezone
+
+from db import get_db
+
+
+# ── CONSTANTES ───────────────────────────────────────────────
+CLV_WINDOW_MARKET = 30
+CLV_WINDOW_SHARPE = 50
+MIN_SHARPE_SAMPLE = 10
+GLOBAL_SCOPE      = "*"
+
+# Join por la clave completa (fixture, mercado, selección). El Sharpe
+# antiguo unía solo por fixture_id y mezclaba cierres de otros mercados.
+_HISTORY_SQL = """
+    SELECT p.market, (p.odd_open - c.odd_close) / p.odd_open
+    FROM picks_log p JOIN closing_lines c
+      ON p.fixture_id = c.fixture_id AND p.market = c.market
+         AND p.selection_key = c.selection_key
+    WHERE p.clv_captured = 1
+    ORDER BY p.id ASC
+"""
+
+
+class RollingStats:
+    """Últimos `size` valores con suma y suma de cuadrados."""
+
+    def __init__(self, size, values=()):
+        self.size   = size
+        self.values = deque(maxlen=size)
+        self.sum    = 0.0
+        self.sumsq  = 0.0
+        self._evictions = 0
+        for v in values:
+            self.push(v)
+
+    def push(self, x):
+        x = float(x)
+        if len(self.values) == self.size:
+            old = self.values[0]
+            self.sum   -= old
+            self.sumsq -= old * old
+            self._evictions += 1
+        self.values.append(x)
+        self.sum   += x
+        self.sumsq += x * x
+        # cada `size` desalojos se recalcula desde el buffer para que el
+        # error de redondeo de las restas no se acumule
+        if self._evictions >= self.size:
+            self._evictions = 0
+            self.sum   = math.fsum(self.values)
+            self.sumsq = math.fsum(v * v for v in self.values)
+
+    @property
+    def n(self):
+        return len(self.values)
+
+    def mean(self):
+        return self.sum / self.n if self.n else 0.0
+
+    def std(self):
+        """Desviación típica muestral (ddof=1)."""
+        n = self.n
+        if n < 2:
+            return 0.0
+        var = (self.sumsq - self.sum * self.sum / n) / (n - 1)
+        return math.sqrt(var) if var > 0 else 0.0
+
+    def sharpe(self, min_n=MIN_SHARPE_SAMPLE):
+        if self.n < min_n:
+            return 0.0
+        std = self.std()
+        return self.mean() / std if std > 0 else 0.0
+
+
+class ClvStats:
+    def __init__(self):
+        self.db      = None
+        self.markets = {}
+        self.global_mean   = RollingStats(CLV_WINDOW_MARKET)
+        self.global_sharpe = RollingStats(CLV_WINDOW_SHARPE)
+        self._lock   = threading.Lock()
+
+    def _windows(self):
+        yield GLOBAL_SCOPE, self.global_mean
+        yield GLOBAL_SCOPE, self.global_sharpe
+        for market, stats in self.markets.items():
+            yield market, stats
+
+    # ── persistencia ─────────────────────────────────────────
+    def attach(self, db_path):
+        self.db = get_db(db_path)
+        self.load()
+
+    def load(self):
+        """Lee clv_rolling; si está vacía la reconstruye desde el histórico."""
+        try:
+            rows = self.db.fetchall("SELECT scope, size, clvs FROM clv_rolling")
+        except:
+            return
+        with self._lock:
+            self.markets = {}
+            self.global_mean   = RollingStats(CLV_WINDOW_MARKET)
+            self.global_sharpe = RollingStats(CLV_WINDOW_SHARPE)
+            if not rows:
+                self._rebuild()
+            for scope, size, clvs in rows:
+                values = json.loads(clvs)
+                if scope != GLOBAL_SCOPE:
+                    self.markets[scope] = RollingStats(CLV_WINDOW_MARKET, values)
+                elif size == CLV_WINDOW_SHARPE:
+                    self.global_sharpe = RollingStats(CLV_WINDOW_SHARPE, values)
+                else:
+                    self.global_mean = RollingStats(CLV_WINDOW_MARKET, values)
+        if not rows:
+            self.save()
+
+    def _rebuild(self):
+        for market, clv in self.db.fetchall(_HISTORY_SQL):
+            self._push(market, clv)
+
+    def save(self):
+        """Escribe las ventanas (dentro de la transacción abierta, si la hay)."""
+        now = datetime.now(timezone.utc).isoformat()
+        with self._lock:
+            rows = [(scope, w.size, json.dumps(list(w.values)), w.sum, w.sumsq, now)
+                    for scope, w in self._windows()]
+        try:
+            self.db.executemany(
+                "INSERT OR REPLACE INTO clv_rolling "
+                "(scope, size, clvs, sum, sumsq, updated_at) VALUES (?,?,?,?,?,?)",
+                rows
+            )
+        except:
+            pass
+
+    # ── actualización ────────────────────────────────────────
+    def _push(self, market, clv):
+        if clv is None:
+            return
+        self.markets.setdefault(market, RollingStats(CLV_WINDOW_MARKET)).push(clv)
+        self.global_mean.push(clv)
+        self.global_sharpe.push(clv)
+
+    def push(self, market, odd_open, odd_close):
+        if not odd_open:
+            return
+        with self._lock:
+            self._push(market, (odd_open - odd_close) / odd_open)
+
+    # ── consultas O(1) ───────────────────────────────────────
+    def mean(self, market=None):
+        with self._lock:
+            if market is None:
+                return self.global_mean.mean()
+            stats = self.markets.get(market)
+            return stats.mean() if stats else 0.0
+
+    def sharpe(self):
+        with self._lock:
+            return self.global_sharpe.sharpe()
+
+    def std(self, market=None):
+        with self._lock:
+            if market is None:
+                return self.global_mean.std()
+            stats = self.markets.get(market)
+            return stats.std() if stats else 0.0
+
+
+CLV_STATS = ClvStats()
@@ -0,0 +1,174 @@
+# ============================================================
+# MÓDULO: DB — Conexión SQLite persistente por hilo
+# Versión: 1.0 | Compatible con quant_v5.db
+# ============================================================
+#
+# Antes cada función abría y cerraba su propio sqlite3.connect() y
+# hacía commit de una sola fila (log_rejection, team_xg_cache...).
+# Con journal_mode=DELETE eso es un fsync por fila.
+#
+#   - Una conexión por hilo y por fichero, abierta una vez y
+#     reutilizada (sqlite3 no deja compartir conexión entre hilos
+#     del scan async).
+#   - WAL + synchronous=NORMAL: los lectores no bloquean al
+#     escritor y un commit ya no fuerza fsync (solo el checkpoint).
+#   - Sentencias preparadas: la conexión persistente conserva su
+#     caché de sentencias (STATEMENT_CACHE), así que el mismo SQL
+#     con otros parámetros no se vuelve a compilar.
+#   - Autocommit por defecto; unit_of_work() agrupa en UNA
+#     transacción todas las escrituras del bloque:
+#
+#         with DB.unit_of_work():
+#             log_rejection(...)        # 200 filas → 1 commit
+#             ...
+#
+#     Un unit_of_work anidado es un SAVEPOINT dentro del exterior.
+#     Si el bloque lanza excepción se deshace lo escrito en él.
+#   - La conexión vive lo que su hilo: al terminar, threading.local
+#     suelta su _Holder y weakref.finalize la cierra y la saca de
+#     _conns. Los pools del scan (asyncio.run, ThreadPoolExecutor)
+#     crean hilos nuevos en cada pasada y antes dejaban una conexión
+#     y sus descriptores abiertos por hilo.
+# ============================================================
+
+import sqlite3
+import threading
+import weakref
+from contextlib import contextmanager
+
+
+# ── CONSTANTES ───────────────────────────────────────────────
+BUSY_TIMEOUT_MS = 5000
+CACHE_SIZE_KB   = 16384     # caché de páginas por conexión
+STATEMENT_CACHE = 256
+
+PRAGMAS = [
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    f"PRAGMA cache_size=-{CACHE_SIZE_KB}",
+    "PRAGMA temp_store=MEMORY",
+    f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}",
+]
+
+
+class _Holder:
+    """Conexión de un hilo; threading.local la suelta al acabar el hilo."""
+    __slots__ = ("conn", "__weakref__")
+
+    def __init__(self, conn):
+        self.conn = conn
+
+
+class Database:
+    def __init__(self, path):
+        self.path   = path
+        self._local = threading.local()
+        self._conns = []
+        self._lock  = threading.Lock()
+        self._closed_changes = 0    # total_changes de conexiones ya cerradas
+
+    # ── conexión ─────────────────────────────────────────────
+    def connection(self):
+        """Conexión del hilo actual; se abre y configura la primera vez."""
+        holder = getattr(self._local, "holder", None)
+        if holder is None:
+            conn = sqlite3.connect(self.path, isolation_level=None,
+                                   timeout=BUSY_TIMEOUT_MS / 1000,
+                                   cached_statements=STATEMENT_CACHE,
+                                   check_same_thread=False)
+            for pragma in PRAGMAS:
+                conn.execute(pragma)
+            holder = self._local.holder = _Holder(conn)
+            self._local.depth = 0
+            with self._lock:
+                self._conns.append(conn)
+            weakref.finalize(holder, self._release, conn)
+        return holder.conn
+
+    def _release(self, conn):
+        """Cierra la conexión de un hilo que ya terminó."""
+        with self._lock:
+            if conn not in self._conns:
+                return              # ya la cerró close_all()
+            self._conns.remove(conn)
+            self._closed_changes += conn.total_changes
+        try:
+            conn.close()
+        except:
+            pass
+
+    def close_all(self):
+        """Cierra las conexiones de todos los hilos (salida / tests)."""
+        with self._lock:
+            conns, self._conns = self._conns, []
+            self._closed_changes += sum(c.total_changes for c in conns)
+        for conn in conns:
+            try:
+                conn.close()
+            except:
+                pass
+        self._local = threading.local()
+
+    def open_connections(self):
+        return len(self._conns)
+
+    def total_changes(self):
+        """Filas escritas por todas las conexiones, también las ya cerradas."""
+        with self._lock:
+            return self._closed_changes + sum(c.total_changes for c in self._conns)
+
+    # ── acceso ───────────────────────────────────────────────
+    def execute(self, sql, params=()):
+        return self.connection().execute(sql, params)
+
+    def executemany(self, sql, rows):
+        return self.connection().executemany(sql, rows)
+
+    def fetchone(self, sql, params=()):
+        return self.connection().execute(sql, params).fetchone()
+
+    def fetchall(self, sql, params=()):
+        return self.connection().execute(sql, params).fetchall()
+
+    @contextmanager
+    def unit_of_work(self):
+        """
+        Una transacción para todas las escrituras del bloque (por hilo).
+        Anidado → SAVEPOINT: un fallo interno deshace solo su parte.
+        """
+        conn  = self.connection()
+        depth = self._local.depth
+        if depth:
+            name = f"uow_{depth}"
+            conn.execute(f"SAVEPOINT {name}")
+        else:
+            conn.execute("BEGIN IMMEDIATE")
+        self._local.depth = depth + 1
+        try:
+            yield conn
+        except:
+            self._local.depth = depth
+            if depth:
+                conn.execute(f"ROLLBACK TO {name}")
+                conn.execute(f"RELEASE {name}")
+            else:
+                conn.rollback()
+            raise
+        self._local.depth = depth
+        if depth:
+            conn.execute(f"RELEASE {name}")
+        else:
+            conn.commit()
+
+
+_DATABASES = {}
+_DATABASES_LOCK = threading.Lock()
+
+
+def get_db(path):
+    """Database compartida del proceso para ese fichero."""
+    with _DATABASES_LOCK:
+        db = _DATABASES.get(path)
+        if db is None:
+            db = _DATABASES[path] = Database(path)
+        return db
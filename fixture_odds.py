@@ -0,0 +1,97 @@
+# ============================================================
+# MÓDULO: FIXTURE ODDS — Cuotas parseadas de un partido
+# Versión: 1.0 | Compatible con main.py V5.13
+# ============================================================
+#
+# La lista `bets` de API-Sports trae las cuotas como strings y se
+# recorría entera (y se volvía a hacer float()) en validate_xg, en
+# build_market_probs por cada bet id y en las capturas de CLV
+# comparando f"{bet_id}|{value}".
+#
+# FixtureOdds se construye UNA vez por partido y bookmaker:
+#
+#   (bet_id, value) → (odd, implied)      implied = 1 / odd
+#
+# con value normalizado a str, así que la selection_key de
+# picks_log ("5|Over 2.5") resuelve en O(1) con by_key(). Las
+# entradas conservan el orden de la API (items()) para los
+# snapshots y para build_market_probs. Cuotas no numéricas o <= 0 se
+# descartan al parsear; si la API repite una selección vale la
+# última (como el recorrido de `bets` de antes) y ocupa su posición.
+#
+#   odds = FixtureOdds.from_bets(bets)
+#   odds.odd(5, "Over 2.5")        → 1.95 | None
+#   odds.by_key("1|Home")          → (2.10, 0.476...) | None
+# ============================================================
+
+
+def selection_key(bet_id, value):
+    return f"{bet_id}|{value}"
+
+
+class FixtureOdds:
+    __slots__ = ("bookmaker", "_odds", "_names")
+
+    def __init__(self, bookmaker=None):
+        self.bookmaker = bookmaker
+        self._odds  = {}      # (bet_id, value) → (odd, implied)
+        self._names = {}      # bet_id → nombre de la apuesta
+
+    @classmethod
+    def from_bets(cls, bets, bookmaker=None):
+        odds = cls(bookmaker)
+        for b in bets or ():
+            try:
+                bid = b["id"]
+                values = b["values"]
+            except (KeyError, TypeError):
+                continue
+            odds._names.setdefault(bid, b.get("name"))
+            for v in values:
+                try:
+                    odd = float(v["odd"])
+                    key = (bid, str(v["value"]))
+                except (KeyError, TypeError, ValueError):
+                    continue
+                if odd > 0:
+                    odds._odds.pop(key, None)
+                    odds._odds[key] = (odd, 1.0 / odd)
+        return odds
+
+    # ── consultas ────────────────────────────────────────────
+    def get(self, bet_id, value):
+        """(odd, implied) o None."""
+        return self._odds.get((bet_id, value))
+
+    def odd(self, bet_id, value):
+        hit = self._odds.get((bet_id, value))
+        return hit[0] if hit else None
+
+    def implied(self, bet_id, value):
+        hit = self._odds.get((bet_id, value))
+        return hit[1] if hit else None
+
+    def by_key(self, skey):
+        """Resuelve una selection_key 'bet_id|value' de picks_log."""
+        bid, sep, value = skey.partition("|")
+        if not sep:
+            return None
+        try:
+            return self._odds.get((int(bid), value))
+        except ValueError:
+            return None
+
+    def bet_name(self, bet_id):
+        return self._names.get(bet_id)
+
+    def items(self):
+        """(bet_id, bet_name, value, odd, implied) en el orden de la API."""
+        for (bid, value), (odd, implied) in self._odds.items():
+            yield bid, self._names.get(bid), value, odd, implied
+
+    def __len__(self):
+        return len(self._odds)
+
+    def __bool__(self):
+        return bool(self._odds)
+
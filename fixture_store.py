@@ -0,0 +1,239 @@
+# ============================================================
+# MÓDULO: FIXTURE STORE — Cache persistente de /fixtures?date=
+# Versión: 1.0 | Compatible con quant_v5.db
+# ============================================================
+#
+# Sustituye al dict _DATE_FIXTURES_CACHE. Cada día pedido a la API
+# se guarda comprimido (zlib + JSON) en la tabla fixtures_by_date
+# de quant_v5.db, así que un redeploy o un crash ya no obliga a
+# volver a pedir hasta MAX_DAYS_BACK_XG días para el xG.
+#
+# POLÍTICA:
+#   - Día pasado con todos los partidos en estado final → INMUTABLE.
+#     Nunca caduca ni se vuelve a pedir.
+#   - Hoy, futuro, o pasado con partidos sin cerrar → caduca a las
+#     FIXTURES_TTL_MIN minutos desde que se pidió.
+#
+# La carga es perezosa: attach() solo lee el índice (fecha,
+# inmutable, fetched_at); el payload se descomprime la primera vez
+# que se pide ese día.
+#
+# ÍNDICE POR EQUIPO:
+#   Cada día que entra en memoria alimenta un índice invertido
+#   team_id → [(fecha, seq, league_id, gf, ga, status, fixture_id)]
+#   ordenado por fecha. Los últimos N resultados de un equipo son
+#   una búsqueda bisect, no un recorrido de cientos de fixtures por
+#   día hacia atrás.
+# ============================================================
+
+import os
+import json
+import time
+import zlib
+import bisect
+import threading
+from datetime import datetime, timedelta
+
+from db import get_db
+
+
+# ── CONSTANTES ───────────────────────────────────────────────
+FIXTURES_TTL_MIN   = int(os.getenv("FIXTURES_TTL_MIN", "120"))
+FIXTURES_KEEP_DAYS = 120    # días pasados que se conservan en disco
+FINAL_STATUSES     = {"FT", "AET", "PEN", "PST", "CANC", "ABD", "AWD", "WO"}
+
+
+def _today():
+    return datetime.now().strftime("%Y-%m-%d")
+
+
+def is_day_final(d, fixtures):
+    if d >= _today() or not fixtures:
+        return False
+    return all(f["fixture"]["status"]["short"] in FINAL_STATUSES for f in fixtures)
+
+
+class FixtureStore:
+    def __init__(self, ttl_min=FIXTURES_TTL_MIN, clock=time.time):
+        self.ttl     = ttl_min * 60
+        self.clock   = clock
+        self.db      = None
+        self._mem    = {}   # fecha → lista de fixtures
+        self._meta   = {}   # fecha → (immutable, fetched_at), memoria + disco
+        self._index  = {}   # team_id → [(fecha, seq, league_id, gf, ga, status, fid)]
+        self._lock   = threading.RLock()
+
+    # ── persistencia ─────────────────────────────────────────
+    def attach(self, db_path):
+        self.db = get_db(db_path)
+        try:
+            rows = self.db.fetchall(
+                "SELECT date, immutable, fetched_at FROM fixtures_by_date"
+            )
+        except:
+            return
+        with self._lock:
+            for d, imm, ts in rows:
+                self._meta.setdefault(d, (bool(imm), ts))
+
+    def _load(self, d):
+        if not self.db:
+            return None
+        try:
+            row = self.db.fetchone(
+                "SELECT payload FROM fixtures_by_date WHERE date=?", (d,)
+            )
+            return json.loads(zlib.decompress(row[0])) if row else None
+        except:
+            return None
+
+    def _write(self, d, fixtures, immutable, ts):
+        if not self.db:
+            return
+        try:
+            blob = zlib.compress(json.dumps(fixtures, separators=(",", ":")).encode())
+            self.db.execute(
+                "INSERT OR REPLACE INTO fixtures_by_date "
+                "(date, payload, immutable, fetched_at) VALUES (?,?,?,?)",
+                (d, blob, int(immutable), ts)
+            )
+        except:
+            pass
+
+    def _delete(self, dates):
+        if not self.db or not dates:
+            return
+        try:
+            with self.db.unit_of_work():
+                self.db.executemany("DELETE FROM fixtures_by_date WHERE date=?",
+                                    [(d,) for d in dates])
+        except:
+            pass
+
+    # ── índice por equipo ────────────────────────────────────
+    def _unindex(self, d):
+        for fix in self._mem.get(d, ()):
+            for side in ("home", "away"):
+                entries = self._index.get(fix["teams"][side]["id"])
+                if not entries:
+                    continue
+                lo = bisect.bisect_left(entries, (d,))
+                hi = bisect.bisect_left(entries, (d + "\x00",))
+                del entries[lo:hi]
+
+    def _reindex(self, d, fixtures):
+        for seq, fix in enumerate(fixtures):
+            try:
+                h_id, a_id = fix["teams"]["home"]["id"], fix["teams"]["away"]["id"]
+                hg, ag     = fix["goals"]["home"], fix["goals"]["away"]
+                lid        = fix["league"]["id"]
+                st         = fix["fixture"]["status"]["short"]
+                fid        = fix["fixture"]["id"]
+            except (KeyError, TypeError):
+                continue
+            bisect.insort(self._index.setdefault(h_id, []), (d, seq, lid, hg, ag, st, fid))
+            bisect.insort(self._index.setdefault(a_id, []), (d, seq, lid, ag, hg, st, fid))
+
+    def _set_mem(self, d, fixtures):
+        self._unindex(d)
+        self._mem[d] = fixtures
+        self._reindex(d, fixtures)
+
+    def _drop_mem(self, d):
+        self._unindex(d)
+        self._mem.pop(d, None)
+
+    def team_results(self, team_id, after, until, league_id=None, status="FT"):
+        """
+        Resultados del equipo con after < fecha <= until, del más reciente
+        al más antiguo: [(fecha, league_id, gf, ga, status)].
+        Solo ve días ya cargados en memoria (ver load_days).
+        """
+        with self._lock:
+            entries = self._index.get(team_id)
+            if not entries:
+                return []
+            lo = bisect.bisect_left(entries, ((after or "") + "\x00",))
+            hi = bisect.bisect_left(entries, (until + "\x00",))
+            window = entries[lo:hi]
+        # sort estable: dentro del mismo día conserva el orden de la API
+        window = sorted(window, key=lambda e: e[0], reverse=True)
+        return [(e[0], e[2], e[3], e[4], e[5]) for e in window
+                if (status is None or e[5] == status)
+                and (league_id is None or e[2] == league_id)
+                and e[3] is not None and e[4] is not None]
+
+    def load_days(self, dates):
+        """Sube a memoria (e índice) los días frescos que solo están en disco."""
+        for d in dates:
+            with self._lock:
+                pending = self._fresh(d) and d not in self._mem
+            if pending:
+                self.get(d)
+
+    # ── acceso ───────────────────────────────────────────────
+    def _fresh(self, d):
+        meta = self._meta.get(d)
+        if meta is None:
+            return False
+        immutable, ts = meta
+        return immutable or (self.clock() - ts) < self.ttl
+
+    def __contains__(self, d):
+        with self._lock:
+            return self._fresh(d)
+
+    def get(self, d):
+        """Fixtures del día si están frescos (memoria o disco), si no None."""
+        with self._lock:
+            if not self._fresh(d):
+                return None
+            if d in self._mem:
+                return self._mem[d]
+        fixtures = self._load(d)
+        with self._lock:
+            if fixtures is None:
+                self._meta.pop(d, None)
+                return None
+            if d not in self._mem:
+                self._set_mem(d, fixtures)
+            return self._mem[d]
+
+    def put(self, d, fixtures):
+        immutable = is_day_final(d, fixtures)
+        ts        = self.clock()
+        with self._lock:
+            self._set_mem(d, fixtures)
+            self._meta[d] = (immutable, ts)
+        self._write(d, fixtures, immutable, ts)
+
+    def dates(self):
+        with self._lock:
+            return [d for d in self._meta if self._fresh(d)]
+
+    # ── políticas de limpieza ────────────────────────────────
+    def expire_mutable(self, past_only=False):
+        """Descarta los días no inmutables (solo pasados si past_only)."""
+        today = _today()
+        with self._lock:
+            drop = [d for d, (imm, _) in self._meta.items()
+                    if not imm and (not past_only or d < today)]
+            for d in drop:
+                self._meta.pop(d, None)
+                self._drop_mem(d)
+        self._delete(drop)
+        return drop
+
+    def prune(self, keep_days=FIXTURES_KEEP_DAYS):
+        """Borra de disco y memoria los días más viejos que keep_days."""
+        cutoff = (datetime.now() - timedelta(days=keep_days)).strftime("%Y-%m-%d")
+        with self._lock:
+            drop = [d for d in self._meta if d < cutoff]
+            for d in drop:
+                self._meta.pop(d, None)
+                self._drop_mem(d)
+        self._delete(drop)
+        return drop
+
+
+FIXTURE_STORE = FixtureStore()
@@ -0,0 +1,145 @@
+# ============================================================
+# MÓDULO: HTTP CLIENT — Sesiones keep-alive con pool por host
+# Versión: 1.0 | Compatible con main.py V5.13
+# ============================================================
+#
+# Todas las llamadas HTTP del bot (API-Sports y Telegram) pasan
+# por aquí. Cada host tiene UNA requests.Session con pool de
+# conexiones, así que el handshake TCP+TLS se paga una vez por
+# proceso y no una vez por request.
+#
+# Timeouts y política de reintentos viven en un único sitio:
+#   - API-Sports (GET): reintentos con backoff en errores de
+#     conexión y 5xx.
+#   - Telegram (POST): solo reintenta errores de conexión; un
+#     read timeout podría haber entregado ya el mensaje y
+#     reintentarlo lo duplicaría.
+#
+# RATE LIMIT / PRESUPUESTO:
+#   Cada GET a API-Sports pasa por budget.GOVERNOR (token bucket
+#   por minuto + cuota diaria) antes de salir, y sus cabeceras de
+#   cuota se le devuelven al volver. Es compartido por todos los
+#   hilos del proceso y sustituye a los time.sleep() fijos.
+#
+# requests/urllib3 se importan al crear la primera sesión, no al
+# importar el módulo (arranque en frío).
+#
+# MÉTRICAS:
+#   add_hook(fn) registra fn(host, method, path, status, elapsed)
+#   get_stats() devuelve contadores por host.
+# ============================================================
+
+import os
+import time
+import threading
+from urllib.parse import urlsplit
+
+from budget import GOVERNOR
+
+
+# ── CONSTANTES ───────────────────────────────────────────────
+API_BASE      = os.getenv("API_SPORTS_BASE", "https://v3.football.api-sports.io")
+TELEGRAM_BASE = os.getenv("TELEGRAM_BASE", "https://api.telegram.org")
+
+DEFAULT_TIMEOUT = 10      # segundos
+POOL_SIZE       = 16      # conexiones keep-alive por host
+RETRY_TOTAL     = 3
+RETRY_BACKOFF   = 0.5     # 0.5s, 1s, 2s
+RETRY_STATUS    = (500, 502, 503, 504)
+
+_SESSIONS: dict = {}
+_LOCK  = threading.Lock()
+_HOOKS = []
+_STATS: dict = {}
+
+
+def _retry_policy(base):
+    from urllib3.util.retry import Retry
+    if base == TELEGRAM_BASE:
+        return Retry(total=2, connect=2, read=0, status=0,
+                     backoff_factor=RETRY_BACKOFF, raise_on_status=False)
+    return Retry(total=RETRY_TOTAL, backoff_factor=RETRY_BACKOFF,
+                 status_forcelist=RETRY_STATUS,
+                 allowed_methods=frozenset({"GET"}),
+                 raise_on_status=False)
+
+
+def get_session(base=API_BASE):
+    """Devuelve la sesión compartida del host, creándola la primera vez."""
+    s = _SESSIONS.get(base)
+    if s is not None:
+        return s
+    with _LOCK:
+        s = _SESSIONS.get(base)
+        if s is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+            s = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE,
+                                  max_retries=_retry_policy(base))
+            s.mount("https://", adapter)
+            s.mount("http://", adapter)
+            _SESSIONS[base] = s
+    return s
+
+
+def close_sessions():
+    with _LOCK:
+        for s in _SESSIONS.values():
+            s.close()
+        _SESSIONS.clear()
+
+
+def add_hook(fn):
+    """Registra fn(host, method, path, status, elapsed) tras cada request."""
+    _HOOKS.append(fn)
+
+
+def get_stats():
+    with _LOCK:
+        return {h: dict(v) for h, v in _STATS.items()}
+
+
+def _record(base, method, path, status, elapsed):
+    host = urlsplit(base).netloc
+    with _LOCK:
+        st = _STATS.setdefault(host, {"requests": 0, "errors": 0, "seconds": 0.0})
+        st["requests"] += 1
+        st["seconds"]  += elapsed
+        if status is None or status >= 400:
+            st["errors"] += 1
+    for fn in list(_HOOKS):
+        try:
+            fn(host, method, path, status, elapsed)
+        except:
+            pass
+
+
+def _send(base, method, path, timeout=DEFAULT_TIMEOUT, label=None, **kwargs):
+    t0     = time.monotonic()
+    status = None
+    try:
+        r = get_session(base).request(method, base + path, timeout=timeout, **kwargs)
+        status = r.status_code
+        return r
+    finally:
+        _record(base, method, label or path, status, time.monotonic() - t0)
+
+
+def api_get(path, headers, params=None, timeout=DEFAULT_TIMEOUT):
+    """GET contra API-Sports. path con '/' inicial, p.ej. '/fixtures'.
+
+    Lanza budget.BudgetExceeded si no queda cuota (diaria o de la reserva).
+    """
+    GOVERNOR.acquire()
+    r = _send(API_BASE, "GET", path, timeout=timeout,
+              headers=headers, params=params)
+    GOVERNOR.observe(r.headers)
+    return r
+
+
+def telegram_post(token, method, payload, timeout=DEFAULT_TIMEOUT):
+    """POST a la Bot API de Telegram, p.ej. method='sendMessage'."""
+    # label sin token: los hooks de métricas nunca ven el secreto
+    return _send(TELEGRAM_BASE, "POST", f"/bot{token}/{method}",
+                 timeout=timeout, label=f"/bot/{method}", json=payload)
@@ -0,0 +1,309 @@
+# ============================================================
+# MÓDULO: JOB RUNNER — Planificador con pool de workers
+# Versión: 1.0 | Compatible con main.py V5.13
+# ============================================================
+#
+# schedule.run_pending() ejecutaba todos los jobs en el hilo
+# principal: un scan de varios minutos a las 09:00 retrasaba las
+# capturas de cierre de los partidos de esa franja.
+#
+# JobRunner:
+#   - pool de WORKERS hilos; el bucle principal solo despacha
+#   - un job no se solapa consigo mismo; los jobs con el mismo
+#     `group` (p.ej. "api" para scan/warmups) tampoco entre sí
+#   - prioridad: a igualdad de vencimiento sale antes el número
+#     menor, y RESERVED_WORKERS hilos quedan solo para jobs con
+#     prioridad <= PRIORITY_URGENT → una captura de cierre nunca
+#     espera a que acabe un warmup
+#   - catch-up: una ejecución que vence mientras el job corre (o
+#     con el proceso parado/dormido) se ejecuta UNA vez en cuanto se
+#     puede; los periodos saltados se cuentan en `missed`
+#   - estadísticas por job: runs, fallos, duración última/media/máx,
+#     retraso sobre la hora prevista
+#   - reloj inyectable: run_pending() despacha con clock() y devuelve
+#     los segundos hasta el siguiente vencimiento; con FakeClock +
+#     wait_idle() se prueba sin esperar (ver check_job_runner.py)
+#
+#   runner = JobRunner()
+#   runner.daily("scan", bot.run_daily_scan, "09:00", PRIORITY_SCAN, group="api")
+#   runner.source("closing", bot.closing.run_due, bot.closing.seconds_until_due,
+#                 PRIORITY_CLOSING)
+#   runner.run_forever()
+# ============================================================
+
+import time
+import heapq
+import itertools
+import threading
+import traceback
+from datetime import datetime, timedelta
+
+
+# ── CONSTANTES ───────────────────────────────────────────────
+WORKERS          = 3
+RESERVED_WORKERS = 1        # hilos que solo toman jobs urgentes
+MAX_IDLE_S       = 3600.0   # el bucle se despierta al menos cada hora
+
+PRIORITY_CLOSING = 0
+PRIORITY_CAPTURE = 1
+PRIORITY_URGENT  = PRIORITY_CAPTURE
+PRIORITY_SCAN    = 2
+PRIORITY_WARMUP  = 3
+
+WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+
+
+class FakeClock:
+    """Reloj manual para pruebas: time() fijo hasta advance()."""
+    def __init__(self, start=None):
+        self.now = time.time() if start is None else float(start)
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+        return self.now
+
+
+# ── calendarios ──────────────────────────────────────────────
+def _at(ts, hhmm):
+    h, m = (int(x) for x in hhmm.split(":"))
+    return datetime.fromtimestamp(ts).replace(hour=h, minute=m, second=0, microsecond=0)
+
+
+def every(seconds):
+    return lambda ts: ts + seconds
+
+
+def daily_at(hhmm):
+    def nxt(ts):
+        t = _at(ts, hhmm)
+        if t.timestamp() <= ts:
+            t += timedelta(days=1)
+        return t.timestamp()
+    return nxt
+
+
+def weekly_at(weekday, hhmm):
+    wd = WEEKDAYS.index(weekday.lower())
+
+    def nxt(ts):
+        t = _at(ts, hhmm) + timedelta(days=(wd - datetime.fromtimestamp(ts).weekday()) % 7)
+        if t.timestamp() <= ts:
+            t += timedelta(days=7)
+        return t.timestamp()
+    return nxt
+
+
+class JobStats:
+    __slots__ = ("runs", "failures", "missed", "last_s", "total_s", "max_s",
+                 "last_late_s", "last_start", "last_error")
+
+    def __init__(self):
+        self.runs = self.failures = self.missed = 0
+        self.last_s = self.total_s = self.max_s = self.last_late_s = 0.0
+        self.last_start = None
+        self.last_error = None
+
+    @property
+    def mean_s(self):
+        return self.total_s / self.runs if self.runs else 0.0
+
+    def as_dict(self):
+        d = {k: getattr(self, k) for k in self.__slots__}
+        d["mean_s"] = self.mean_s
+        return d
+
+
+class Job:
+    def __init__(self, name, fn, priority, next_after=None, due_in=None,
+                 group=None, first=None):
+        self.name       = name
+        self.fn         = fn
+        self.priority   = priority
+        self.next_after = next_after        # ts → siguiente ts (calendario)
+        self.due_in     = due_in            # () → segundos | None (fuente externa)
+        self.group      = group
+        self.next_run   = first
+        self.running    = False
+        self.stats      = JobStats()
+
+    def due_at(self, now):
+        if self.due_in is not None:
+            wait = self.due_in()
+            return None if wait is None else now + max(wait, 0.0)
+        return self.next_run
+
+
+class JobRunner:
+    def __init__(self, workers=WORKERS, reserved=RESERVED_WORKERS, clock=time.time):
+        self.clock     = clock
+        self.workers   = max(workers, reserved + 1)
+        self.reserved  = reserved
+        self.jobs      = {}
+        self._queue    = []                 # (priority, seq, job) listos para un worker
+        self._seq      = itertools.count()
+        self._busy     = 0
+        self._busy_low = 0
+        self._groups   = set()              # grupos con un job en marcha
+        self._cv       = threading.Condition()
+        self._wake     = threading.Event()
+        self._threads  = []
+        self._stopped  = False
+
+    # ── registro ─────────────────────────────────────────────
+    def _add(self, job):
+        with self._cv:
+            self.jobs[job.name] = job
+        self.wake()
+        return job
+
+    def every(self, name, fn, seconds, priority=PRIORITY_WARMUP, group=None):
+        nxt = every(seconds)
+        return self._add(Job(name, fn, priority, nxt, group=group, first=nxt(self.clock())))
+
+    def daily(self, name, fn, hhmm, priority=PRIORITY_WARMUP, group=None):
+        nxt = daily_at(hhmm)
+        return self._add(Job(name, fn, priority, nxt, group=group, first=nxt(self.clock())))
+
+    def weekly(self, name, fn, weekday, hhmm, priority=PRIORITY_WARMUP, group=None):
+        nxt = weekly_at(weekday, hhmm)
+        return self._add(Job(name, fn, priority, nxt, group=group, first=nxt(self.clock())))
+
+    def source(self, name, fn, due_in, priority=PRIORITY_CLOSING, group=None):
+        """Job cuyo vencimiento decide otro objeto (p.ej. ClosingScheduler)."""
+        return self._add(Job(name, fn, priority, due_in=due_in, group=group))
+
+    def once(self, name, fn, priority=PRIORITY_SCAN, group=None):
+        """Ejecución única lo antes posible (arranque)."""
+        return self._add(Job(name, fn, priority, group=group, first=self.clock()))
+
+    # ── workers ──────────────────────────────────────────────
+    def _start_workers(self):
+        while len(self._threads) < self.workers:
+            t = threading.Thread(target=self._worker, name=f"job-{len(self._threads)}",
+                                 daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def _worker(self):
+        while True:
+            with self._cv:
+                while not self._queue and not self._stopped:
+                    self._cv.wait()
+                if self._stopped and not self._queue:
+                    return
+                _, _, job, planned = heapq.heappop(self._queue)
+            self._run(job, planned)
+
+    def _run(self, job, planned):
+        st    = job.stats
+        start = self.clock()
+        t0    = time.perf_counter()
+        ok    = True
+        try:
+            job.fn()
+        except Exception as e:
+            ok = False
+            st.last_error = f"{type(e).__name__}: {e}"
+            print(f"  ❌ job {job.name}: {st.last_error}")
+            traceback.print_exc()
+        elapsed = time.perf_counter() - t0
+        with self._cv:
+            st.runs       += 1
+            st.failures   += 0 if ok else 1
+            st.last_s      = elapsed
+            st.total_s    += elapsed
+            st.max_s       = max(st.max_s, elapsed)
+            st.last_start  = start
+            st.last_late_s = max(start - planned, 0.0) if planned is not None else 0.0
+            job.running    = False
+            self._busy    -= 1
+            if job.priority > PRIORITY_URGENT:
+                self._busy_low -= 1
+            self._groups.discard(job.group)
+            self._cv.notify_all()
+        if job.due_in is None:
+            print(f"  ⏱️  job {job.name}: {elapsed:.1f}s ({'ok' if ok else 'error'})")
+        self.wake()
+
+    # ── despacho ─────────────────────────────────────────────
+    def _can_start(self, job):
+        if job.running or (job.group is not None and job.group in self._groups):
+            return False
+        if self._busy >= self.workers:
+            return False
+        if job.priority > PRIORITY_URGENT and self._busy_low >= self.workers - self.reserved:
+            return False
+        return True
+
+    def _dispatch(self, job, now, planned):
+        job.running = True
+        self._busy += 1
+        if job.priority > PRIORITY_URGENT:
+            self._busy_low += 1
+        if job.group is not None:
+            self._groups.add(job.group)
+        if job.next_after is not None:
+            # catch-up: una sola ejecución aunque se saltaran varios periodos
+            nxt = job.next_after(job.next_run)
+            while nxt <= now:
+                job.stats.missed += 1
+                nxt = job.next_after(nxt)
+            job.next_run = nxt
+        elif job.due_in is None:
+            job.next_run = None                       # once()
+        heapq.heappush(self._queue, (job.priority, next(self._seq), job, planned))
+
+    def run_pending(self):
+        """Despacha lo vencido; devuelve segundos hasta el próximo vencimiento."""
+        self._start_workers()
+        now = self.clock()
+        with self._cv:
+            due, upcoming = [], []
+            for job in self.jobs.values():
+                at = job.due_at(now)
+                if at is None:
+                    continue
+                (due if at <= now else upcoming).append((job.priority, at, job))
+            due.sort(key=lambda x: (x[0], x[1]))
+            for _, at, job in due:
+                if self._can_start(job):
+                    self._dispatch(job, now, at)
+            self._cv.notify_all()
+        waits = [at - now for _, at, job in upcoming]
+        return min(waits) if waits else None
+
+    def wake(self):
+        self._wake.set()
+
+    def wait_idle(self, timeout=None):
+        """Espera a que no quede nada en cola ni en marcha (pruebas)."""
+        with self._cv:
+            return self._cv.wait_for(lambda: not self._queue and not self._busy, timeout)
+
+    def run_forever(self):
+        while not self._stopped:
+            wait = self.run_pending()
+            self._wake.wait(MAX_IDLE_S if wait is None else min(max(wait, 0.05), MAX_IDLE_S))
+            self._wake.clear()
+
+    def stop(self):
+        with self._cv:
+            self._stopped = True
+            self._cv.notify_all()
+        self.wake()
+
+    # ── informes ─────────────────────────────────────────────
+    def stats(self):
+        with self._cv:
+            return {name: job.stats.as_dict() for name, job in self.jobs.items()}
+
+    def report(self):
+        lines = []
+        for name, s in self.stats().items():
+            lines.append(f"  {name:<14} runs={s['runs']:<4} fallos={s['failures']:<3} "
+                         f"perdidas={s['missed']:<3} media={s['mean_s']:.1f}s "
+                         f"máx={s['max_s']:.1f}s retraso={s['last_late_s']:.0f}s")
+        return "\n".join(lines)
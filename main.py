@@ -1,13 +1,25 @@
 import os
-import time
 import json
-import requests
-import schedule
-import sqlite3
-import numpy as np
+import threading
 import math
+import contextvars
 from datetime import datetime, timedelta, timezone
-from math import exp, lgamma, log
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from http_client import api_get, telegram_post
+from budget import GOVERNOR, BudgetExceeded
+from fixture_store import FIXTURE_STORE
+from db import get_db
+from clv_stats import CLV_STATS
+from closing_scheduler import ClosingScheduler
+from job_runner import (JobRunner, PRIORITY_CLOSING, PRIORITY_CAPTURE,
+                        PRIORITY_SCAN, PRIORITY_WARMUP)
+from odds_loader import OddsIndex
+from fixture_odds import FixtureOdds, selection_key
+from xg_series import (SERIES_MAX, pack_series, pack_goals, pack_days, pack_leagues,
+                       unpack_goals, unpack_days, XgMatrix)
+from xg_state import XgState
+from scan_planner import plan_scan, league_yields, XG_GAP_DAYS
 
 # ==========================================
 # V5.13 EUROPEAN QUANT FUND
@@ -54,24 +66,8 @@ TELEGRAM_CHAT_ID = os.getenv("TELEGRAM_CHAT_ID", "")
 API_SPORTS_KEY   = os.getenv("API_SPORTS_KEY", "")
 
 DB_DIR = os.getenv("DB_DIR", "./data")
-os.makedirs(DB_DIR, exist_ok=True)
 DB_PATH = os.path.join(DB_DIR, "quant_v5.db")
-
-# Diagnóstico de DB al arrancar
-print(f"  📂 DB_DIR={DB_DIR} | DB_PATH={DB_PATH}")
-print(f"  📂 DB existe: {os.path.exists(DB_PATH)} | Tamaño: {os.path.getsize(DB_PATH) if os.path.exists(DB_PATH) else 0} bytes")
-try:
-    _chk = sqlite3.connect(DB_PATH)
-    _xg  = _chk.execute("SELECT COUNT(*) FROM team_xg_cache").fetchone()[0] \
-           if _chk.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='team_xg_cache'").fetchone() \
-           else "tabla no existe"
-    _pk  = _chk.execute("SELECT COUNT(*) FROM picks_log").fetchone()[0] \
-           if _chk.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='picks_log'").fetchone() \
-           else "tabla no existe"
-    _chk.close()
-    print(f"  📂 team_xg_cache={_xg} registros | picks_log={_pk} registros")
-except Exception as _e:
-    print(f"  📂 DB check error: {_e}")
+DB      = get_db(DB_PATH)
 
 # ── Horarios ────────────────────────────────────────────────────────────────
 RUN_TIME_SCAN       = "09:00"   # D-1: cuotas líquidas, ~30h antes del KO
@@ -134,233 +130,374 @@ MIN_EV_THRESHOLD        = 0.015
 MAX_EV_THRESHOLD        = 0.15
 MAX_PICKS_PER_FIXTURE   = 1
 XG_DECAY_FACTOR         = 0.85
+XG_DECAY_MODE           = os.getenv("XG_DECAY_MODE", "index")  # "index" | "days" (xg_state.py)
+XG_HALF_LIFE_DAYS       = float(os.getenv("XG_HALF_LIFE_DAYS", "45"))
 XG_CACHE_TTL_HOURS      = 20
 MAX_FIXTURES_PER_SCAN   = 40
 MAX_DAYS_BACK_XG        = 90
+XG_WARMUP_BUDGET        = 44    # techo duro de weekly_xg_cache
+SCAN_XG_RESERVE         = 10    # margen de xG sobre odds+injuries en el scan
+ASYNC_SCAN              = os.getenv("ASYNC_SCAN", "1") == "1"
+SCAN_CONCURRENCY        = int(os.getenv("SCAN_CONCURRENCY", "6"))
+BULK_ODDS               = os.getenv("BULK_ODDS", "1") == "1"
+SCAN_PLANNER            = os.getenv("SCAN_PLANNER", "1") == "1"   # scan_planner.py
+SCAN_PLAN_RESERVE       = 3     # /fixtures del ingest al final del scan
+INJURY_PREFILTER        = os.getenv("INJURY_PREFILTER", "1") == "1"  # /injuries solo si puede cambiar algo
+INJURY_XG_STEP          = 0.015   # −xG por lesionado
+INJURY_XG_CAP           = 0.08    # tope del ajuste por lesiones
+INJURY_LEVELS           = range(math.ceil(INJURY_XG_CAP / INJURY_XG_STEP) + 1)  # 0..6 (6+ = tope)
+LEAGUE_STATS_CONCURRENCY = int(os.getenv("LEAGUE_STATS_CONCURRENCY", "4"))
+LEAGUE_STATS_MAX_AGE_D  = 3     # stats de equipo reutilizables al reanudar un refresh
+LEAGUE_STATS_MIN_SHARE  = 0.8   # equipos con stats para actualizar los factores de la liga
 
 VOLATILITY_BUCKETS = {"OVER": 0.85, "UNDER": 0.85, "BTTS": 0.90, "1X2": 1.25}
 
-_DATE_FIXTURES_CACHE: dict = {}
+_DATE_FETCH_LOCKS: dict    = {}
+_DATE_LOCKS_GUARD          = threading.Lock()
 
 
 # ==========================================
 # DATABASE
 # ==========================================
 
+def db_diagnostics():
+    """Ruta, tamaño y registros de la DB (antes se hacía al importar main)."""
+    print(f"  📂 DB_DIR={DB_DIR} | DB_PATH={DB_PATH}")
+    print(f"  📂 DB existe: {os.path.exists(DB_PATH)} | Tamaño: "
+          f"{os.path.getsize(DB_PATH) if os.path.exists(DB_PATH) else 0} bytes")
+    try:
+        counts = []
+        for table in ("team_xg_cache", "picks_log"):
+            exists = DB.fetchone("SELECT name FROM sqlite_master WHERE type='table' AND name=?",
+                                 (table,))
+            counts.append(DB.fetchone(f"SELECT COUNT(*) FROM {table}")[0] if exists
+                          else "tabla no existe")
+        print(f"  📂 team_xg_cache={counts[0]} registros | picks_log={counts[1]} registros")
+    except Exception as e:
+        print(f"  📂 DB check error: {e}")
+
+
 def init_db():
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-
-    c.execute("""CREATE TABLE IF NOT EXISTS picks_log (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        fixture_id INTEGER, league TEXT,
-        home_team TEXT, away_team TEXT,
-        market TEXT, selection TEXT, selection_key TEXT,
-        odd_open REAL, prob_model REAL, ev_open REAL, stake_pct REAL,
-        xg_home REAL, xg_away REAL, xg_total REAL,
-        pick_time DATETIME, kickoff_time DATETIME,
-        clv_captured INTEGER DEFAULT 0,
-        urs REAL DEFAULT 0.0,
-        model_gap REAL DEFAULT 0.0,
-        xg_source TEXT DEFAULT 'predictions'
-    )""")
-    for col, defn in [
-        ("urs",        "REAL DEFAULT 0.0"),
-        ("model_gap",  "REAL DEFAULT 0.0"),
-        ("xg_source",  "TEXT DEFAULT 'predictions'"),
-    ]:
+    os.makedirs(DB_DIR, exist_ok=True)
+    with DB.unit_of_work() as conn:
+        c = conn.cursor()
+
+        c.execute("""CREATE TABLE IF NOT EXISTS picks_log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            fixture_id INTEGER, league TEXT,
+            home_team TEXT, away_team TEXT,
+            market TEXT, selection TEXT, selection_key TEXT,
+            odd_open REAL, prob_model REAL, ev_open REAL, stake_pct REAL,
+            xg_home REAL, xg_away REAL, xg_total REAL,
+            pick_time DATETIME, kickoff_time DATETIME,
+            clv_captured INTEGER DEFAULT 0,
+            urs REAL DEFAULT 0.0,
+            model_gap REAL DEFAULT 0.0,
+            xg_source TEXT DEFAULT 'predictions'
+        )""")
+        for col, defn in [
+            ("urs",        "REAL DEFAULT 0.0"),
+            ("model_gap",  "REAL DEFAULT 0.0"),
+            ("xg_source",  "TEXT DEFAULT 'predictions'"),
+        ]:
+            try:
+                c.execute(f"ALTER TABLE picks_log ADD COLUMN {col} {defn}")
+            except:
+                pass
+
+        c.execute("""CREATE TABLE IF NOT EXISTS closing_lines (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            fixture_id INTEGER, market TEXT, selection_key TEXT,
+            odd_close REAL, implied_prob_close REAL, capture_time DATETIME
+        )""")
+        c.execute("""CREATE TABLE IF NOT EXISTS decision_log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            fixture_id INTEGER, match TEXT, market TEXT,
+            odd REAL, ev REAL, reason TEXT, timestamp DATETIME
+        )""")
+        c.execute("""CREATE TABLE IF NOT EXISTS request_log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            date TEXT, count INTEGER
+        )""")
+        c.execute("""CREATE TABLE IF NOT EXISTS team_xg_cache (
+            team_id INTEGER PRIMARY KEY,
+            team_name TEXT,
+            gf_series TEXT,
+            ga_series TEXT,
+            xg_for REAL,
+            xg_against REAL,
+            confidence TEXT,
+            depth INTEGER DEFAULT 6,
+            updated_at DATETIME
+        )""")
         try:
-            c.execute(f"ALTER TABLE picks_log ADD COLUMN {col} {defn}")
+            c.execute("ALTER TABLE team_xg_cache ADD COLUMN depth INTEGER DEFAULT 6")
         except:
             pass
 
-    c.execute("""CREATE TABLE IF NOT EXISTS closing_lines (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        fixture_id INTEGER, market TEXT, selection_key TEXT,
-        odd_close REAL, implied_prob_close REAL, capture_time DATETIME
-    )""")
-    c.execute("""CREATE TABLE IF NOT EXISTS decision_log (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        fixture_id INTEGER, match TEXT, market TEXT,
-        odd REAL, ev REAL, reason TEXT, timestamp DATETIME
-    )""")
-    c.execute("""CREATE TABLE IF NOT EXISTS request_log (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        date TEXT, count INTEGER
-    )""")
-    c.execute("""CREATE TABLE IF NOT EXISTS team_xg_cache (
-        team_id INTEGER PRIMARY KEY,
-        team_name TEXT,
-        gf_series TEXT,
-        ga_series TEXT,
-        xg_for REAL,
-        xg_against REAL,
-        confidence TEXT,
-        depth INTEGER DEFAULT 6,
-        updated_at DATETIME
-    )""")
-    try:
-        c.execute("ALTER TABLE team_xg_cache ADD COLUMN depth INTEGER DEFAULT 6")
-    except:
-        pass
+        c.execute("""CREATE TABLE IF NOT EXISTS line_snapshots (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            fixture_id INTEGER,
+            home_team TEXT, away_team TEXT, kickoff_time TEXT,
+            market TEXT, selection TEXT,
+            odd_snapshot REAL, odd_open REAL,
+            captured_at DATETIME
+        )""")
+        c.execute("""CREATE TABLE IF NOT EXISTS fixtures_by_date (
+            date TEXT PRIMARY KEY,
+            payload BLOB,
+            immutable INTEGER DEFAULT 0,
+            fetched_at REAL
+        )""")
+        c.execute("""CREATE TABLE IF NOT EXISTS xg_result_log (
+            fixture_id INTEGER,
+            team_id    INTEGER,
+            ingested_at TEXT,
+            PRIMARY KEY (fixture_id, team_id)
+        )""")
+        c.execute("""CREATE TABLE IF NOT EXISTS league_advanced_factors (
+            league TEXT PRIMARY KEY,
+            shots_avg REAL, shots_on_target_avg REAL,
+            goals_per_shot REAL, goals_per_sot REAL,
+            goal_std REAL, matches INTEGER,
+            window_days INTEGER, last_updated DATETIME
+        )""")
+
+        c.execute("SELECT COUNT(*) FROM league_advanced_factors")
+        if c.fetchone()[0] == 0:
+            baselines = [
+                ("🇬🇧 PREMIER",    26.5, 9.2, 0.110, 0.32, 1.48),
+                ("🇪🇸 LA LIGA",    23.8, 8.1, 0.098, 0.29, 1.38),
+                ("🇮🇹 SERIE A",    24.2, 8.3, 0.102, 0.30, 1.35),
+                ("🇩🇪 BUNDESLIGA", 27.1, 9.5, 0.115, 0.33, 1.55),
+                ("🇫🇷 LIGUE 1",    24.0, 8.4, 0.100, 0.30, 1.40),
+                ("🏆 CHAMPIONS",   25.5, 9.0, 0.108, 0.31, 1.45),
+                ("🏆 EUROPA",      25.0, 8.8, 0.105, 0.30, 1.42),
+                ("🇳🇱 EREDIVISIE", 28.0,10.0, 0.118, 0.34, 1.58),
+                ("🇵🇹 PRIMEIRA",   24.5, 8.5, 0.101, 0.30, 1.38),
+            ]
+            now = datetime.now(timezone.utc).isoformat()
+            for row in baselines:
+                c.execute(
+                    "INSERT INTO league_advanced_factors VALUES (?,?,?,?,?,?,?,?,?)",
+                    (row[0], row[1], row[2], row[3], row[4], row[5], 100, 30, now)
+                )
 
-    c.execute("""CREATE TABLE IF NOT EXISTS line_snapshots (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        fixture_id INTEGER,
-        home_team TEXT, away_team TEXT, kickoff_time TEXT,
-        market TEXT, selection TEXT,
-        odd_snapshot REAL, odd_open REAL,
-        captured_at DATETIME
-    )""")
-    c.execute("""CREATE TABLE IF NOT EXISTS xg_result_log (
-        fixture_id INTEGER,
-        team_id    INTEGER,
-        ingested_at TEXT,
-        PRIMARY KEY (fixture_id, team_id)
-    )""")
-    c.execute("""CREATE TABLE IF NOT EXISTS league_advanced_factors (
-        league TEXT PRIMARY KEY,
-        shots_avg REAL, shots_on_target_avg REAL,
-        goals_per_shot REAL, goals_per_sot REAL,
-        goal_std REAL, matches INTEGER,
-        window_days INTEGER, last_updated DATETIME
-    )""")
-
-    c.execute("SELECT COUNT(*) FROM league_advanced_factors")
-    if c.fetchone()[0] == 0:
-        baselines = [
-            ("🇬🇧 PREMIER",    26.5, 9.2, 0.110, 0.32, 1.48),
-            ("🇪🇸 LA LIGA",    23.8, 8.1, 0.098, 0.29, 1.38),
-            ("🇮🇹 SERIE A",    24.2, 8.3, 0.102, 0.30, 1.35),
-            ("🇩🇪 BUNDESLIGA", 27.1, 9.5, 0.115, 0.33, 1.55),
-            ("🇫🇷 LIGUE 1",    24.0, 8.4, 0.100, 0.30, 1.40),
-            ("🏆 CHAMPIONS",   25.5, 9.0, 0.108, 0.31, 1.45),
-            ("🏆 EUROPA",      25.0, 8.8, 0.105, 0.30, 1.42),
-            ("🇳🇱 EREDIVISIE", 28.0,10.0, 0.118, 0.34, 1.58),
-            ("🇵🇹 PRIMEIRA",   24.5, 8.5, 0.101, 0.30, 1.38),
-        ]
-        now = datetime.now(timezone.utc).isoformat()
-        for row in baselines:
-            c.execute(
-                "INSERT INTO league_advanced_factors VALUES (?,?,?,?,?,?,?,?,?)",
-                (row[0], row[1], row[2], row[3], row[4], row[5], 100, 30, now)
-            )
+        c.execute("SELECT id, selection_key FROM picks_log WHERE clv_captured = 1")
+        for pid, skey in c.fetchall():
+            if skey and skey.split("|")[-1].replace(".", "", 1).isdigit():
+                c.execute("DELETE FROM closing_lines WHERE selection_key = ?", (skey,))
+                c.execute("UPDATE picks_log SET clv_captured = -1 WHERE id = ?", (pid,))
 
-    c.execute("SELECT id, selection_key FROM picks_log WHERE clv_captured = 1")
-    for pid, skey in c.fetchall():
-        if skey and skey.split("|")[-1].replace(".", "", 1).isdigit():
-            c.execute("DELETE FROM closing_lines WHERE selection_key = ?", (skey,))
-            c.execute("UPDATE picks_log SET clv_captured = -1 WHERE id = ?", (pid,))
+    run_migrations(DB.connection())
+    sync_xg_state_params(DB.connection())
 
-    conn.commit()
-    conn.close()
+
+# ── Migraciones versionadas (PRAGMA user_version) ───────────────────────────
+# Cada entrada (versión, sentencias) se aplica una sola vez, en orden y en su
+# propia transacción; una sentencia puede ser SQL o una función(conn) que
+# convierte datos. Para cambiar el esquema: añadir una versión nueva al
+# final, nunca editar una ya publicada.
+
+def _pack_json_series(conn):
+    """v4: gf_series/ga_series JSON → BLOBs de xg_series (sin fecha ni liga)."""
+    rows = []
+    for team_id, gf_json, ga_json in conn.execute(
+            "SELECT team_id, gf_series, ga_series FROM team_xg_cache "
+            "WHERE gf_series IS NOT NULL"):
+        try:
+            gf, ga = json.loads(gf_json), json.loads(ga_json or "[]")
+        except (TypeError, ValueError):
+            gf, ga = [], []
+        n = min(len(gf), len(ga))
+        rows.append((*pack_series(gf[:n], ga[:n]), team_id))
+    conn.executemany(
+        "UPDATE team_xg_cache SET gf_pack=?, ga_pack=?, day_pack=?, league_pack=?, "
+        "gf_series=NULL, ga_series=NULL WHERE team_id=?", rows
+    )
+
+
+def _xg_state(gf, ga, days=None):
+    return XgState.from_series(gf, ga, days, decay=XG_DECAY_FACTOR, mode=XG_DECAY_MODE,
+                               half_life=XG_HALF_LIFE_DAYS)
+
+
+def rebuild_xg_state(conn):
+    """
+    Rehace el estado xG de todos los equipos desde sus series (v5, o
+    desde sync_xg_state_params al cambiar XG_DECAY_MODE / XG_HALF_LIFE_DAYS).
+    """
+    rows = []
+    for team_id, gf_pack, ga_pack, day_pack in conn.execute(
+            "SELECT team_id, gf_pack, ga_pack, day_pack FROM team_xg_cache"):
+        st = _xg_state(unpack_goals(gf_pack), unpack_goals(ga_pack), unpack_days(day_pack))
+        rows.append((*st.as_row(), st.xg_for, st.xg_against, team_id))
+    conn.executemany(
+        "UPDATE team_xg_cache SET xg_num_for=?, xg_num_against=?, xg_den=?, "
+        "xg_matches=?, last_match_day=?, xg_for=?, xg_against=? WHERE team_id=?", rows
+    )
+
+
+def sync_xg_state_params(conn):
+    """
+    Rehace el estado xG si se calculó con otro XG_DECAY_MODE,
+    XG_HALF_LIFE_DAYS o XG_DECAY_FACTOR (o sin constancia de ellos).
+    Devuelve True si lo rehízo.
+    """
+    want = (XG_DECAY_MODE, XG_HALF_LIFE_DAYS, XG_DECAY_FACTOR)
+    try:
+        row = conn.execute("SELECT mode, half_life, decay FROM xg_state_params").fetchone()
+    except Exception:
+        return False                # migración v7 sin aplicar
+    if row is not None and tuple(row) == want:
+        return False
+    try:
+        conn.execute("BEGIN")
+        rebuild_xg_state(conn)
+        conn.execute("INSERT OR REPLACE INTO xg_state_params VALUES (1,?,?,?)", want)
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        print(f"  ⚠️  Estado xG sin rehacer: {e}")
+        return False
+    if row is not None:
+        print(f"  🔁 Estado xG rehecho: modo {XG_DECAY_MODE}, "
+              f"vida media {XG_HALF_LIFE_DAYS:g} d, decay {XG_DECAY_FACTOR:g}")
+    return True
+
+
+MIGRATIONS = [
+    (1, [
+        # closing_lines: una fila por (fixture, mercado, selección) → upsert
+        """DELETE FROM closing_lines WHERE id NOT IN (
+               SELECT MAX(id) FROM closing_lines
+               GROUP BY fixture_id, market, selection_key)""",
+        """CREATE UNIQUE INDEX IF NOT EXISTS ux_closing_lines_key
+               ON closing_lines(fixture_id, market, selection_key)""",
+        # picks_log ⋈ closing_lines: índices cubrientes para CLV por mercado
+        # y global (filtro clv_captured, orden id, claves del join, odd_open)
+        """CREATE INDEX IF NOT EXISTS ix_picks_clv_market
+               ON picks_log(market, clv_captured, id, fixture_id, selection_key, odd_open)""",
+        """CREATE INDEX IF NOT EXISTS ix_picks_clv
+               ON picks_log(clv_captured, id, fixture_id, market, selection_key, odd_open)""",
+        "CREATE INDEX IF NOT EXISTS ix_picks_fixture   ON picks_log(fixture_id)",
+        "CREATE INDEX IF NOT EXISTS ix_picks_pick_time ON picks_log(pick_time)",
+        "CREATE INDEX IF NOT EXISTS ix_decision_reason  ON decision_log(reason)",
+        "CREATE INDEX IF NOT EXISTS ix_decision_fixture ON decision_log(fixture_id)",
+        "CREATE INDEX IF NOT EXISTS ix_xg_result_team   ON xg_result_log(team_id)",
+    ]),
+    (2, [
+        # ventanas móviles de CLV (clv_stats.py); se rellena al primer attach
+        """CREATE TABLE IF NOT EXISTS clv_rolling (
+               scope TEXT, size INTEGER,
+               clvs TEXT, sum REAL, sumsq REAL,
+               updated_at DATETIME,
+               PRIMARY KEY (scope, size))""",
+    ]),
+    (3, [
+        # line_snapshots guarda el libro completo de cada captura
+        "ALTER TABLE line_snapshots ADD COLUMN selection_key TEXT",
+        "ALTER TABLE line_snapshots ADD COLUMN phase TEXT",
+        """CREATE INDEX IF NOT EXISTS ix_line_snapshots_fixture
+               ON line_snapshots(fixture_id, selection_key, captured_at)""",
+    ]),
+    (4, [
+        # series de goles en BLOB de ancho fijo (xg_series.py); las JSON
+        # se convierten y se vacían
+        "ALTER TABLE team_xg_cache ADD COLUMN gf_pack BLOB",
+        "ALTER TABLE team_xg_cache ADD COLUMN ga_pack BLOB",
+        "ALTER TABLE team_xg_cache ADD COLUMN day_pack BLOB",
+        "ALTER TABLE team_xg_cache ADD COLUMN league_pack BLOB",
+        _pack_json_series,
+    ]),
+    (5, [
+        # estado xG decaído incremental (xg_state.py)
+        "ALTER TABLE team_xg_cache ADD COLUMN xg_num_for REAL",
+        "ALTER TABLE team_xg_cache ADD COLUMN xg_num_against REAL",
+        "ALTER TABLE team_xg_cache ADD COLUMN xg_den REAL",
+        "ALTER TABLE team_xg_cache ADD COLUMN xg_matches INTEGER",
+        "ALTER TABLE team_xg_cache ADD COLUMN last_match_day TEXT",
+        rebuild_xg_state,
+    ]),
+    (6, [
+        # stats por equipo del refresh de ligas: un fallo a mitad de liga
+        # reanuda desde aquí en vez de volver a pedir los 20 equipos
+        """CREATE TABLE IF NOT EXISTS league_team_stats (
+               league_id INTEGER, season INTEGER, team_id INTEGER,
+               shots INTEGER, shots_on INTEGER, goals INTEGER, played INTEGER,
+               fetched_at TEXT,
+               PRIMARY KEY (league_id, season, team_id))""",
+    ]),
+    (7, [
+        # con qué parámetros se calculó el estado xG: init_db lo rehace
+        # (sync_xg_state_params) si cambian modo, vida media o decay
+        """CREATE TABLE IF NOT EXISTS xg_state_params (
+               id INTEGER PRIMARY KEY CHECK (id = 1),
+               mode TEXT, half_life REAL, decay REAL)""",
+    ]),
+]
+
+
+def run_migrations(conn):
+    current = conn.execute("PRAGMA user_version").fetchone()[0]
+    for version, statements in MIGRATIONS:
+        if version <= current:
+            continue
+        try:
+            conn.execute("BEGIN")
+            for sql in statements:
+                sql(conn) if callable(sql) else conn.execute(sql)
+            conn.execute(f"PRAGMA user_version = {int(version)}")
+            conn.commit()
+            print(f"  🗄️  Migración v{version} aplicada")
+        except Exception as e:
+            conn.rollback()
+            print(f"  ⚠️  Migración v{version} fallida: {e}")
+            break
 
 
 def log_rejection(fixture_id, match, market, odd, ev, reason):
     try:
-        conn = sqlite3.connect(DB_PATH)
-        c = conn.cursor()
-        c.execute(
+        DB.execute(
             "INSERT INTO decision_log VALUES (NULL,?,?,?,?,?,?,?)",
             (fixture_id, match, market, odd, ev, reason,
              datetime.now(timezone.utc).isoformat())
         )
-        conn.commit()
-        conn.close()
     except:
         pass
 
 
-def track_requests(n=1):
-    try:
-        today = datetime.now(timezone.utc).strftime("%Y-%m-%d")
-        conn  = sqlite3.connect(DB_PATH)
-        c = conn.cursor()
-        c.execute("SELECT count FROM request_log WHERE date=?", (today,))
-        row = c.fetchone()
-        if row:
-            if n > 0:
-                c.execute("UPDATE request_log SET count=count+? WHERE date=?", (n, today))
-        else:
-            c.execute("INSERT INTO request_log VALUES (NULL,?,?)", (today, max(n, 0)))
-        conn.commit()
-        c.execute("SELECT count FROM request_log WHERE date=?", (today,))
-        total = c.fetchone()[0]
-        conn.close()
-        return total
-    except:
-        return 0
-
-
 def sync_request_counter(headers):
+    """Sincroniza GOVERNOR con /status; devuelve el bloque response (o None)."""
     try:
-        r    = requests.get("https://v3.football.api-sports.io/status",
-                            headers=headers, timeout=10)
+        r    = api_get("/status", headers)
         raw  = r.json()
         resp = raw if isinstance(raw, dict) else {}
         data = resp.get("response", {})
         if isinstance(data, list):
             data = data[0] if data else {}
         current = data.get("requests", {}).get("current", None)
-        if current is None:
-            return
-        today = datetime.now(timezone.utc).strftime("%Y-%m-%d")
-        conn  = sqlite3.connect(DB_PATH)
-        c = conn.cursor()
-        c.execute("DELETE FROM request_log WHERE date=?", (today,))
-        c.execute("INSERT INTO request_log VALUES (NULL,?,?)", (today, int(current)))
-        conn.commit()
-        conn.close()
-        print(f"  📡 Contador sincronizado con API: {current}/100 requests hoy")
+        if current is not None:
+            GOVERNOR.sync(current, data.get("requests", {}).get("limit_day"))
+            print(f"  📡 Contador sincronizado con API: {current}/{GOVERNOR.daily_limit} requests hoy")
+        return data
     except Exception as e:
         print(f"  ⚠️  sync_request_counter error: {e}")
+        return None
 
 
 # ==========================================
 # URS ENGINE
 # ==========================================
 
-def get_avg_clv_by_market(market, lookback=30):
-    try:
-        conn = sqlite3.connect(DB_PATH)
-        c = conn.cursor()
-        if market:
-            c.execute("""SELECT AVG((p.odd_open - c.odd_close)/p.odd_open)
-                         FROM picks_log p JOIN closing_lines c
-                           ON p.fixture_id=c.fixture_id AND p.market=c.market
-                              AND p.selection_key=c.selection_key
-                         WHERE p.market=? AND p.clv_captured=1
-                         ORDER BY p.id DESC LIMIT ?""", (market, lookback))
-        else:
-            c.execute("""SELECT AVG((p.odd_open - c.odd_close)/p.odd_open)
-                         FROM picks_log p JOIN closing_lines c
-                           ON p.fixture_id=c.fixture_id AND p.market=c.market
-                              AND p.selection_key=c.selection_key
-                         WHERE p.clv_captured=1
-                         ORDER BY p.id DESC LIMIT ?""", (lookback,))
-        res = c.fetchone()[0]
-        conn.close()
-        return float(res) if res else 0.0
-    except:
-        return 0.0
+def get_avg_clv_by_market(market):
+    """CLV medio de los últimos 30 picks del mercado (None = global)."""
+    return CLV_STATS.mean(market)
 
 
 def get_clv_sharpe():
-    try:
-        conn = sqlite3.connect(DB_PATH)
-        c = conn.cursor()
-        c.execute("""SELECT (p.odd_open - c.odd_close)/p.odd_open
-                     FROM picks_log p JOIN closing_lines c
-                       ON p.fixture_id=c.fixture_id AND p.clv_captured=1
-                     ORDER BY p.id DESC LIMIT 50""")
-        clvs = [row[0] for row in c.fetchall()]
-        conn.close()
-        if len(clvs) < 10:
-            return 0.0
-        mean_clv, std_clv = np.mean(clvs), np.std(clvs, ddof=1)
-        return mean_clv / std_clv if std_clv != 0 else 0.0
-    except:
-        return 0.0
+    """Media/std de los últimos 50 CLVs globales (0.0 con menos de 10)."""
+    return CLV_STATS.sharpe()
 
 
 def score_sharpe(s):
@@ -388,8 +525,69 @@ def score_odd(odd):
     else:             return 0.30
 
 
-def calculate_urs(ev, odd, league_name):
-    sharpe = get_clv_sharpe()
+# ── Snapshot de riesgo por scan ────────────────────────────────────────────
+# CLV por mercado, CLV global, Sharpe y kill-switches no cambian dentro de un
+# scan (solo capture_closing_lines añade CLVs). Se leen una vez al empezar el
+# scan y cada candidato consulta el snapshot en memoria; capturar closing
+# lines lo invalida y el siguiente acceso lo recalcula.
+
+KILL_SWITCH_MARKET = -0.015
+KILL_SWITCH_GLOBAL = -0.025
+
+
+class RiskState:
+    def __init__(self, clv_by_market, clv_global, sharpe):
+        self.clv_by_market = dict(clv_by_market)
+        self.clv_global    = clv_global
+        self.sharpe        = sharpe
+        self.loaded_at     = datetime.now(timezone.utc)
+
+    @classmethod
+    def load(cls, markets=tuple(VOLATILITY_BUCKETS)):
+        return cls({m: get_avg_clv_by_market(m) for m in markets},
+                   get_avg_clv_by_market(None), get_clv_sharpe())
+
+    def market_clv(self, market):
+        if market not in self.clv_by_market:
+            self.clv_by_market[market] = get_avg_clv_by_market(market)
+        return self.clv_by_market[market]
+
+    def kill_switch(self, market):
+        """Motivo de rechazo si el mercado o el global están en kill-switch."""
+        if self.market_clv(market) < KILL_SWITCH_MARKET:
+            return f"KILL_SWITCH_{market}"
+        if self.clv_global < KILL_SWITCH_GLOBAL:
+            return "KILL_SWITCH_GLOBAL"
+        return None
+
+    def killed_markets(self):
+        return sorted(m for m, clv in self.clv_by_market.items() if clv < KILL_SWITCH_MARKET)
+
+
+_RISK_STATE = None
+
+
+def get_risk_state():
+    global _RISK_STATE
+    if _RISK_STATE is None:
+        _RISK_STATE = RiskState.load()
+    return _RISK_STATE
+
+
+def refresh_risk_state():
+    global _RISK_STATE
+    _RISK_STATE = RiskState.load()
+    return _RISK_STATE
+
+
+def invalidate_risk_state():
+    global _RISK_STATE
+    _RISK_STATE = None
+
+
+def calculate_urs(ev, odd, league_name, sharpe=None):
+    if sharpe is None:
+        sharpe = get_risk_state().sharpe
     liq    = LIQUIDITY_TIERS.get(league_name, 0.70)
     w      = {"sharpe": 0.35, "ev": 0.30, "liquidity": 0.20, "odd": 0.15}
     urs    = (w["sharpe"]    * score_sharpe(sharpe) +
@@ -399,17 +597,16 @@ def calculate_urs(ev, odd, league_name):
     return max(0.10, min(urs, 1.00))
 
 
-def get_kelly_and_urs(ev, odd, market, league_name):
-    avg_clv_market = get_avg_clv_by_market(market)
-    avg_clv_global = get_avg_clv_by_market(None)
-    if avg_clv_market < -0.015:
-        return 0.0, 0.0, f"KILL_SWITCH_{market}"
-    if avg_clv_global < -0.025:
-        return 0.0, 0.0, "KILL_SWITCH_GLOBAL"
+def get_kelly_and_urs(ev, odd, market, league_name, risk=None):
+    risk = risk or get_risk_state()
+    killed = risk.kill_switch(market)
+    if killed:
+        return 0.0, 0.0, killed
+    avg_clv_market = risk.market_clv(market)
     base_kelly = max(0.0, min(ev / (odd - 1), 0.05))
-    if -0.015 <= avg_clv_market < 0.005:
+    if KILL_SWITCH_MARKET <= avg_clv_market < 0.005:
         base_kelly *= 0.25
-    urs = calculate_urs(ev, odd, league_name)
+    urs = calculate_urs(ev, odd, league_name, sharpe=risk.sharpe)
     return base_kelly * urs, urs, None
 
 
@@ -464,15 +661,6 @@ def apply_portfolio_risk_engine(preliminary_picks):
 # MATH ENGINE
 # ==========================================
 
-def _poisson_pmf(mu, k):
-    if mu <= 0 or k < 0:
-        return 0.0
-    try:
-        return exp(-mu + k * log(mu) - lgamma(k + 1))
-    except:
-        return 0.0
-
-
 def _weighted_avg(values, decay=XG_DECAY_FACTOR):
     if not values:
         return 0.0
@@ -490,50 +678,34 @@ def _form_factor(gf_series):
     return max(0.85, min(recent / previous, 1.15))
 
 
-def negbin_pmf(mu, var, k):
-    if mu <= 0:
-        return 0.0
-    if var <= mu * 1.01:
-        return _poisson_pmf(mu, k)
-    r = mu ** 2 / (var - mu)
-    p = r / (r + mu)
-    try:
-        return exp(lgamma(k+r) - lgamma(r) - lgamma(k+1) + r*log(p) + k*log(1-p))
-    except:
-        return 0.0
-
-
-def calc_over_under(xg_total, line=2.5, league_name=None):
-    std     = XG_STD_BY_LEAGUE.get(league_name, 1.45) if league_name else 1.45
-    var     = max(std ** 2, xg_total)
-    p_under = sum(negbin_pmf(xg_total, var, k) for k in range(int(np.floor(line)) + 1))
-    return 1 - p_under, p_under
+def market_book(xg_home, xg_away, league_name=None):
+    """Matrices de marcador del partido (ver pricing.py)."""
+    from pricing import MarketBook
+    std = XG_STD_BY_LEAGUE.get(league_name, 1.45) if league_name else 1.45
+    return MarketBook(xg_home, xg_away, max(std ** 2, xg_home + xg_away))
 
 
-def bivariate_poisson_1x2(xg_home, xg_away, max_goals=10):
+def bivariate_poisson_1x2(xg_home, xg_away, max_goals=10, book=None):
     if not (0.4 <= xg_home <= 4.0) or not (0.4 <= xg_away <= 4.0):
         return None
-    p_home = p_draw = p_away = 0.0
-    for i in range(max_goals + 1):
-        for j in range(max_goals + 1):
-            prob = _poisson_pmf(xg_home, i) * _poisson_pmf(xg_away, j)
-            if i > j:    p_home += prob
-            elif i == j: p_draw += prob
-            else:        p_away += prob
-    total = p_home + p_draw + p_away
+    if book is None:
+        from pricing import MarketBook
+        book = MarketBook(xg_home, xg_away, xg_home + xg_away, max_goals)
+    p_h, p_d, p_a, total = (float(x) for x in book.one_x_two())
     if total < 0.95:
         return None
-    p_h, p_d, p_a = p_home/total, p_draw/total, p_away/total
     if not (0.08 <= p_d <= 0.55):
         return None
     return p_h, p_d, p_a
 
 
-def calc_btts(xg_home, xg_away):
+def calc_btts(xg_home, xg_away, book=None):
     if not (0.4 <= xg_home <= 4.0) or not (0.4 <= xg_away <= 4.0):
         return None, None
-    p_yes = (1 - exp(-xg_home)) * (1 - exp(-xg_away))
-    p_no  = 1 - p_yes
+    if book is None:
+        from pricing import MarketBook
+        book = MarketBook(xg_home, xg_away, xg_home + xg_away)
+    p_yes, p_no = (float(x) for x in book.btts())
     if not (0.20 <= p_yes <= 0.90):
         return None, None
     return round(p_yes, 4), round(p_no, 4)
@@ -544,148 +716,164 @@ def calc_btts(xg_home, xg_away):
 # ==========================================
 
 def _get_fixtures_for_date(d, headers):
-    if d not in _DATE_FIXTURES_CACHE:
-        try:
-            r = requests.get(
-                "https://v3.football.api-sports.io/fixtures",
-                headers=headers,
-                params={"date": d},
-                timeout=10
-            )
-            _DATE_FIXTURES_CACHE[d] = r.json().get("response", [])
-            time.sleep(0.3)
-        except:
-            _DATE_FIXTURES_CACHE[d] = []
-    return _DATE_FIXTURES_CACHE[d]
+    fixtures = FIXTURE_STORE.get(d)
+    if fixtures is not None:
+        return fixtures
+    # Un lock por fecha: en el scan async dos partidos pueden pedir el
+    # mismo día a la vez y solo uno debe gastar el request
+    with _DATE_LOCKS_GUARD:
+        lock = _DATE_FETCH_LOCKS.setdefault(d, threading.Lock())
+    with lock:
+        fixtures = FIXTURE_STORE.get(d)
+        if fixtures is None:
+            try:
+                r = api_get("/fixtures", headers, params={"date": d})
+                fixtures = r.json().get("response", [])
+            except BudgetExceeded:
+                # sin cuota: no cachear el día vacío, se pedirá cuando haya
+                return []
+            except:
+                fixtures = []
+            FIXTURE_STORE.put(d, fixtures)
+    return fixtures
 
 
 def clear_date_cache():
-    _DATE_FIXTURES_CACHE.clear()
+    """
+    Descarta todos los días no inmutables del store (hoy, futuro y pasados
+    con partidos sin cerrar). Los días pasados con todo FT se conservan:
+    no pueden cambiar y volver a pedirlos solo gasta cuota.
+    """
+    FIXTURE_STORE.expire_mutable()
 
 
 def clear_past_dates_only():
     """
-    FIX v5.13: solo borra fechas pasadas del cache.
+    FIX v5.13: solo descarta fechas pasadas no inmutables.
     Preserva D+0/D+1/D+2 pre-cargadas por _startup_diagnostics,
     ahorrando 2-3 req por scan en Free tier.
     """
-    today = datetime.now().strftime("%Y-%m-%d")
-    past  = [d for d in list(_DATE_FIXTURES_CACHE.keys()) if d < today]
-    for d in past:
-        _DATE_FIXTURES_CACHE.pop(d, None)
-    if past:
-        print(f"  🧹 Cache: {len(past)} fechas pasadas eliminadas, "
-              f"{len(_DATE_FIXTURES_CACHE)} futuras preservadas")
+    past = FIXTURE_STORE.expire_mutable(past_only=True)
+    old  = FIXTURE_STORE.prune()
+    if past or old:
+        print(f"  🧹 Cache: {len(past)} fechas pasadas abiertas + {len(old)} antiguas "
+              f"eliminadas, {len(FIXTURE_STORE.dates())} preservadas")
 
 
-def fetch_team_xg(team_id, headers, league_id=None, use_cache=True, depth=6):
+def fetch_team_xg(team_id, headers, league_id=None, use_cache=True, depth=6, xg=None):
     if use_cache:
         try:
-            conn_c = sqlite3.connect(DB_PATH)
-            cc = conn_c.cursor()
-            cc.execute(
-                "SELECT gf_series, ga_series, xg_for, xg_against, confidence, updated_at "
-                "FROM team_xg_cache WHERE team_id=?", (team_id,)
-            )
-            row = conn_c.fetchone()
-            conn_c.close()
-            if row:
-                updated = datetime.fromisoformat(row[5])
-                age_h   = (datetime.now(timezone.utc) - updated).total_seconds() / 3600
+            # xg: XgMatrix cargada al empezar el scan; si el equipo no está
+            # (o se escribió después) se consulta la fila
+            hit = xg.get(team_id) if xg is not None else None
+            if hit is None:
+                row = DB.fetchone(
+                    "SELECT xg_for, xg_against, confidence, gf_pack, ga_pack, updated_at "
+                    "FROM team_xg_cache WHERE team_id=?", (team_id,)
+                )
+                if row:
+                    hit = (float(row[0]), float(row[1]), row[2],
+                           unpack_goals(row[3]), unpack_goals(row[4]),
+                           datetime.fromisoformat(row[5]))
+            if hit:
+                xg_for, xg_against, conf, gf, ga, updated = hit
+                age_h = (datetime.now(timezone.utc) - updated).total_seconds() / 3600
                 if age_h < XG_CACHE_TTL_HOURS:
-                    gf = json.loads(row[0])
-                    ga = json.loads(row[1])
-                    print(f"    xG [{team_id}] CACHE HIT age={age_h:.1f}h conf={row[4]}")
-                    return float(row[2]), float(row[3]), row[4], gf, ga, True
+                    print(f"    xG [{team_id}] CACHE HIT age={age_h:.1f}h conf={conf}")
+                    return xg_for, xg_against, conf, gf, ga, True
         except:
             pass
 
-    gf_series = []
-    ga_series = []
-    days_searched = 0
+    days = [(datetime.now() - timedelta(days=b)).strftime("%Y-%m-%d")
+            for b in range(1, MAX_DAYS_BACK_XG + 1)]
+    # días ya guardados en disco → memoria + índice por equipo (0 req)
+    FIXTURE_STORE.load_days(days)
+    fetched = []
+
+    def _series(strict_league):
+        gf, ga, played, leagues = [], [], [], []
+        lid  = league_id if strict_league else None
+        gaps = [d for d in days if d not in FIXTURE_STORE]
+        # Bloques de días consecutivos ya cacheados: una búsqueda en el
+        # índice por bloque. Solo se piden a la API los huecos y solo
+        # hasta reunir `depth` partidos (mismo corte por día que antes).
+        for gap in gaps + [None]:
+            gf, ga, played, leagues = [], [], [], []
+            last_day = None
+            for day, f_lid, g_f, g_a, _ in FIXTURE_STORE.team_results(
+                    team_id, after=gap, until=days[0], league_id=lid):
+                if len(gf) >= depth and day != last_day:
+                    break
+                gf.append(g_f); ga.append(g_a)
+                played.append(day); leagues.append(f_lid)
+                last_day = day
+            if len(gf) >= depth or gap is None:
+                break
+            _get_fixtures_for_date(gap, headers)
+            fetched.append(gap)
+        return gf, ga, played, leagues
 
-    def _extract_goals(fixtures, tid, strict_league):
-        gf, ga = [], []
-        for fix in fixtures:
-            if strict_league and league_id and fix["league"]["id"] != league_id:
-                continue
-            if fix["fixture"]["status"]["short"] != "FT":
-                continue
-            h_id    = fix["teams"]["home"]["id"]
-            a_id    = fix["teams"]["away"]["id"]
-            h_goals = fix["goals"]["home"]
-            a_goals = fix["goals"]["away"]
-            if h_goals is None or a_goals is None:
-                continue
-            if h_id == tid:
-                gf.append(h_goals); ga.append(a_goals)
-            elif a_id == tid:
-                gf.append(a_goals); ga.append(h_goals)
-        return gf, ga
-
-    for days_back in range(1, MAX_DAYS_BACK_XG + 1):
-        if len(gf_series) >= depth:
-            break
-        d = (datetime.now() - timedelta(days=days_back)).strftime("%Y-%m-%d")
-        already_cached = d in _DATE_FIXTURES_CACHE
-        all_day = _get_fixtures_for_date(d, headers)
-        if not already_cached:
-            days_searched += 1
-        gf_day, ga_day = _extract_goals(all_day, team_id, strict_league=True)
-        gf_series.extend(gf_day)
-        ga_series.extend(ga_day)
+    gf_series, ga_series, played, leagues = _series(strict_league=True)
 
     # Fallback: aceptar cualquier liga (Champions, Copa) para tener forma del equipo
     if len(gf_series) < 2:
-        gf_any, ga_any = [], []
-        for days_back in range(1, MAX_DAYS_BACK_XG + 1):
-            if len(gf_any) >= depth:
-                break
-            d = (datetime.now() - timedelta(days=days_back)).strftime("%Y-%m-%d")
-            all_day = _get_fixtures_for_date(d, headers)
-            gf_d, ga_d = _extract_goals(all_day, team_id, strict_league=False)
-            gf_any.extend(gf_d)
-            ga_any.extend(ga_d)
-        if len(gf_any) > len(gf_series):
-            print(f"    xG [{team_id}] fallback multi-liga: {len(gf_any)} partidos")
-            gf_series, ga_series = gf_any, ga_any
+        any_league = _series(strict_league=False)
+        if len(any_league[0]) > len(gf_series):
+            print(f"    xG [{team_id}] fallback multi-liga: {len(any_league[0])} partidos")
+            gf_series, ga_series, played, leagues = any_league
+    days_searched = len(fetched)
 
     if not gf_series:
         print(f"    xG [{team_id}] sin partidos en {MAX_DAYS_BACK_XG} días — DEFAULT 1.3/1.3 LOW")
         return 1.3, 1.3, "LOW", [], [], False
 
-    xg_for     = _weighted_avg(gf_series)
-    xg_against = _weighted_avg(ga_series)
+    state      = _xg_state(gf_series, ga_series, played)
+    xg_for     = state.xg_for
+    xg_against = state.xg_against
     confidence = "HIGH" if len(gf_series) >= max(4, depth // 2) else "MED"
     print(f"    xG [{team_id}] {len(gf_series)} partidos en {days_searched} días "
           f"— xG={xg_for:.2f}/{xg_against:.2f} {confidence}")
 
     try:
-        conn_c = sqlite3.connect(DB_PATH)
-        cc = conn_c.cursor()
-        cc.execute("""INSERT OR REPLACE INTO team_xg_cache
-            (team_id, gf_series, ga_series, xg_for, xg_against, confidence, updated_at, depth)
-            VALUES (?,?,?,?,?,?,?,?)""",
-            (team_id, json.dumps(gf_series), json.dumps(ga_series),
-             xg_for, xg_against, confidence,
+        DB.execute("""INSERT OR REPLACE INTO team_xg_cache
+            (team_id, gf_pack, ga_pack, day_pack, league_pack,
+             xg_num_for, xg_num_against, xg_den, xg_matches, last_match_day,
+             xg_for, xg_against, confidence, updated_at, depth)
+            VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)""",
+            (team_id, *pack_series(gf_series, ga_series, played, leagues),
+             *state.as_row(), xg_for, xg_against, confidence,
              datetime.now(timezone.utc).isoformat(), depth))
-        conn_c.commit()
-        conn_c.close()
     except:
         pass
 
     return xg_for, xg_against, confidence, gf_series, ga_series, False
 
 
-def build_xg_match(home_id, away_id, h_inj, a_inj, league_id, league_name, headers, depth=6):
+def _injury_factor(n):
+    return 1 - min(n * INJURY_XG_STEP, INJURY_XG_CAP)
+
+
+def apply_injuries(base_h, base_a, h_inj, a_inj, league_name):
+    """(xh, xa, xt) del partido desde el xG base con lesiones y ritmo de liga."""
+    xh = base_h * _injury_factor(h_inj)
+    xa = base_a * _injury_factor(a_inj)
+
+    pace = PACE_BY_LEAGUE.get(league_name, 1.0)
+    xh *= pace
+    xa *= pace
+
+    xh = max(0.6, min(xh, 3.5))
+    xa = max(0.6, min(xa, 3.5))
+    return xh, xa, xh + xa
+
+
+def build_xg_base(home_id, away_id, league_id, headers, depth=6, xg=None):
+    """xG de local y visitante con forma, antes de lesiones y ritmo de liga."""
     h_xgf, h_xga, h_conf, h_gf, h_ga, h_cached = fetch_team_xg(
-        home_id, headers, league_id=league_id, depth=depth
+        home_id, headers, league_id=league_id, depth=depth, xg=xg
     )
-    if not h_cached:
-        time.sleep(2.0)
-
     a_xgf, a_xga, a_conf, a_gf, a_ga, a_cached = fetch_team_xg(
-        away_id, headers, league_id=league_id, depth=depth
+        away_id, headers, league_id=league_id, depth=depth, xg=xg
     )
 
     xh = (h_xgf + a_xga) / 2
@@ -694,130 +882,153 @@ def build_xg_match(home_id, away_id, h_inj, a_inj, league_id, league_name, heade
     xh *= _form_factor(h_gf)
     xa *= _form_factor(a_gf)
 
-    xh *= (1 - min(h_inj * 0.015, 0.08))
-    xa *= (1 - min(a_inj * 0.015, 0.08))
-
-    pace = PACE_BY_LEAGUE.get(league_name, 1.0)
-    xh *= pace
-    xa *= pace
-
-    xh = max(0.6, min(xh, 3.5))
-    xa = max(0.6, min(xa, 3.5))
-
     conf = "HIGH" if (h_conf == "HIGH" and a_conf == "HIGH") else \
            "MED"  if (h_conf != "LOW"  and a_conf != "LOW")  else "LOW"
 
     xg_src = f"last{depth} (H:{len(h_gf)}pts, A:{len(a_gf)}pts)"
-    return xh, xa, xh + xa, conf, xg_src
+    return xh, xa, conf, xg_src
 
 
 def ingest_results_into_xg_cache(headers):
     ingested = 0
     dates_to_check = []
 
-    for d in sorted(_DATE_FIXTURES_CACHE.keys(), reverse=True)[:7]:
+    for d in sorted(FIXTURE_STORE.dates(), reverse=True)[:7]:
         dates_to_check.append((d, False))
 
     for days_back in range(1, 4):
         d = (datetime.now() - timedelta(days=days_back)).strftime("%Y-%m-%d")
-        if d not in _DATE_FIXTURES_CACHE:
+        if d not in FIXTURE_STORE:
             dates_to_check.append((d, True))
 
-    try:
-        conn = sqlite3.connect(DB_PATH)
-        cc   = conn.cursor()
-        for d, needs_fetch in dates_to_check:
-            if needs_fetch:
-                try:
-                    r = requests.get(
-                        "https://v3.football.api-sports.io/fixtures",
-                        headers=headers, params={"date": d}, timeout=10
-                    )
-                    fixtures = r.json().get("response", [])
-                    _DATE_FIXTURES_CACHE[d] = fixtures
-                except:
-                    continue
-            else:
-                fixtures = _DATE_FIXTURES_CACHE.get(d, [])
-
-            for fix in fixtures:
-                if fix["fixture"]["status"]["short"] != "FT":
-                    continue
-                if fix["league"]["id"] not in TARGET_LEAGUES:
-                    continue
-                h_id    = fix["teams"]["home"]["id"]
-                a_id    = fix["teams"]["away"]["id"]
-                h_goals = fix["goals"]["home"]
-                a_goals = fix["goals"]["away"]
-                if h_goals is None or a_goals is None:
-                    continue
-                fid = fix["fixture"]["id"]
-
-                for team_id, gf, ga in [(h_id, h_goals, a_goals), (a_id, a_goals, h_goals)]:
-                    cc.execute(
-                        "SELECT 1 FROM xg_result_log WHERE fixture_id=? AND team_id=?",
-                        (fid, team_id)
-                    )
-                    if cc.fetchone():
-                        continue
+    # Red primero, fuera de la transacción: así el lock de escritura solo
+    # se toma para el bloque de INSERTs
+    days_fixtures = []
+    for d, needs_fetch in dates_to_check:
+        if needs_fetch:
+            try:
+                r = api_get("/fixtures", headers, params={"date": d})
+                fixtures = r.json().get("response", [])
+                FIXTURE_STORE.put(d, fixtures)
+            except:
+                continue
+        else:
+            fixtures = FIXTURE_STORE.get(d) or []
+        days_fixtures.append(fixtures)
 
-                    cc.execute(
-                        "SELECT gf_series, ga_series FROM team_xg_cache WHERE team_id=?",
-                        (team_id,)
-                    )
-                    row = cc.fetchone()
-                    gf_series = json.loads(row[0]) if row else []
-                    ga_series = json.loads(row[1]) if row else []
-
-                    gf_series = [gf] + gf_series[:9]
-                    ga_series = [ga] + ga_series[:9]
-
-                    xg_for     = _weighted_avg(gf_series)
-                    xg_against = _weighted_avg(ga_series)
-                    confidence = "HIGH" if len(gf_series) >= 4 else "MED"
-
-                    cc.execute("""INSERT OR REPLACE INTO team_xg_cache
-                        (team_id, gf_series, ga_series, xg_for, xg_against,
-                         confidence, updated_at, depth)
-                        VALUES (?,?,?,?,?,?,?,?)""",
-                        (team_id, json.dumps(gf_series), json.dumps(ga_series),
-                         xg_for, xg_against, confidence,
-                         datetime.now(timezone.utc).isoformat(), len(gf_series)))
-                    cc.execute(
-                        "INSERT OR IGNORE INTO xg_result_log VALUES (?,?,?)",
-                        (fid, team_id, datetime.now(timezone.utc).isoformat())
-                    )
-                    ingested += 1
+    try:
+        results = _ft_results(days_fixtures)
+        with DB.unit_of_work() as conn:
+            ingested = apply_ft_results(conn, results)
 
-        conn.commit()
-        conn.close()
         if ingested > 0:
             print(f"  📥 xG ingest: {ingested} resultados FT añadidos a cache")
     except Exception as e:
         print(f"  ⚠️  ingest_results error: {e}")
 
 
+def _ft_results(days_fixtures):
+    """
+    Resultados FT de ligas objetivo, uno por (fixture, equipo):
+    (kickoff, fixture_id, team_id, gf, ga, league_id), del más antiguo
+    al más reciente.
+    """
+    results = {}
+    for fixtures in days_fixtures:
+        for fix in fixtures:
+            if fix["fixture"]["status"]["short"] != "FT":
+                continue
+            if fix["league"]["id"] not in TARGET_LEAGUES:
+                continue
+            h_goals = fix["goals"]["home"]
+            a_goals = fix["goals"]["away"]
+            if h_goals is None or a_goals is None:
+                continue
+            fid = fix["fixture"]["id"]
+            ko  = fix["fixture"]["date"]
+            lid = fix["league"]["id"]
+            h_id = fix["teams"]["home"]["id"]
+            a_id = fix["teams"]["away"]["id"]
+            results[(fid, h_id)] = (ko, fid, h_id, h_goals, a_goals, lid)
+            results[(fid, a_id)] = (ko, fid, a_id, a_goals, h_goals, lid)
+    return sorted(results.values(), key=lambda r: (r[0], r[1], r[2]))
+
+
+def apply_ft_results(conn, results):
+    """
+    Ingest en bloque: una consulta para las claves ya ingestadas, otra
+    para las series de los equipos afectados, los resultados se aplican
+    en memoria en orden de fecha y se escribe con executemany.
+    Devuelve cuántos resultados eran nuevos.
+    """
+    if not results:
+        return 0
+    # json_each: una sola consulta aunque haya miles de ids (sin límite de ?)
+    fids = json.dumps(sorted({r[1] for r in results}))
+    done = set(conn.execute(
+        "SELECT fixture_id, team_id FROM xg_result_log "
+        "WHERE fixture_id IN (SELECT value FROM json_each(?))", (fids,)
+    ).fetchall())
+    new = [r for r in results if (r[1], r[2]) not in done]
+    if not new:
+        return 0
+
+    teams  = json.dumps(sorted({r[2] for r in new}))
+    series = {}
+    for team_id, *row in conn.execute(
+            "SELECT team_id, gf_pack, ga_pack, day_pack, league_pack, xg_num_for, "
+            "xg_num_against, xg_den, xg_matches, last_match_day FROM team_xg_cache "
+            "WHERE team_id IN (SELECT value FROM json_each(?))", (teams,)):
+        packs = [p or b"" for p in row[:4]]
+        state = XgState.from_row(*row[4:]) or _xg_state(
+            unpack_goals(packs[0]), unpack_goals(packs[1]), unpack_days(packs[2]))
+        series[team_id] = packs + [state]
+
+    keep = SERIES_MAX - 1
+    for ko, fid, team_id, gf, ga, league_id in new:
+        entry = series.get(team_id)
+        if entry is None:
+            entry = series[team_id] = [b"", b"", b"", b"", XgState()]
+        gf_pack, ga_pack, day_pack, league_pack, state = entry
+        day = ko[:10]
+
+        # O(1): el partido que sale de la ventana es el último byte
+        full    = len(gf_pack) >= SERIES_MAX and len(ga_pack) >= SERIES_MAX
+        evicted = (gf_pack[SERIES_MAX - 1], ga_pack[SERIES_MAX - 1],
+                   (unpack_days(day_pack[2 * keep:2 * SERIES_MAX]) or [None])[0]) if full else None
+        state.push(gf, ga, day, evicted, decay=XG_DECAY_FACTOR,
+                   mode=XG_DECAY_MODE, half_life=XG_HALF_LIFE_DAYS)
+
+        # las series son bytes de ancho fijo: se antepone sin desempaquetar
+        entry[0] = pack_goals([gf]) + gf_pack[:keep]
+        entry[1] = pack_goals([ga]) + ga_pack[:keep]
+        entry[2] = pack_days([day]) + day_pack[:2 * keep]
+        entry[3] = pack_leagues([league_id]) + league_pack[:2 * keep]
+
+    now = datetime.now(timezone.utc).isoformat()
+    conn.executemany("""INSERT OR REPLACE INTO team_xg_cache
+        (team_id, gf_pack, ga_pack, day_pack, league_pack,
+         xg_num_for, xg_num_against, xg_den, xg_matches, last_match_day,
+         xg_for, xg_against, confidence, updated_at, depth)
+        VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)""",
+        [(team_id, gf_pack, ga_pack, day_pack, league_pack,
+          *state.as_row(), state.xg_for, state.xg_against,
+          "HIGH" if len(gf_pack) >= 4 else "MED", now, len(gf_pack))
+         for team_id, (gf_pack, ga_pack, day_pack, league_pack, state) in series.items()])
+    conn.executemany("INSERT OR IGNORE INTO xg_result_log VALUES (?,?,?)",
+                     [(r[1], r[2], now) for r in new])
+    return len(new)
+
+
 # ==========================================
 # VALIDACIONES
 # ==========================================
 
-def validate_xg(xh, xa, bets):
-    home_odd = away_odd = over_odd = under_odd = None
-    for b in bets:
-        if b["id"] == 1:
-            for v in b["values"]:
-                try:
-                    if v["value"] == "Home": home_odd = float(v["odd"])
-                    if v["value"] == "Away": away_odd = float(v["odd"])
-                except:
-                    pass
-        elif b["id"] == 5:
-            for v in b["values"]:
-                try:
-                    if v["value"] == "Over 2.5":  over_odd  = float(v["odd"])
-                    if v["value"] == "Under 2.5": under_odd = float(v["odd"])
-                except:
-                    pass
+def validate_xg(xh, xa, odds):
+    home_odd  = odds.odd(1, "Home")
+    away_odd  = odds.odd(1, "Away")
+    over_odd  = odds.odd(5, "Over 2.5")
+    under_odd = odds.odd(5, "Under 2.5")
 
     if home_odd and away_odd:
         min_odd  = min(home_odd, away_odd)
@@ -852,63 +1063,44 @@ def sanity_check(p_true, mkt, odd):
 # PRICING ENGINE
 # ==========================================
 
-def build_market_probs(bets, xh, xa, h_n, a_n, conf, league_name):
-    probs = []
-    po, pu   = calc_over_under(xh + xa, league_name=league_name)
-    p_by, pn = calc_btts(xh, xa) if conf != "LOW" else (None, None)
-    poisson  = bivariate_poisson_1x2(xh, xa) if conf != "LOW" else None
+def _scan_var(league_name, xt):
+    """Varianza del total de goles con la que el scan valora un partido."""
+    return max(XG_STD_BY_LEAGUE.get(league_name, 1.45) ** 2, xt)
+
 
+def build_market_probs(odds, xh, xa, h_n, a_n, conf, league_name, book=None):
+    probs = []
+    if book is None:
+        book = market_book(xh, xa, league_name)
+    po, _, pu = (float(x) for x in book.over_under(2.5))
+    p_by, pn = calc_btts(xh, xa, book=book) if conf != "LOW" else (None, None)
+    poisson  = bivariate_poisson_1x2(xh, xa, book=book) if conf != "LOW" else None
+
+    # (bet_id, value) → (mercado, texto, prob. modelo, vig)
+    wanted = {(5, "Over 2.5"):  ("OVER",  "Over 2.5 Goles",  po, 1.07),
+              (5, "Under 2.5"): ("UNDER", "Under 2.5 Goles", pu, 1.07)}
     if poisson:
         p_h, p_d, p_a = poisson
-        p_1x2 = {"Home": p_h, "Draw": p_d, "Away": p_a}
-        names  = {"Home": f"Gana {h_n}", "Draw": "Empate", "Away": f"Gana {a_n}"}
-    else:
-        p_1x2 = {}
-
-    for b in bets:
-        if b["id"] == 1:
-            for v in b["values"]:
-                if v["value"] not in p_1x2:
-                    continue
-                odd       = float(v["odd"])
-                p_true    = p_1x2[v["value"]]
-                p_implied = 1 / (odd * 1.05)
-                probs.append({
-                    "mkt": "1X2", "pick": names[v["value"]],
-                    "odd": odd, "prob": p_true,
-                    "bid": b["id"], "val": v["value"],
-                    "model_gap": round(p_true - p_implied, 4)
-                })
-
-        elif b["id"] == 5:
-            for v in b["values"]:
-                if v["value"] not in ("Over 2.5", "Under 2.5"):
-                    continue
-                is_over   = "Over" in v["value"]
-                mkt_type  = "OVER" if is_over else "UNDER"
-                p_true    = po if is_over else pu
-                odd       = float(v["odd"])
-                p_implied = 1 / (odd * 1.07)
-                probs.append({
-                    "mkt": mkt_type, "pick": f"{v['value']} Goles",
-                    "odd": odd, "prob": p_true,
-                    "bid": b["id"], "val": v["value"],
-                    "model_gap": round(p_true - p_implied, 4)
-                })
-
-        elif b["id"] == 8 and p_by is not None:
-            for v in b["values"]:
-                if v["value"] not in ("Yes", "No"):
-                    continue
-                p_true    = p_by if v["value"] == "Yes" else pn
-                odd       = float(v["odd"])
-                p_implied = 1 / (odd * 1.06)
-                probs.append({
-                    "mkt": "BTTS", "pick": f"Ambos Marcan: {v['value']}",
-                    "odd": odd, "prob": p_true,
-                    "bid": b["id"], "val": v["value"],
-                    "model_gap": round(p_true - p_implied, 4)
-                })
+        wanted[(1, "Home")] = ("1X2", f"Gana {h_n}", p_h, 1.05)
+        wanted[(1, "Draw")] = ("1X2", "Empate",      p_d, 1.05)
+        wanted[(1, "Away")] = ("1X2", f"Gana {a_n}", p_a, 1.05)
+    if p_by is not None:
+        wanted[(8, "Yes")] = ("BTTS", "Ambos Marcan: Yes", p_by, 1.06)
+        wanted[(8, "No")]  = ("BTTS", "Ambos Marcan: No",  pn,   1.06)
+
+    # en el orden de la API, como el recorrido de `bets` de antes
+    for bid, _, val, odd, _ in odds.items():
+        spec = wanted.get((bid, val))
+        if spec is None:
+            continue
+        mkt, pick, p_true, vig = spec
+        p_implied = 1 / (odd * vig)
+        probs.append({
+            "mkt": mkt, "pick": pick,
+            "odd": odd, "prob": p_true,
+            "bid": bid, "val": val,
+            "model_gap": round(p_true - p_implied, 4)
+        })
 
     return probs
 
@@ -920,8 +1112,20 @@ def build_market_probs(bets, xh, xa, h_n, a_n, conf, league_name):
 class QuantFundEuropean:
     def __init__(self):
         init_db()
+        GOVERNOR.attach(DB_PATH)
+        CLV_STATS.attach(DB_PATH)
+        FIXTURE_STORE.attach(DB_PATH)
+        self.closing = ClosingScheduler(self.capture_closing_lines,
+                                        on_missed=self._mark_close_missed)
+        self.closing.rebuild(DB)
         self.headers = {"x-apisports-key": API_SPORTS_KEY}
-        sync_request_counter(self.headers)
+
+    def startup_diagnostics(self):
+        """
+        Diagnóstico de arranque como job del runner (ya no en __init__): DB,
+        /status y fixtures próximos en paralelo y el mensaje de Telegram.
+        """
+        db_diagnostics()
         api_ok, plan_info, req_info, access_ok, access_detail = self._startup_diagnostics()
         mode = "🔴 LIVE" if LIVE_TRADING else "🟡 DRY-RUN"
         self.send_msg(
@@ -932,245 +1136,304 @@ class QuantFundEuropean:
             f"{'✅' if access_ok else '❌'} Ligas: {access_detail}"
         )
 
+    def _diag_fixtures(self, d):
+        r = api_get("/fixtures", self.headers, params={"date": d})
+        fixtures = r.json().get("response", [])
+        # FIX v5.13: poblar cache — run_daily_scan reutiliza sin req extra
+        FIXTURE_STORE.put(d, fixtures)
+        return {fix["league"]["id"] for fix in fixtures
+                if fix["league"]["id"] in TARGET_LEAGUES}
+
     def _startup_diagnostics(self):
-        try:
-            r        = requests.get("https://v3.football.api-sports.io/status",
-                                    headers=self.headers, timeout=10)
-            track_requests(1)
-            raw      = r.json()
-            resp     = raw if isinstance(raw, dict) else {}
-            data     = resp.get("response", {})
-            if isinstance(data, list):
-                data = data[0] if data else {}
+        # /status y D+0..D+2 (que el scan va a usar igualmente) a la vez;
+        # D+3/D+4 solo si aún faltan ligas, como antes
+        days = [(datetime.now() + timedelta(days=d_off)).strftime("%Y-%m-%d")
+                for d_off in range(5)]
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            status = pool.submit(sync_request_counter, self.headers)
+            near   = [pool.submit(self._diag_fixtures, d) for d in days[:3]]
+
+            data = status.result()
+            if data is None:
+                return False, "error de conexión", "?/?", False, "sin respuesta de /status"
             sub     = data.get("subscription", {})
             reqs    = data.get("requests", {})
             plan    = sub.get("plan", "Unknown")
             active  = sub.get("active", False)
-            current = reqs.get("current", "?")
-            limit   = reqs.get("limit_day", "?")
             plan_info = f"{plan} ({'activo' if active else '⚠️ INACTIVO'})"
-            req_info  = f"{current}/{limit}"
+            req_info  = f"{reqs.get('current', '?')}/{reqs.get('limit_day', '?')}"
             if not active:
                 return False, plan_info, req_info, False, "suscripción inactiva"
-        except Exception as e:
-            return False, "error de conexión", "?/?", False, str(e)
 
-        try:
-            league_found = set()
-            for d_off in range(5):
-                d = (datetime.now() + timedelta(days=d_off)).strftime("%Y-%m-%d")
-                r = requests.get("https://v3.football.api-sports.io/fixtures",
-                                 headers=self.headers, params={"date": d}, timeout=10)
-                track_requests(1)
-                fixtures = r.json().get("response", [])
-                # FIX v5.13: poblar cache — run_daily_scan reutiliza sin req extra
-                _DATE_FIXTURES_CACHE[d] = fixtures
-                for fix in fixtures:
-                    lid = fix["league"]["id"]
-                    if lid in TARGET_LEAGUES:
-                        league_found.add(lid)
-                if len(league_found) >= 4:
-                    break
-                time.sleep(0.5)
+            try:
+                league_found = set()
+                for f in near:
+                    league_found |= f.result()
+                for d in days[3:]:
+                    if len(league_found) >= 4:
+                        break
+                    league_found |= self._diag_fixtures(d)
+            except Exception as e:
+                return True, plan_info, req_info, False, str(e)
 
-            names_found = [TARGET_LEAGUES[lid].split()[-1] for lid in league_found]
-            detail = (f"{len(league_found)}/9 ligas con fixtures próximos "
-                      f"({', '.join(names_found[:4])}{'...' if len(names_found)>4 else ''})")
-            return True, plan_info, req_info, len(league_found) > 0, detail
-        except Exception as e:
-            return True, plan_info, req_info, False, str(e)
+        names_found = [TARGET_LEAGUES[lid].split()[-1] for lid in league_found]
+        detail = (f"{len(league_found)}/9 ligas con fixtures próximos "
+                  f"({', '.join(names_found[:4])}{'...' if len(names_found)>4 else ''})")
+        return True, plan_info, req_info, len(league_found) > 0, detail
 
     def send_msg(self, text):
         if not TELEGRAM_TOKEN:
             print("⚠️  TELEGRAM_TOKEN vacío")
             return
         try:
-            r = requests.post(
-                f"https://api.telegram.org/bot{TELEGRAM_TOKEN}/sendMessage",
-                json={"chat_id": TELEGRAM_CHAT_ID, "text": text, "parse_mode": "HTML"},
-                timeout=10
+            r = telegram_post(
+                TELEGRAM_TOKEN, "sendMessage",
+                {"chat_id": TELEGRAM_CHAT_ID, "text": text, "parse_mode": "HTML"}
             )
             if not r.ok:
                 print(f"⚠️  Telegram {r.status_code}: {r.text[:200]}")
         except Exception as e:
             print(f"⚠️  Telegram error: {e}")
 
-    def _fetch_and_store_odds(self, c, fid, mkt, skey, now, mark_captured=True):
-        res = requests.get(
-            f"https://v3.football.api-sports.io/odds?fixture={fid}&bookmaker=8",
-            headers=self.headers, timeout=10
+    def _fetch_fixture_odds(self, fid):
+        """
+        Un /odds por fixture → FixtureOdds con TODAS las apuestas del
+        bookmaker. Las selecciones de todos los picks de ese partido se
+        resuelven en memoria con by_key().
+        """
+        res = api_get(
+            "/odds", self.headers, params={"fixture": fid, "bookmaker": 8}
         ).json()
-        track_requests(1)
-        found = False
-        if res.get("response"):
-            for b in res["response"][0]["bookmakers"][0]["bets"]:
-                for v in b["values"]:
-                    if f"{b['id']}|{v['value']}" != skey:
-                        continue
-                    odd_val = float(v["odd"])
-                    c.execute(
-                        "SELECT COUNT(*) FROM closing_lines "
-                        "WHERE fixture_id=? AND market=? AND selection_key=?",
-                        (fid, mkt, skey)
-                    )
-                    exists = c.fetchone()[0] > 0
-                    if mark_captured:
-                        if exists:
-                            c.execute(
-                                "UPDATE closing_lines SET odd_close=?, implied_prob_close=?, "
-                                "capture_time=? WHERE fixture_id=? AND market=? AND selection_key=?",
-                                (odd_val, 1/odd_val, now.isoformat(), fid, mkt, skey)
-                            )
-                        else:
-                            c.execute(
-                                "INSERT INTO closing_lines VALUES (NULL,?,?,?,?,?,?)",
-                                (fid, mkt, skey, odd_val, 1/odd_val, now.isoformat())
-                            )
-                    else:
-                        if not exists:
-                            c.execute(
-                                "INSERT INTO closing_lines VALUES (NULL,?,?,?,?,?,?)",
-                                (fid, mkt, skey, odd_val, 1/odd_val, now.isoformat())
-                            )
-                    found = True
-                    break
-        return found
+        if not res.get("response"):
+            return FixtureOdds(8)
+        return FixtureOdds.from_bets(res["response"][0]["bookmakers"][0]["bets"], bookmaker=8)
+
+    def _store_snapshot(self, c, fid, pick, odds, now, phase):
+        """Guarda el libro completo del partido en line_snapshots."""
+        home, away, ko = pick["home"], pick["away"], pick["ko"]
+        opens = pick["opens"]
+        rows  = []
+        for bid, name, val, odd, _ in odds.items():
+            skey = selection_key(bid, val)
+            rows.append((fid, home, away, ko, name, val, skey, odd,
+                         opens.get(skey), now.isoformat(), phase))
+        c.executemany(
+            "INSERT INTO line_snapshots "
+            "(fixture_id, home_team, away_team, kickoff_time, market, selection, "
+            " selection_key, odd_snapshot, odd_open, captured_at, phase) "
+            "VALUES (?,?,?,?,?,?,?,?,?,?,?)",
+            rows
+        )
 
-    def capture_midday_lines(self):
-        try:
-            conn = sqlite3.connect(DB_PATH)
-            c    = conn.cursor()
-            now  = datetime.now(timezone.utc)
+    def _store_line(self, c, fid, mkt, skey, line, now, mark_captured=True):
+        odd_val, implied = line
+        if mark_captured:
             c.execute(
-                "SELECT id, fixture_id, market, selection_key, kickoff_time "
-                "FROM picks_log WHERE clv_captured = 0"
+                "INSERT INTO closing_lines "
+                "(fixture_id, market, selection_key, odd_close, implied_prob_close, capture_time) "
+                "VALUES (?,?,?,?,?,?) "
+                "ON CONFLICT(fixture_id, market, selection_key) DO UPDATE SET "
+                "odd_close=excluded.odd_close, "
+                "implied_prob_close=excluded.implied_prob_close, "
+                "capture_time=excluded.capture_time",
+                (fid, mkt, skey, odd_val, implied, now.isoformat())
             )
-            for pid, fid, mkt, skey, ko in c.fetchall():
-                mins = (datetime.fromisoformat(ko) - now).total_seconds() / 60.0
-                if 120.0 <= mins <= 360.0:
-                    self._fetch_and_store_odds(c, fid, mkt, skey, now, mark_captured=False)
-                    time.sleep(2.0)
-            conn.commit()
-            conn.close()
+        else:
+            c.execute(
+                "INSERT OR IGNORE INTO closing_lines "
+                "(fixture_id, market, selection_key, odd_close, implied_prob_close, capture_time) "
+                "VALUES (?,?,?,?,?,?)",
+                (fid, mkt, skey, odd_val, implied, now.isoformat())
+            )
+
+    def _pending_picks_by_fixture(self, c, now, min_mins, max_mins, fixture_ids=None):
+        """Picks sin CLV con kickoff en [min_mins, max_mins], agrupados por fixture."""
+        sql = ("SELECT id, fixture_id, market, selection_key, kickoff_time, odd_open, "
+               "home_team, away_team FROM picks_log WHERE clv_captured = 0")
+        if fixture_ids is not None:
+            fixture_ids = list(fixture_ids)
+            sql += f" AND fixture_id IN ({','.join('?' * len(fixture_ids))})"
+        c.execute(sql, fixture_ids or ())
+        groups = {}
+        for pid, fid, mkt, skey, ko, odd_open, home, away in c.fetchall():
+            mins = (datetime.fromisoformat(ko) - now).total_seconds() / 60.0
+            if not (min_mins <= mins <= max_mins):
+                continue
+            g = groups.setdefault(fid, {"home": home, "away": away, "ko": ko,
+                                        "opens": {}, "picks": []})
+            g["opens"][skey] = odd_open
+            g["picks"].append((pid, mkt, skey, odd_open))
+        return groups
+
+    def _fetch_pending_odds(self, groups):
+        """
+        Fase de red de las capturas, SIN transacción abierta: un /odds por
+        partido, al ritmo del token bucket de GOVERNOR. Un partido que falla
+        se queda fuera (sigue pendiente) y no tumba a los demás.
+        """
+        fetched = {}
+        for fid in groups:
+            try:
+                fetched[fid] = self._fetch_fixture_odds(fid)
+            except Exception as e:
+                print(f"  ⚠️  odds {fid}: {e}")
+        return fetched
+
+    def capture_midday_lines(self):
+        now    = datetime.now(timezone.utc)
+        groups = self._pending_picks_by_fixture(DB.connection().cursor(), now, 120.0, 360.0)
+        fetched = self._fetch_pending_odds(groups)
+        try:
+            with DB.unit_of_work() as conn:
+                c = conn.cursor()
+                for fid, odds in fetched.items():
+                    if not odds:
+                        continue
+                    group = groups[fid]
+                    self._store_snapshot(c, fid, group, odds, now, "MIDDAY")
+                    for pid, mkt, skey, _ in group["picks"]:
+                        hit = odds.by_key(skey)
+                        if hit:
+                            self._store_line(c, fid, mkt, skey, hit, now,
+                                             mark_captured=False)
         except:
             pass
 
-    def capture_closing_lines(self):
+    def _mark_close_missed(self, fixture_ids):
+        """Cierres que el scheduler dio por perdidos: como un cierre sin cuota."""
+        fixture_ids = list(fixture_ids)
+        DB.execute(
+            f"UPDATE picks_log SET clv_captured = -1 WHERE clv_captured = 0 "
+            f"AND fixture_id IN ({','.join('?' * len(fixture_ids))})", fixture_ids
+        )
+
+    def capture_closing_lines(self, fixture_ids=None):
+        """
+        Cierre de los picks a <= 60 min del kickoff. Con fixture_ids (lo que
+        dispara CLOSING) solo esos partidos; devuelve los que siguen sin
+        capturar para que el scheduler los reintente.
+        """
+        if fixture_ids is not None and not fixture_ids:
+            return set()
+        now = datetime.now(timezone.utc)
+        # con fixture_ids el scheduler ya decidió que tocan: sin ventana
+        max_mins = 60.0 if fixture_ids is None else float("inf")
+        groups  = self._pending_picks_by_fixture(DB.connection().cursor(), now,
+                                                 float("-inf"), max_mins, fixture_ids)
+        fetched = self._fetch_pending_odds(groups)
+        captured = 0
         try:
-            conn = sqlite3.connect(DB_PATH)
-            c    = conn.cursor()
-            now  = datetime.now(timezone.utc)
-            c.execute(
-                "SELECT id, fixture_id, market, selection_key, kickoff_time "
-                "FROM picks_log WHERE clv_captured = 0"
-            )
-            for pid, fid, mkt, skey, ko in c.fetchall():
-                mins = (datetime.fromisoformat(ko) - now).total_seconds() / 60.0
-                if mins <= 60.0:
-                    found = self._fetch_and_store_odds(
-                        c, fid, mkt, skey, now, mark_captured=True
-                    )
-                    time.sleep(2.0)
-                    c.execute(
-                        "UPDATE picks_log SET clv_captured=? WHERE id=?",
-                        (1 if found else -1, pid)
-                    )
-            conn.commit()
-            conn.close()
+            with DB.unit_of_work() as conn:
+                c = conn.cursor()
+                for fid, odds in fetched.items():
+                    group = groups[fid]
+                    if odds:
+                        self._store_snapshot(c, fid, group, odds, now, "CLOSE")
+                    for pid, mkt, skey, odd_open in group["picks"]:
+                        hit = odds.by_key(skey)
+                        odd_close = hit[0] if hit else None
+                        if odd_close:
+                            self._store_line(c, fid, mkt, skey, hit, now,
+                                             mark_captured=True)
+                        c.execute(
+                            "UPDATE picks_log SET clv_captured=? WHERE id=? AND clv_captured=0",
+                            (1 if odd_close else -1, pid)
+                        )
+                        if odd_close and c.rowcount:
+                            CLV_STATS.push(mkt, odd_open, odd_close)
+                            captured += 1
+                if captured:
+                    CLV_STATS.save()
         except:
-            pass
+            # la transacción se deshizo: las ventanas vuelven a lo guardado
+            if captured:
+                CLV_STATS.load()
+            captured = 0
+        if captured:
+            # nuevos CLVs → el snapshot de riesgo ya no vale
+            invalidate_risk_state()
+        if fixture_ids is None:
+            return set()
+        fixture_ids = list(fixture_ids)
+        rows = DB.fetchall(
+            f"SELECT DISTINCT fixture_id FROM picks_log WHERE clv_captured = 0 "
+            f"AND fixture_id IN ({','.join('?' * len(fixture_ids))})", fixture_ids
+        )
+        return {r[0] for r in rows}
 
     def weekly_xg_cache(self):
         clear_date_cache()
-        BUDGET_MAX  = 44
-        req_inicio  = track_requests(0)
+        budget = GOVERNOR.reserve("weekly_xg_cache", XG_WARMUP_BUDGET, strict=True)
 
-        def reqs_gastados():
-            return track_requests(0) - req_inicio
-
-        try:
-            teams_by_league = {lid: {} for lid in TARGET_LEAGUES}
-            ligas_completas = set()
+        with budget:
+            try:
+                teams_by_league = {lid: {} for lid in TARGET_LEAGUES}
+                ligas_completas = set()
 
-            for days_back in range(1, 16):
-                if reqs_gastados() >= BUDGET_MAX:
-                    break
-                if len(ligas_completas) == len(TARGET_LEAGUES):
-                    break
-                d = (datetime.now() - timedelta(days=days_back)).strftime("%Y-%m-%d")
-                try:
-                    r = requests.get(
-                        "https://v3.football.api-sports.io/fixtures",
-                        headers=self.headers, params={"date": d}, timeout=10
-                    )
-                    track_requests(1)
-                    for fix in r.json().get("response", []):
-                        lid = fix["league"]["id"]
-                        if lid not in TARGET_LEAGUES:
-                            continue
-                        if fix["fixture"]["status"]["short"] != "FT":
-                            continue
-                        teams_by_league[lid][fix["teams"]["home"]["id"]] = fix["teams"]["home"]["name"]
-                        teams_by_league[lid][fix["teams"]["away"]["id"]] = fix["teams"]["away"]["name"]
-                        if len(teams_by_league[lid]) >= 18:
-                            ligas_completas.add(lid)
-                    time.sleep(0.5)
-                except:
-                    pass
-
-            for lid, lname in TARGET_LEAGUES.items():
-                n = len(teams_by_league[lid])
-                sample = list(teams_by_league[lid].values())[:6]
-                print(f"  {lname}: {n} equipos → {', '.join(sample)}{'...' if n>6 else ''}")
-
-            total_cached = total_skipped = 0
-            for lid, lname in TARGET_LEAGUES.items():
-                for team_id, team_name in teams_by_league[lid].items():
-                    if reqs_gastados() >= BUDGET_MAX:
-                        print("  ⚠️  Budget máximo alcanzado — parando cache")
+                for days_back in range(1, 16):
+                    if budget.exhausted:
                         break
+                    if len(ligas_completas) == len(TARGET_LEAGUES):
+                        break
+                    d = (datetime.now() - timedelta(days=days_back)).strftime("%Y-%m-%d")
                     try:
-                        conn = sqlite3.connect(DB_PATH)
-                        cc   = conn.cursor()
-                        cc.execute(
-                            "SELECT updated_at, depth FROM team_xg_cache WHERE team_id=?",
-                            (team_id,)
-                        )
-                        row = cc.fetchone()
-                        conn.close()
-                        if row:
-                            age = (datetime.now(timezone.utc) -
-                                   datetime.fromisoformat(row[0])).total_seconds() / 3600
-                            if age < XG_CACHE_TTL_HOURS and (row[1] or 0) >= 10:
-                                total_skipped += 1
+                        # pasa por el store: los días FT ya guardados no gastan req
+                        for fix in _get_fixtures_for_date(d, self.headers):
+                            lid = fix["league"]["id"]
+                            if lid not in TARGET_LEAGUES:
                                 continue
+                            if fix["fixture"]["status"]["short"] != "FT":
+                                continue
+                            teams_by_league[lid][fix["teams"]["home"]["id"]] = fix["teams"]["home"]["name"]
+                            teams_by_league[lid][fix["teams"]["away"]["id"]] = fix["teams"]["away"]["name"]
+                            if len(teams_by_league[lid]) >= 18:
+                                ligas_completas.add(lid)
                     except:
                         pass
 
-                    fetch_team_xg(team_id, self.headers, league_id=lid, use_cache=False, depth=10)
-                    total_cached += 1
-                    time.sleep(1.5)
-
-                    try:
-                        conn = sqlite3.connect(DB_PATH)
-                        cc   = conn.cursor()
-                        cc.execute(
-                            "UPDATE team_xg_cache SET team_name=?, depth=10 WHERE team_id=?",
-                            (team_name, team_id)
-                        )
-                        conn.commit()
-                        conn.close()
-                    except:
-                        pass
+                for lid, lname in TARGET_LEAGUES.items():
+                    n = len(teams_by_league[lid])
+                    sample = list(teams_by_league[lid].values())[:6]
+                    print(f"  {lname}: {n} equipos → {', '.join(sample)}{'...' if n>6 else ''}")
+
+                total_cached = total_skipped = 0
+                for lid, lname in TARGET_LEAGUES.items():
+                    for team_id, team_name in teams_by_league[lid].items():
+                        if budget.exhausted:
+                            print("  ⚠️  Budget máximo alcanzado — parando cache")
+                            break
+                        try:
+                            row = DB.fetchone(
+                                "SELECT updated_at, depth FROM team_xg_cache WHERE team_id=?",
+                                (team_id,)
+                            )
+                            if row:
+                                age = (datetime.now(timezone.utc) -
+                                       datetime.fromisoformat(row[0])).total_seconds() / 3600
+                                if age < XG_CACHE_TTL_HOURS and (row[1] or 0) >= 10:
+                                    total_skipped += 1
+                                    continue
+                        except:
+                            pass
+
+                        fetch_team_xg(team_id, self.headers, league_id=lid, use_cache=False, depth=10)
+                        total_cached += 1
+
+                        try:
+                            DB.execute(
+                                "UPDATE team_xg_cache SET team_name=?, depth=10 WHERE team_id=?",
+                                (team_name, team_id)
+                            )
+                        except:
+                            pass
 
-            req_total = reqs_gastados()
-            self.send_msg(
-                f"🔄 <b>xG Cache V5.13 actualizada</b>\n"
-                f"Equipos cacheados: {total_cached} | Saltados: {total_skipped}\n"
-                f"📡 Requests warmup: {req_total}/{BUDGET_MAX} máx"
-            )
-        except Exception as e:
-            self.send_msg(f"⚠️ weekly_xg_cache error: {e}")
+                self.send_msg(
+                    f"🔄 <b>xG Cache V5.13 actualizada</b>\n"
+                    f"Equipos cacheados: {total_cached} | Saltados: {total_skipped}\n"
+                    f"📡 Requests warmup: {budget.spent}/{budget.limit} máx"
+                )
+            except Exception as e:
+                self.send_msg(f"⚠️ weekly_xg_cache error: {e}")
 
     def update_league_advanced_factors(self):
         today   = datetime.now(timezone.utc)
@@ -1179,72 +1442,365 @@ class QuantFundEuropean:
             0: [39, 94], 1: [140, 88], 2: [135],
             3: [78],     4: [61],      5: [2],  6: [3]
         }
-        if weekday not in schedule_ligas:
-            return
-        for league_id in schedule_ligas[weekday]:
+        season  = today.year if today.month >= 8 else today.year - 1
+        leagues = list(schedule_ligas.get(weekday, []))
+        # refresh a medias de otro día: se retoma aunque no le toque hoy
+        leagues += [l for l in self._pending_league_refreshes(season) if l not in leagues]
+        for league_id in leagues:
             league_name = TARGET_LEAGUES.get(league_id)
             if not league_name:
                 continue
-            season = today.year if today.month >= 8 else today.year - 1
+            self._refresh_league(league_id, league_name, season, today)
+
+    def _pending_league_refreshes(self, season):
+        """
+        Ligas con stats de equipo aún reutilizables y más nuevas que su
+        fila de factores. Pasados LEAGUE_STATS_MAX_AGE_D días sin llegar
+        a LEAGUE_STATS_MIN_SHARE la liga deja de reintentarse y espera a
+        su día del calendario.
+        """
+        cutoff = (datetime.now(timezone.utc)
+                  - timedelta(days=LEAGUE_STATS_MAX_AGE_D)).isoformat()
+        last = dict(DB.fetchall("SELECT league, last_updated FROM league_advanced_factors"))
+        return [lid for lid, newest in DB.fetchall(
+                    "SELECT league_id, MAX(fetched_at) FROM league_team_stats "
+                    "WHERE season=? AND fetched_at>=? GROUP BY league_id", (season, cutoff))
+                if lid in TARGET_LEAGUES and newest > (last.get(TARGET_LEAGUES[lid]) or "")]
+
+    def _team_stats(self, league_id, season, team_id):
+        """(shots, shots_on, goals, played) del equipo; lanza si la API falla."""
+        r = api_get(
+            "/teams/statistics", self.headers,
+            params={"league": league_id, "season": season, "team": team_id},
+            timeout=15
+        )
+        body = r.json()
+        if r.status_code != 200 or body.get("errors"):
+            raise RuntimeError(f"/teams/statistics {team_id}: {r.status_code} {body.get('errors')}")
+        stats = body.get("response") or {}
+        try:
+            return (stats["shots"].get("total", 0) or 0, stats["shots"].get("on", 0) or 0,
+                    stats["goals"]["for"]["total"].get("total", 0) or 0,
+                    stats["fixtures"]["played"].get("total", 0) or 0)
+        except (KeyError, TypeError, AttributeError):
+            return 0, 0, 0, 0           # sin datos: se guarda y no cuenta en la media
+
+    def _refresh_league(self, league_id, league_name, season, today):
+        try:
+            teams = api_get(
+                "/teams", self.headers,
+                params={"league": league_id, "season": season},
+                timeout=15
+            ).json().get("response", [])
+        except:
+            return
+        team_ids = [t["team"]["id"] for t in teams]
+        cutoff   = (today - timedelta(days=LEAGUE_STATS_MAX_AGE_D)).isoformat()
+        stored   = {tid: tuple(row) for tid, *row in DB.fetchall(
+            "SELECT team_id, shots, shots_on, goals, played FROM league_team_stats "
+            "WHERE league_id=? AND season=? AND fetched_at>=?", (league_id, season, cutoff))}
+        todo = [t for t in team_ids if t not in stored]
+
+        # el ritmo lo pone el token bucket de GOVERNOR (antes sleep(1.1) por
+        # equipo); copy_context: la reserva de presupuesto activa viaja al hilo
+        failed = 0
+        if todo:
+            with ThreadPoolExecutor(max_workers=LEAGUE_STATS_CONCURRENCY) as pool:
+                futures = {pool.submit(contextvars.copy_context().run, self._team_stats,
+                                       league_id, season, t): t for t in todo}
+                for fut in as_completed(futures):
+                    t = futures[fut]
+                    try:
+                        row = fut.result()
+                    except Exception:
+                        failed += 1
+                        continue
+                    DB.execute("INSERT OR REPLACE INTO league_team_stats VALUES (?,?,?,?,?,?,?,?)",
+                               (league_id, season, t, *row,
+                                datetime.now(timezone.utc).isoformat()))
+                    stored[t] = row
+        # como el bucle anterior, un equipo sin stats se salta; con demasiados
+        # fallos la media no es de la liga y se reanuda en el próximo refresh
+        valid = [stored[t] for t in team_ids if t in stored]
+        if len(valid) < LEAGUE_STATS_MIN_SHARE * len(team_ids):
+            print(f"  ⚠️  {league_name}: {failed}/{len(team_ids)} equipos sin stats — "
+                  f"se reanuda en el próximo refresh")
+            return
+        if failed:
+            print(f"  ⚠️  {league_name}: {failed}/{len(team_ids)} equipos sin stats — se omiten")
+
+        agg = self._league_aggregates(valid)
+        if agg is None:
+            return
+        sh_avg, sot_avg, gps, gsot, std_proxy, m_total = agg
+        DB.execute("""INSERT INTO league_advanced_factors
+            (league, shots_avg, shots_on_target_avg, goals_per_shot,
+             goals_per_sot, goal_std, matches, window_days, last_updated)
+            VALUES (?,?,?,?,?,?,?,?,?)
+            ON CONFLICT(league) DO UPDATE SET
+                shots_avg=excluded.shots_avg,
+                shots_on_target_avg=excluded.shots_on_target_avg,
+                goal_std=excluded.goal_std,
+                last_updated=excluded.last_updated""",
+            (league_name, round(sh_avg, 2), round(sot_avg, 2),
+             round(gps, 4), round(gsot, 4), round(std_proxy, 3),
+             int(m_total), 30, datetime.now(timezone.utc).isoformat()))
+        print(f"  📊 {league_name}: {len(team_ids)} equipos "
+              f"({len(todo)} pedidos, {len(team_ids) - len(todo)} reanudados)")
+
+    def _league_aggregates(self, rows):
+        """
+        (shots_avg, sot_avg, goals_per_shot, goals_per_sot, std_proxy, partidos)
+        de una liga desde (shots, shots_on, goals, played) por equipo. Solo
+        cuentan equipos con tiros, goles y partidos; None si no queda ninguno.
+        """
+        ok = [r for r in rows if r[0] > 0 and r[2] > 0 and r[3] > 0]
+        m_total = sum(r[3] for r in ok) / 2
+        if m_total <= 0:
+            return None
+        t_shots = sum(r[0] for r in ok)
+        t_sot   = sum(r[1] for r in ok)
+        t_goals = sum(r[2] for r in ok)
+        sh_avg  = t_shots / m_total
+        gps     = t_goals / t_shots
+        return (sh_avg, t_sot / m_total, gps, t_goals / max(t_sot, 1),
+                math.sqrt(gps * sh_avg), m_total)
+
+    def _fetch_fixture_inputs(self, m, odds=None, xg=None):
+        fid  = m["fixture"]["id"]
+        h_n  = m["teams"]["home"]["name"]
+        a_n  = m["teams"]["away"]["name"]
+        h_id = m["teams"]["home"]["id"]
+        a_id = m["teams"]["away"]["id"]
+        lid  = m["league"]["id"]
+        l_name = TARGET_LEAGUES[lid]
+        print(f"\n  ── {h_n} vs {a_n} ({l_name}) (fid={fid}) ──")
+
+        # cuotas del bloque por liga si las hay; si no, /odds del partido
+        f_odds = odds.lookup(fid) if odds is not None else None
+        if f_odds is None:
             try:
-                teams = requests.get(
-                    "https://v3.football.api-sports.io/teams",
-                    headers=self.headers,
-                    params={"league": league_id, "season": season},
-                    timeout=15
+                odds_res = api_get(
+                    "/odds", self.headers,
+                    params={"fixture": fid, "bookmaker": 8}
                 ).json().get("response", [])
-                track_requests(1)
             except:
+                return None
+            if not odds_res:
+                return None
+            f_odds = FixtureOdds.from_bets(odds_res[0]["bookmakers"][0]["bets"], bookmaker=8)
+        if not f_odds:
+            return None
+
+        # lesiones aparte (_fetch_injuries): solo si el prefiltro las necesita
+        base_h, base_a, conf, xg_src = build_xg_base(h_id, a_id, lid, self.headers,
+                                                     depth=6, xg=xg)
+        return {"odds": f_odds, "base_h": base_h, "base_a": base_a,
+                "conf": conf, "xg_src": xg_src}
+
+    def _fetch_injuries(self, m):
+        fid  = m["fixture"]["id"]
+        h_n  = m["teams"]["home"]["name"]
+        a_n  = m["teams"]["away"]["name"]
+        h_id = m["teams"]["home"]["id"]
+        a_id = m["teams"]["away"]["id"]
+        try:
+            inj_res = api_get(
+                "/injuries", self.headers, params={"fixture": fid}
+            ).json().get("response", [])
+            hinj = sum(1 for i in inj_res if i["team"]["id"] == h_id)
+            ainj = sum(1 for i in inj_res if i["team"]["id"] == a_id)
+            print(f"     [{fid}] Lesionados: {h_n}={hinj} {a_n}={ainj}")
+        except:
+            hinj = ainj = 0
+        return hinj, ainj
+
+    def _injury_prefilter(self, ready):
+        """
+        fixture_ids cuyo /injuries puede cambiar el resultado. Las lesiones
+        solo mueven el xG a uno de INJURY_LEVELS² pares de factores: se
+        valoran todos en un tensor y basta con que UNO pase validate_xg y
+        deje un mercado con sanity_check y EV dentro de la ventana. Kelly /
+        kill-switch no se miran (solo harían pedir de más, nunca de menos).
+        """
+        from pricing import price_batch
+        grid = [(h, a) for h in INJURY_LEVELS for a in INJURY_LEVELS]
+        rows = []
+        for k, (m, inp) in enumerate(ready):
+            if inp["conf"] == "LOW":
+                continue                            # XG_LOW_SKIP con o sin lesiones
+            l_name = TARGET_LEAGUES[m["league"]["id"]]
+            for h_inj, a_inj in grid:
+                rows.append((k, l_name, *apply_injuries(inp["base_h"], inp["base_a"],
+                                                        h_inj, a_inj, l_name)))
+        if not rows:
+            return set()
+        books = price_batch([r[2] for r in rows], [r[3] for r in rows],
+                            [_scan_var(r[1], r[4]) for r in rows])
+        need = set()
+        for j, (k, l_name, xh, xa, xt) in enumerate(rows):
+            m, inp = ready[k]
+            fid = m["fixture"]["id"]
+            if fid in need or not validate_xg(xh, xa, inp["odds"])[0]:
                 continue
-
-            t_shots = t_sot = t_goals = 0
-            match_counts = []
+            for item in build_market_probs(inp["odds"], xh, xa, "", "", inp["conf"],
+                                           l_name, book=books[j]):
+                ev = (item["prob"] * item["odd"]) - 1
+                if (MIN_EV_THRESHOLD <= ev <= MAX_EV_THRESHOLD
+                        and sanity_check(item["prob"], item["mkt"], item["odd"])[0]):
+                    need.add(fid)
+                    break
+        return need
+
+    def _gather_injuries(self, ready):
+        """{fixture_id: (lesionados local, visitante)} tras el prefiltro."""
+        wanted = [m for m, _ in ready]
+        if INJURY_PREFILTER:
+            need   = self._injury_prefilter(ready)
+            wanted = [m for m in wanted if m["fixture"]["id"] in need]
+        if ASYNC_SCAN and len(wanted) > 1:
+            # copy_context: la reserva del scan viaja a cada hilo
+            with ThreadPoolExecutor(max_workers=SCAN_CONCURRENCY) as pool:
+                futures = [pool.submit(contextvars.copy_context().run, self._fetch_injuries, m)
+                           for m in wanted]
+                counts = [f.result() for f in futures]
+        else:
+            counts = [self._fetch_injuries(m) for m in wanted]
+        return {m["fixture"]["id"]: c for m, c in zip(wanted, counts)}
+
+    def _finish_inputs(self, m, inp, injuries):
+        fid = m["fixture"]["id"]
+        h_n = m["teams"]["home"]["name"]
+        a_n = m["teams"]["away"]["name"]
+        hinj, ainj = injuries.get(fid, (0, 0))
+        xh, xa, xt = apply_injuries(inp["base_h"], inp["base_a"], hinj, ainj,
+                                    TARGET_LEAGUES[m["league"]["id"]])
+        skipped = "" if fid in injuries else " (sin /injuries: descartado con cualquier lesión)"
+        print(f"     [{fid}] xG: {h_n}={xh:.2f} {a_n}={xa:.2f} total={xt:.2f} "
+              f"conf={inp['conf']} src={inp['xg_src']}{skipped}")
+        return {"odds": inp["odds"], "xh": xh, "xa": xa, "xt": xt,
+                "conf": inp["conf"], "xg_src": inp["xg_src"]}
+
+    async def _gather_fixture_inputs_async(self, matches, odds=None, xg=None):
+        import asyncio
+        sem = asyncio.Semaphore(SCAN_CONCURRENCY)
+
+        async def one(m, deps):
+            # Un equipo que juega dos partidos en la ventana reutiliza la
+            # entrada de team_xg_cache del primero: se espera a ese partido
+            # para que el xG salga igual que en el scan secuencial
+            if deps:
+                await asyncio.gather(*deps, return_exceptions=True)
+            async with sem:
+                return await asyncio.to_thread(self._fetch_fixture_inputs, m, odds, xg)
+
+        tasks, last_by_team = [], {}
+        for m in matches:
+            teams = (m["teams"]["home"]["id"], m["teams"]["away"]["id"])
+            deps  = [last_by_team[t] for t in teams if t in last_by_team]
+            task  = asyncio.ensure_future(one(m, deps))
             for t in teams:
-                time.sleep(1.1)
-                try:
-                    stats = requests.get(
-                        "https://v3.football.api-sports.io/teams/statistics",
-                        headers=self.headers,
-                        params={"league": league_id, "season": season,
-                                "team": t["team"]["id"]},
-                        timeout=15
-                    ).json().get("response")
-                    track_requests(1)
-                    sh  = stats["shots"].get("total", 0)
-                    sot = stats["shots"].get("on", 0)
-                    gls = stats["goals"]["for"]["total"].get("total", 0)
-                    m   = stats["fixtures"]["played"].get("total", 0)
-                    if sh and gls and m > 0:
-                        t_shots += sh
-                        t_sot   += (sot or 0)
-                        t_goals += gls
-                        match_counts.append(m)
-                except:
-                    continue
-
-            m_total = sum(match_counts) / 2
-            if m_total > 0:
-                sh_avg    = t_shots / m_total
-                sot_avg   = t_sot   / m_total
-                gps       = t_goals / t_shots if t_shots else 0
-                gsot      = t_goals / max(t_sot, 1)
-                std_proxy = np.sqrt(gps * sh_avg)
-                conn = sqlite3.connect(DB_PATH)
-                c    = conn.cursor()
-                c.execute("""INSERT INTO league_advanced_factors
-                    (league, shots_avg, shots_on_target_avg, goals_per_shot,
-                     goals_per_sot, goal_std, matches, window_days, last_updated)
-                    VALUES (?,?,?,?,?,?,?,?,?)
-                    ON CONFLICT(league) DO UPDATE SET
-                        shots_avg=excluded.shots_avg,
-                        shots_on_target_avg=excluded.shots_on_target_avg,
-                        goal_std=excluded.goal_std,
-                        last_updated=excluded.last_updated""",
-                    (league_name, round(sh_avg, 2), round(sot_avg, 2),
-                     round(gps, 4), round(gsot, 4), round(std_proxy, 3),
-                     int(m_total), 30, today.isoformat()))
-                conn.commit()
-                conn.close()
+                last_by_team[t] = task
+            tasks.append(task)
+        return await asyncio.gather(*tasks)
+
+    def _evaluate_fixture(self, m, inp):
+        fid    = m["fixture"]["id"]
+        h_n    = m["teams"]["home"]["name"]
+        a_n    = m["teams"]["away"]["name"]
+        ko     = m["fixture"]["date"]
+        l_name = TARGET_LEAGUES[m["league"]["id"]]
+        label  = f"{h_n} vs {a_n} ({l_name})"
+        odds   = inp["odds"]
+        xh, xa, xt = inp["xh"], inp["xa"], inp["xt"]
+        conf, xg_src = inp["conf"], inp["xg_src"]
+
+        ok, reason = validate_xg(xh, xa, odds)
+        if not ok:
+            log_rejection(fid, label, "ALL", 0.0, 0.0, reason)
+            print(f"     ❌ [{fid}] {reason}")
+            return None
+
+        if conf == "LOW":
+            log_rejection(fid, label, "ALL", 0.0, 0.0, "XG_LOW_SKIP")
+            print(f"     ❌ [{fid}] xG LOW — skip")
+            return None
+
+        probs = build_market_probs(odds, xh, xa, h_n, a_n, conf, l_name,
+                                   book=inp.get("book"))
+
+        candidates = []
+        for item in probs:
+            ev = (item["prob"] * item["odd"]) - 1
+
+            ok2, fail = sanity_check(item["prob"], item["mkt"], item["odd"])
+            if not ok2:
+                log_rejection(fid, label, item["mkt"], item["odd"], ev, fail)
+                continue
+            if ev < MIN_EV_THRESHOLD:
+                log_rejection(fid, label, item["mkt"], item["odd"], ev, "LOW_EV")
+                continue
+            if ev > MAX_EV_THRESHOLD:
+                log_rejection(fid, label, item["mkt"], item["odd"], ev, "EV_ALUCINATION")
+                continue
+
+            kelly, urs, rej = get_kelly_and_urs(ev, item["odd"], item["mkt"], l_name)
+            if kelly == 0.0:
+                log_rejection(fid, label, item["mkt"], item["odd"], ev, rej)
+                continue
+
+            print(f"     ✅ [{fid}] CANDIDATO: {item['mkt']} @{item['odd']:.2f} "
+                  f"EV={ev*100:.1f}% URS={urs:.2f}")
+            candidates.append({
+                **item, "ev": ev, "base_stake": kelly, "urs": urs,
+                "fid": fid, "h_n": h_n, "a_n": a_n, "ko": ko,
+                "l_name": l_name, "conf": conf, "xg_src": xg_src,
+                "xh": xh, "xa": xa, "xt": xt,
+            })
+
+        if not candidates:
+            return None
+
+        candidates.sort(key=lambda x: x["ev"] * x["urs"], reverse=True)
+        return candidates[0]
+
+    def _load_xg_matrix(self):
+        """Caché xG entera en una consulta y xG de todos los equipos vectorizado."""
+        try:
+            xg = XgMatrix.load(DB)
+            xg.decayed(XG_DECAY_FACTOR)
+            print(f"  🧮 xG cache en memoria: {len(xg)} equipos")
+            return xg
+        except Exception as e:
+            print(f"  ⚠️  xG matrix: {e}")
+            return None
+
+    def _plan_scan(self, matches, xg):
+        """(partidos a pedir, ScanPlan | None) con la cuota que queda hoy."""
+        if not SCAN_PLANNER:
+            return matches[:MAX_FIXTURES_PER_SCAN], None
+        days = [(datetime.now() - timedelta(days=b)).strftime("%Y-%m-%d")
+                for b in range(1, XG_GAP_DAYS + 1)]
+        FIXTURE_STORE.load_days(days)
+        try:
+            yields = league_yields(DB, TARGET_LEAGUES)
+        except Exception as e:
+            print(f"  ⚠️  rendimiento por liga: {e}")
+            yields = None
+        # cuota menos lo que ya está comprometido: un /odds por cierre pendiente
+        # y los días de /fixtures del ingest
+        budget = max(GOVERNOR.remaining() - len(self.closing) - SCAN_PLAN_RESERVE, 0)
+        plan = plan_scan(
+            matches, budget, TARGET_LEAGUES, LIQUIDITY_TIERS, yields=yields, xg=xg,
+            ttl_h=XG_CACHE_TTL_HOURS,
+            xg_gap_cost=sum(1 for d in days if d not in FIXTURE_STORE),
+            bulk_odds=BULK_ODDS, max_fixtures=MAX_FIXTURES_PER_SCAN,
+        )
+        for m, why in plan.skipped:
+            print(f"  ⏭️  {m['teams']['home']['name']} vs {m['teams']['away']['name']} "
+                  f"(fid={m['fixture']['id']}) fuera del plan: {why}")
+        print(f"  🧭 Plan de scan: {plan.summary()}")
+        return plan.selected, plan
 
     def run_daily_scan(self):
         now_utc = datetime.now(timezone.utc)
@@ -1256,10 +1812,7 @@ class QuantFundEuropean:
         for days_ahead in [0, 1, 2]:
             d = (datetime.now() + timedelta(days=days_ahead)).strftime("%Y-%m-%d")
             # Si ya está en cache (del diagnóstico), no gasta req extra
-            already = d in _DATE_FIXTURES_CACHE
             fixtures_day = _get_fixtures_for_date(d, self.headers)
-            if not already:
-                track_requests(1)
             matches_raw.extend([
                 f for f in fixtures_day
                 if f["league"]["id"] in TARGET_LEAGUES
@@ -1274,163 +1827,110 @@ class QuantFundEuropean:
 
         matches = [m for m in matches_raw if hours_away(m) <= 48]
         matches.sort(key=hours_away)
-        matches = matches[:MAX_FIXTURES_PER_SCAN]
 
         if not matches:
             self.send_msg(
                 "🔇 <b>European V5.13:</b> Sin partidos en los próximos 48h.\n"
-                f"📡 Requests: {track_requests(0)}/100"
+                f"📡 Requests: {GOVERNOR.used_today()}/{GOVERNOR.daily_limit}"
             )
             ingest_results_into_xg_cache(self.headers)
             return
 
-        liga_counts = {}
-        for m in matches:
-            ln = TARGET_LEAGUES[m["league"]["id"]]
-            liga_counts[ln] = liga_counts.get(ln, 0) + 1
-
-        req_est = len(matches) * 2  # odds + injuries (xG usa cache en su mayoría)
-        self.send_msg(
-            f"🔍 <b>European V5.13 — Scan D-1</b>\n"
-            + "\n".join(f"  {ln}: {n}" for ln, n in sorted(liga_counts.items()))
-            + f"\n📡 Requests estimados: ~{req_est}/100"
-        )
-
         already_picked_today = set()
         try:
-            conn_check = sqlite3.connect(DB_PATH)
-            cc         = conn_check.cursor()
-            today_str  = datetime.now(timezone.utc).strftime("%Y-%m-%d")
-            cc.execute(
+            today_str = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+            already_picked_today = {row[0] for row in DB.fetchall(
                 "SELECT fixture_id FROM picks_log WHERE pick_time >= ?", (today_str,)
-            )
-            already_picked_today = {row[0] for row in cc.fetchall()}
-            conn_check.close()
+            )}
         except:
             pass
 
-        preliminary_picks = []
-
+        pending = []
         for m in matches:
-            fid    = m["fixture"]["id"]
-            h_n    = m["teams"]["home"]["name"]
-            a_n    = m["teams"]["away"]["name"]
-            h_id   = m["teams"]["home"]["id"]
-            a_id   = m["teams"]["away"]["id"]
-            ko     = m["fixture"]["date"]
-            lid    = m["league"]["id"]
-            l_name = TARGET_LEAGUES[lid]
-            label  = f"{h_n} vs {a_n} ({l_name})"
-            print(f"\n  ── {label} (fid={fid}) ──")
-
-            if fid in already_picked_today:
-                print(f"     ⏭️  Ya procesado hoy — skip")
+            if m["fixture"]["id"] in already_picked_today:
+                print(f"\n  ── {m['teams']['home']['name']} vs {m['teams']['away']['name']} "
+                      f"(fid={m['fixture']['id']}) ⏭️  Ya procesado hoy — skip")
                 continue
+            pending.append(m)
 
-            time.sleep(3.0)
+        # Antes de la primera cuota: qué partidos caben en la cuota del día
+        xg = self._load_xg_matrix()
+        pending, plan = self._plan_scan(pending, xg)
 
-            try:
-                odds_res = requests.get(
-                    "https://v3.football.api-sports.io/odds",
-                    headers=self.headers,
-                    params={"fixture": fid, "bookmaker": 8}, timeout=10
-                ).json().get("response", [])
-                track_requests(1)
-            except:
-                continue
-            if not odds_res:
-                continue
-            bets = odds_res[0]["bookmakers"][0]["bets"]
+        liga_counts = {}
+        for m in pending:
+            ln = TARGET_LEAGUES[m["league"]["id"]]
+            liga_counts[ln] = liga_counts.get(ln, 0) + 1
 
-            try:
-                inj_res = requests.get(
-                    "https://v3.football.api-sports.io/injuries",
-                    headers=self.headers,
-                    params={"fixture": fid}, timeout=10
-                ).json().get("response", [])
-                track_requests(1)
-                hinj = sum(1 for i in inj_res if i["team"]["id"] == h_id)
-                ainj = sum(1 for i in inj_res if i["team"]["id"] == a_id)
-                print(f"     Lesionados: {h_n}={hinj} {a_n}={ainj}")
-            except:
-                hinj = ainj = 0
+        req_est = plan.requests if plan else len(pending) * 2  # odds + injuries
+        self.send_msg(
+            f"🔍 <b>European V5.13 — Scan D-1</b>\n"
+            + "\n".join(f"  {ln}: {n}" for ln, n in sorted(liga_counts.items()))
+            + f"\n📡 Requests estimados: ~{req_est}/{GOVERNOR.remaining()} disponibles"
+            + (f"\n🧭 Fuera del plan: {len(plan.skipped)}" if plan and plan.skipped else "")
+        )
 
-            xh, xa, xt, conf, xg_src = build_xg_match(
-                h_id, a_id, hinj, ainj, lid, l_name, self.headers, depth=6
+        # Fase 1: red (odds + lesiones + xG). En modo async los partidos se
+        # piden en paralelo bajo el GOVERNOR; el resultado es el mismo.
+        # La reserva no es estricta: si el xG necesita más, tira del pool común.
+        with GOVERNOR.reserve("run_daily_scan", req_est + SCAN_XG_RESERVE, strict=False):
+            odds = OddsIndex().load(self.headers, pending) if BULK_ODDS else None
+            if ASYNC_SCAN and len(pending) > 1:
+                import asyncio                  # solo el scan async lo necesita
+                inputs = asyncio.run(self._gather_fixture_inputs_async(pending, odds, xg))
+            else:
+                inputs = [self._fetch_fixture_inputs(m, odds, xg) for m in pending]
+            ready = [(m, inp) for m, inp in zip(pending, inputs) if inp is not None]
+
+            # Fase 1b: /injuries solo donde alguna combinación de lesiones
+            # podría dejar un pick (ver _injury_prefilter)
+            injuries = self._gather_injuries(ready)
+        saved = len(ready) - len(injuries)
+        print(f"  🩹 /injuries: {len(injuries)}/{len(ready)} pedidos, {saved} ahorrados")
+        ready = [(m, self._finish_inputs(m, inp, injuries)) for m, inp in ready]
+
+        # Todos los partidos del scan se valoran en un único tensor
+        if ready:
+            from pricing import price_batch
+            books = price_batch(
+                [inp["xh"] for _, inp in ready], [inp["xa"] for _, inp in ready],
+                [_scan_var(TARGET_LEAGUES[m["league"]["id"]], inp["xt"]) for m, inp in ready]
             )
-            print(f"     xG: {h_n}={xh:.2f} {a_n}={xa:.2f} total={xt:.2f} "
-                  f"conf={conf} src={xg_src} req={track_requests(0)}/100")
-
-            ok, reason = validate_xg(xh, xa, bets)
-            if not ok:
-                log_rejection(fid, label, "ALL", 0.0, 0.0, reason)
-                print(f"     ❌ {reason}")
-                continue
-
-            if conf == "LOW":
-                log_rejection(fid, label, "ALL", 0.0, 0.0, "XG_LOW_SKIP")
-                print(f"     ❌ xG LOW — skip")
-                continue
+            for k, (_, inp) in enumerate(ready):
+                inp["book"] = books[k]
 
-            probs = build_market_probs(bets, xh, xa, h_n, a_n, conf, l_name)
+        # Snapshot de CLV / Sharpe / kill-switch: una lectura por scan
+        risk = refresh_risk_state()
+        if risk.killed_markets():
+            print(f"  🛑 Kill-switch activo: {', '.join(risk.killed_markets())}")
 
-            candidates = []
-            for item in probs:
-                ev = (item["prob"] * item["odd"]) - 1
-
-                ok2, fail = sanity_check(item["prob"], item["mkt"], item["odd"])
-                if not ok2:
-                    log_rejection(fid, label, item["mkt"], item["odd"], ev, fail)
-                    continue
-                if ev < MIN_EV_THRESHOLD:
-                    log_rejection(fid, label, item["mkt"], item["odd"], ev, "LOW_EV")
-                    continue
-                if ev > MAX_EV_THRESHOLD:
-                    log_rejection(fid, label, item["mkt"], item["odd"], ev, "EV_ALUCINATION")
-                    continue
-
-                kelly, urs, rej = get_kelly_and_urs(ev, item["odd"], item["mkt"], l_name)
-                if kelly == 0.0:
-                    log_rejection(fid, label, item["mkt"], item["odd"], ev, rej)
-                    continue
-
-                print(f"     ✅ CANDIDATO: {item['mkt']} @{item['odd']:.2f} "
-                      f"EV={ev*100:.1f}% URS={urs:.2f}")
-                candidates.append({
-                    **item, "ev": ev, "base_stake": kelly, "urs": urs,
-                    "fid": fid, "h_n": h_n, "a_n": a_n, "ko": ko,
-                    "l_name": l_name, "conf": conf, "xg_src": xg_src,
-                    "xh": xh, "xa": xa, "xt": xt,
-                })
-
-            if not candidates:
-                continue
-
-            candidates.sort(key=lambda x: x["ev"] * x["urs"], reverse=True)
-            preliminary_picks.append(candidates[0])
+        # Fase 2: evaluación en el orden original de kickoff — mismo
+        # decision_log, mismos candidatos y mismo portfolio que el secuencial.
+        # Todo el decision_log del scan va en una sola transacción.
+        preliminary_picks = []
+        with DB.unit_of_work():
+            for m, inp in ready:
+                best = self._evaluate_fixture(m, inp)
+                if best is not None:
+                    preliminary_picks.append(best)
 
         final, meta = apply_portfolio_risk_engine(preliminary_picks)
 
         try:
             if final:
-                conn = sqlite3.connect(DB_PATH)
-                c    = conn.cursor()
                 reports = [
                     f"📊 <b>European V5.13 — Portfolio:</b>\n"
                     f"Picks: {len(final)} | Vol: {meta['port_vol']*100:.2f}%\n"
                     f"Heat: {meta['final_heat']*100:.2f}% | Damper: {meta['damper']:.2f}x\n"
-                    f"📡 Requests: {track_requests(0)}/100"
+                    f"📡 Requests: {GOVERNOR.used_today()}/{GOVERNOR.daily_limit} "
+                    f"(🩹 {saved} /injuries ahorrados)"
                 ]
+                rows = []
                 for p in final:
                     op_stake = p["final_stake"] if LIVE_TRADING else 0.0
-                    c.execute("""INSERT INTO picks_log
-                        (fixture_id, league, home_team, away_team, market, selection,
-                         selection_key, odd_open, prob_model, ev_open, stake_pct,
-                         xg_home, xg_away, xg_total, pick_time, kickoff_time,
-                         urs, model_gap, xg_source)
-                        VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)""",
+                    rows.append(
                         (p["fid"], p["l_name"], p["h_n"], p["a_n"], p["mkt"], p["pick"],
-                         f"{p['bid']}|{p['val']}", p["odd"], p["prob"], p["ev"], op_stake,
+                         selection_key(p["bid"], p["val"]), p["odd"], p["prob"], p["ev"], op_stake,
                          p["xh"], p["xa"], p["xt"],
                          datetime.now(timezone.utc).isoformat(), p["ko"],
                          p["urs"], p["model_gap"], p["xg_src"])
@@ -1446,13 +1946,21 @@ class QuantFundEuropean:
                         f"📈 Fuente: {p['xg_src']}\n"
                         f"🎯 Stake: {p['final_stake']*100:.2f}%"
                     )
-                conn.commit()
-                conn.close()
+                with DB.unit_of_work():
+                    DB.executemany("""INSERT INTO picks_log
+                        (fixture_id, league, home_team, away_team, market, selection,
+                         selection_key, odd_open, prob_model, ev_open, stake_pct,
+                         xg_home, xg_away, xg_total, pick_time, kickoff_time,
+                         urs, model_gap, xg_source)
+                        VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)""", rows)
+                for p in final:
+                    self.closing.add(p["fid"], p["ko"])
                 self.send_msg("\n\n".join(reports))
             else:
                 self.send_msg(
                     f"🔇 <b>European V5.13:</b> Sin picks válidos hoy.\n"
-                    f"📡 Requests: {track_requests(0)}/100"
+                    f"📡 Requests: {GOVERNOR.used_today()}/{GOVERNOR.daily_limit} "
+                    f"(🩹 {saved} /injuries ahorrados)"
                 )
         except Exception as e:
             print(f"run_daily_scan error: {e}")
@@ -1464,102 +1972,108 @@ class QuantFundEuropean:
 if __name__ == "__main__":
     bot = QuantFundEuropean()
 
-    schedule.every().day.at(RUN_TIME_SCAN).do(bot.run_daily_scan)
-    schedule.every().day.at(RUN_TIME_MIDDAY_CLV).do(bot.capture_midday_lines)
-    schedule.every(30).minutes.do(bot.capture_closing_lines)
-    schedule.every().monday.at(RUN_TIME_XG_CACHE).do(bot.weekly_xg_cache)
-    schedule.every().day.at(RUN_TIME_INGEST).do(bot.update_league_advanced_factors)
-
-    try:
-        from burn_in_evaluator import print_burn_in_report
-        print_burn_in_report(DB_PATH)
-    except Exception as e:
-        print(f"Burn-in no disponible: {e}")
+    # scan y warmups comparten group="api": nunca a la vez entre sí; los
+    # cierres (bot.closing, por kickoff) tienen un worker reservado
+    runner = JobRunner()
+    runner.source("closing", bot.closing.run_due, bot.closing.seconds_until_due,
+                  PRIORITY_CLOSING)
+    runner.daily("midday_clv", bot.capture_midday_lines, RUN_TIME_MIDDAY_CLV,
+                 PRIORITY_CAPTURE)
+    runner.daily("scan", bot.run_daily_scan, RUN_TIME_SCAN, PRIORITY_SCAN, group="api")
+    runner.weekly("xg_cache", bot.weekly_xg_cache, "monday", RUN_TIME_XG_CACHE,
+                  PRIORITY_WARMUP, group="api")
+    runner.daily("league_factors", bot.update_league_advanced_factors, RUN_TIME_INGEST,
+                 PRIORITY_WARMUP, group="api")
+
+    def startup_reports():
+        """Burn-in, MORGUE y CLV: solo lectura, en paralelo al resto del arranque."""
+        try:
+            from burn_in_evaluator import print_burn_in_report
+            print_burn_in_report(DB_PATH)
+        except Exception as e:
+            print(f"Burn-in no disponible: {e}")
 
-    try:
-        print("\n🕵️  MORGUE:")
-        conn = sqlite3.connect(DB_PATH)
-        c    = conn.cursor()
-        c.execute("SELECT reason, COUNT(*) FROM decision_log "
-                  "GROUP BY reason ORDER BY COUNT(*) DESC LIMIT 10")
-        for r in c.fetchall():
-            print(f"  ❌ {r[0]}: {r[1]}")
-        conn.close()
-    except:
-        pass
+        try:
+            print("\n🕵️  MORGUE:")
+            for r in DB.fetchall("SELECT reason, COUNT(*) FROM decision_log "
+                                 "GROUP BY reason ORDER BY COUNT(*) DESC LIMIT 10"):
+                print(f"  ❌ {r[0]}: {r[1]}")
+        except:
+            pass
 
-    try:
-        print("\n⏳ CLV:")
-        conn = sqlite3.connect(DB_PATH)
-        c    = conn.cursor()
-        c.execute("""SELECT ((p.odd_open-c.odd_close)/p.odd_open)*100, p.market
-                     FROM picks_log p JOIN closing_lines c
-                       ON p.fixture_id=c.fixture_id
-                          AND p.market=c.market
-                          AND p.selection_key=c.selection_key
-                     WHERE p.clv_captured=1""")
-        picks = c.fetchall()
-        conn.close()
-        if picks:
-            clvs  = [p[0] for p in picks]
-            beats = sum(1 for v in clvs if v > 0)
-            print(f"  N={len(picks)} | Beat={beats}/{len(picks)} ({beats/len(picks)*100:.0f}%) "
-                  f"| CLV_avg={sum(clvs)/len(clvs):.2f}%")
-            mkts = {}
-            for clv, mkt in picks:
-                mkts.setdefault(mkt, []).append(clv)
-            for mkt, vals in sorted(mkts.items()):
-                beat_m = sum(1 for v in vals if v > 0)
-                print(f"    {mkt:<8} N={len(vals)} CLV={sum(vals)/len(vals):.2f}% "
-                      f"Beat={beat_m}/{len(vals)}")
-        else:
-            print("  Sin CLVs aún.")
-    except:
-        pass
+        try:
+            print("\n⏳ CLV:")
+            picks = DB.fetchall("""SELECT ((p.odd_open-c.odd_close)/p.odd_open)*100, p.market
+                         FROM picks_log p JOIN closing_lines c
+                           ON p.fixture_id=c.fixture_id
+                              AND p.market=c.market
+                              AND p.selection_key=c.selection_key
+                         WHERE p.clv_captured=1""")
+            if picks:
+                clvs  = [p[0] for p in picks]
+                beats = sum(1 for v in clvs if v > 0)
+                print(f"  N={len(picks)} | Beat={beats}/{len(picks)} ({beats/len(picks)*100:.0f}%) "
+                      f"| CLV_avg={sum(clvs)/len(clvs):.2f}%")
+                mkts = {}
+                for clv, mkt in picks:
+                    mkts.setdefault(mkt, []).append(clv)
+                for mkt, vals in sorted(mkts.items()):
+                    beat_m = sum(1 for v in vals if v > 0)
+                    print(f"    {mkt:<8} N={len(vals)} CLV={sum(vals)/len(vals):.2f}% "
+                          f"Beat={beat_m}/{len(vals)}")
+            else:
+                print("  Sin CLVs aún.")
+        except:
+            pass
 
-    cache_count = 0
-    try:
-        conn_check  = sqlite3.connect(DB_PATH)
-        cc          = conn_check.cursor()
-        cc.execute("SELECT COUNT(*) FROM team_xg_cache")
-        cache_count = cc.fetchone()[0]
-        conn_check.close()
-        print(f"  📦 Cache xG al arrancar: {cache_count} equipos")
-    except Exception as e:
-        print(f"  Cache check error: {e}")
+    def startup():
+        """Warmup y/o scan de arranque, como job del pool (los cierres no esperan)."""
+        cache_count = 0
+        try:
+            cache_count = DB.fetchone("SELECT COUNT(*) FROM team_xg_cache")[0]
+            print(f"  📦 Cache xG al arrancar: {cache_count} equipos")
+        except Exception as e:
+            print(f"  Cache check error: {e}")
 
-    reqs_disponibles = 100 - track_requests(0)
-    print(f"  📡 Requests disponibles: {reqs_disponibles}/100")
+        reqs_disponibles = GOVERNOR.remaining()
+        print(f"  📡 Requests disponibles: {reqs_disponibles}/{GOVERNOR.daily_limit}")
 
-    if cache_count == 0 and reqs_disponibles >= 50:
-        print("  ⚠️  Cache vacía + budget OK — ejecutando warmup...")
-        bot.send_msg(
-            "⏳ <b>Primera vez detectada</b>\n"
-            "Calentando cache xG (9 ligas europeas)...\n"
-            "Esto toma ~3 minutos. El scan arranca después."
-        )
-        bot.weekly_xg_cache()
-        reqs_post = 100 - track_requests(0)
-        if reqs_post >= 30:
-            print(f"  ✅ Warmup OK — {reqs_post} req restantes — arrancando scan")
-            bot.run_daily_scan()
-        else:
+        if cache_count == 0 and reqs_disponibles >= 50:
+            print("  ⚠️  Cache vacía + budget OK — ejecutando warmup...")
             bot.send_msg(
-                f"✅ <b>Warmup completado</b>\n"
-                f"⏰ Solo {reqs_post} req restantes — scan diferido.\n"
-                f"Arranca mañana a las 09:00 UTC."
+                "⏳ <b>Primera vez detectada</b>\n"
+                "Calentando cache xG (9 ligas europeas)...\n"
+                "Esto toma ~3 minutos. El scan arranca después."
             )
-    elif cache_count == 0 and reqs_disponibles < 50:
-        bot.send_msg(
-            f"⚠️ <b>Cache vacía, sin budget hoy</b>\n"
-            f"Solo {reqs_disponibles} req disponibles.\n"
-            f"Warmup automático el lunes 08:00 UTC."
-        )
-        bot.run_daily_scan()
-    else:
-        print(f"  ✅ Cache OK ({cache_count} equipos) — scan directo")
-        bot.run_daily_scan()
-
-    while True:
-        schedule.run_pending()
-        time.sleep(60)
+            bot.weekly_xg_cache()
+            reqs_post = GOVERNOR.remaining()
+            if reqs_post >= 30:
+                print(f"  ✅ Warmup OK — {reqs_post} req restantes — arrancando scan")
+                bot.run_daily_scan()
+            else:
+                bot.send_msg(
+                    f"✅ <b>Warmup completado</b>\n"
+                    f"⏰ Solo {reqs_post} req restantes — scan diferido.\n"
+                    f"Arranca mañana a las 09:00 UTC."
+                )
+        elif cache_count == 0 and reqs_disponibles < 50:
+            bot.send_msg(
+                f"⚠️ <b>Cache vacía, sin budget hoy</b>\n"
+                f"Solo {reqs_disponibles} req disponibles.\n"
+                f"Warmup automático el lunes 08:00 UTC."
+            )
+            bot.run_daily_scan()
+        else:
+            print(f"  ✅ Cache OK ({cache_count} equipos) — scan directo")
+            bot.run_daily_scan()
+
+    # el diagnóstico sincroniza el contador y precarga D+0..D+2: mismo group
+    # que startup y registrado antes → startup corre después
+    runner.once("diagnostics", bot.startup_diagnostics, PRIORITY_SCAN, group="api")
+    runner.once("reports", startup_reports, PRIORITY_WARMUP)
+    runner.once("startup", startup, PRIORITY_SCAN, group="api")
+    print(f"  ⏱️  Cierres programados: {len(bot.closing)} partidos")
+    try:
+        runner.run_forever()
+    finally:
+        print(runner.report())
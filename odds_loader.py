@@ -0,0 +1,147 @@
+# ============================================================
+# MÓDULO: ODDS LOADER — Cuotas del scan en bloque por liga
+# Versión: 1.0 | Compatible con main.py V5.13
+# ============================================================
+#
+# El scan pedía /odds?fixture=X&bookmaker=8 una vez por partido.
+# API-Sports también sirve /odds por liga+temporada, paginado
+# (paging.current / paging.total), con todos los partidos próximos
+# de esa liga en unas pocas páginas.
+#
+#   OddsIndex.load(headers, matches):
+#     - agrupa los partidos del scan por (liga, temporada)
+#     - para cada grupo con >= BULK_MIN_FIXTURES partidos pide
+#       /odds?league=&season=&bookmaker= página a página, hasta la
+#       última o hasta tener todos los fixtures buscados
+#     - páginas + partidos que aún faltan (que irán por
+#       /odds?fixture=) nunca pasan de odds_requests_bound(n) = n + 1:
+#       solo pide otra página si, aunque no traiga ninguno, el total
+#       sigue dentro. El +1 es la primera página, que se paga aunque
+#       no traiga ninguno de los buscados; scan_planner cobra este
+#       mismo tope
+#     - indexa fixture_id → FixtureOdds del bookmaker (ya parseado)
+#
+#   OddsIndex.lookup(fid):
+#     - FixtureOdds si el partido vino en bloque
+#     - FixtureOdds vacío si su liga se recorrió ENTERA y no aparece
+#       (sin cuotas: el /odds por partido también vendría vacío)
+#     - None si no se sabe → el llamador pide /odds?fixture= como
+#       antes
+#
+# Con una liga de un solo partido en el scan el bloque no ahorra
+# nada (1 página = 1 request), así que se deja al camino de siempre.
+# ============================================================
+
+import threading
+
+from http_client import api_get
+from fixture_odds import FixtureOdds
+
+
+# ── CONSTANTES ───────────────────────────────────────────────
+BOOKMAKER         = 8
+BULK_MIN_FIXTURES = 2
+MAX_ODDS_PAGES    = 6
+
+
+def odds_requests_bound(n, bulk=True, min_fixtures=BULK_MIN_FIXTURES):
+    """
+    Peor caso de requests /odds para n partidos de una liga: n por
+    partido; en bloque, páginas + los que caen a /odds?fixture=.
+    """
+    if not bulk or n < min_fixtures:
+        return n
+    return n + 1
+
+
+def fetch_odds_pages(headers, params, wanted=None, max_pages=MAX_ODDS_PAGES,
+                     max_requests=None):
+    """
+    Recorre /odds paginado. Devuelve ({fixture_id: FixtureOdds}, páginas
+    pedidas, completo) — completo=True si se llegó a la última página.
+    Para antes si ya están todos los fixture_id de `wanted` o si otra
+    página más los que faltan podría pasar de max_requests.
+    """
+    index, page = {}, 0
+    while True:
+        page += 1
+        data = api_get("/odds", headers, params={**params, "page": page}).json()
+        for item in data.get("response") or []:
+            try:
+                books = item.get("bookmakers") or []
+                if books:
+                    index[item["fixture"]["id"]] = FixtureOdds.from_bets(
+                        books[0]["bets"], bookmaker=books[0].get("id"))
+            except (KeyError, TypeError):
+                continue
+        paging = data.get("paging") or {}
+        total  = int(paging.get("total") or 1)
+        if page >= total:
+            return index, page, True
+        missing = len(wanted - index.keys()) if wanted else 0
+        if wanted and not missing:
+            return index, page, False
+        # otra página solo si, aunque no traiga ninguno, no pasa del tope
+        if max_requests is not None and page + 1 + missing > max_requests:
+            return index, page, False
+        if page >= max_pages:
+            return index, page, False
+
+
+def _season(m):
+    season = m["league"].get("season")
+    if season:
+        return int(season)
+    ko = m["fixture"]["date"][:7]                   # "YYYY-MM"
+    year, month = int(ko[:4]), int(ko[5:7])
+    return year if month >= 8 else year - 1
+
+
+class OddsIndex:
+    def __init__(self, bookmaker=BOOKMAKER):
+        self.bookmaker = bookmaker
+        self.requests  = 0
+        self._odds     = {}
+        self._complete = set()      # fixture_id buscados en ligas recorridas enteras
+        self._lock     = threading.Lock()
+
+    def load(self, headers, matches, min_fixtures=BULK_MIN_FIXTURES):
+        groups = {}
+        for m in matches:
+            try:
+                key = (m["league"]["id"], _season(m))
+            except (KeyError, TypeError, ValueError):
+                continue
+            groups.setdefault(key, set()).add(m["fixture"]["id"])
+
+        for (lid, season), fids in groups.items():
+            if len(fids) < min_fixtures:
+                continue
+            try:
+                index, pages, complete = fetch_odds_pages(
+                    headers,
+                    {"league": lid, "season": season, "bookmaker": self.bookmaker},
+                    wanted=fids, max_requests=odds_requests_bound(len(fids), True, min_fixtures)
+                )
+            except Exception as e:
+                print(f"  ⚠️  odds bulk liga {lid}: {e}")
+                continue
+            with self._lock:
+                self.requests += pages
+                self._odds.update(index)
+                if complete:
+                    self._complete |= fids
+            print(f"  📦 Odds bulk liga {lid}: {len(fids & index.keys())}/{len(fids)} "
+                  f"partidos en {pages} pág.")
+        return self
+
+    def lookup(self, fid):
+        with self._lock:
+            if fid in self._odds:
+                return self._odds[fid]
+            if fid in self._complete:
+                return FixtureOdds(self.bookmaker)
+        return None
+
+    def __len__(self):
+        return len(self._odds)
@@ -0,0 +1,191 @@
+# ============================================================
+# MÓDULO: PRICING ENGINE — Matriz de marcadores vectorizada
+# Versión: 1.0 | Compatible con main.py V5.13
+# ============================================================
+#
+# Una única matriz conjunta P(goles local = i, goles visitante = j)
+# por partido, calculada con NumPy, de la que salen todos los
+# mercados por sumas con máscara:
+#
+#   1X2, doble oportunidad, marcador exacto, BTTS, hándicap
+#   asiático → matriz Poisson independiente (misma que el antiguo
+#   doble bucle de bivariate_poisson_1x2).
+#
+#   Over/Under a cualquier línea (enteras con push, de cuarto
+#   divididas) → matriz con marginales binomial negativa de
+#   dispersión proporcional (var_i / mu_i = var / xt).
+#   Dos NB con el mismo p suman otra NB con r = r_h + r_a, así que la
+#   ley del total de goles es EXACTAMENTE la negbin(xt, var) con el
+#   std de la liga.
+#
+# Todas las funciones operan sobre los dos últimos ejes, así que
+# price_batch() valora todos los partidos del scan con un único
+# tensor (partidos × goles × goles).
+# ============================================================
+
+from functools import lru_cache
+
+import numpy as np
+
+
+# ── CONSTANTES ───────────────────────────────────────────────
+MAX_GOALS = 10
+
+
+def poisson_pmf_vec(mu, max_goals=MAX_GOALS):
+    """PMF Poisson k=0..max_goals para un array de mu → (..., G+1)."""
+    mu = np.asarray(mu, dtype=float)[..., None]
+    k  = np.arange(1, max_goals + 1)
+    steps = np.concatenate(
+        [np.exp(-mu), np.broadcast_to(mu / k, mu.shape[:-1] + (max_goals,))], axis=-1
+    )
+    return np.cumprod(steps, axis=-1)
+
+
+def negbin_pmf_vec(mu, var, max_goals=MAX_GOALS):
+    """
+    PMF binomial negativa (media mu, varianza var) k=0..max_goals.
+    Donde var <= mu*1.01 cae a Poisson.
+    """
+    mu  = np.asarray(mu, dtype=float)
+    var = np.broadcast_to(np.asarray(var, dtype=float), mu.shape)
+    out = poisson_pmf_vec(mu, max_goals)
+    nb  = var > mu * 1.01
+    if np.any(nb):
+        m, v = mu[nb][..., None], var[nb][..., None]
+        r = m ** 2 / (v - m)
+        p = r / (r + m)
+        k = np.arange(max_goals)
+        steps = np.concatenate([p ** r, (k + r) / (k + 1) * (1 - p)], axis=-1)
+        out = out.copy()
+        out[nb] = np.cumprod(steps, axis=-1)
+    return out
+
+
+def score_matrix(ph, pa):
+    """Matriz conjunta (..., G+1, G+1) a partir de las marginales."""
+    return ph[..., :, None] * pa[..., None, :]
+
+
+@lru_cache(maxsize=8)
+def _masks(g):
+    i, j = np.indices((g, g))
+    return i, j
+
+
+# ── MERCADOS ─────────────────────────────────────────────────
+def prob_1x2(m):
+    """(home, draw, away) normalizados por la masa de la matriz."""
+    g = m.shape[-1]
+    i, j  = _masks(g)
+    total = m.sum(axis=(-2, -1))
+    home  = (m * (i > j)).sum(axis=(-2, -1))
+    draw  = (m * (i == j)).sum(axis=(-2, -1))
+    away  = (m * (i < j)).sum(axis=(-2, -1))
+    return home / total, draw / total, away / total, total
+
+
+def prob_double_chance(m):
+    h, d, a, _ = prob_1x2(m)
+    return {"1X": h + d, "X2": d + a, "12": h + a}
+
+
+def prob_correct_score(m, home_goals, away_goals):
+    return m[..., home_goals, away_goals] / m.sum(axis=(-2, -1))
+
+
+def prob_btts(m):
+    """(yes, no) normalizados. No = P(i=0 o j=0)."""
+    total = m.sum(axis=(-2, -1))
+    no = (m[..., 0, :].sum(axis=-1) + m[..., :, 0].sum(axis=-1) - m[..., 0, 0]) / total
+    return 1 - no, no
+
+
+def _ou_simple(m, line):
+    g = m.shape[-1]
+    i, j  = _masks(g)
+    under = (m * (i + j < line)).sum(axis=(-2, -1))
+    push  = (m * (i + j == line)).sum(axis=(-2, -1))
+    return 1 - under - push, push, under
+
+
+def prob_over_under(m, line=2.5):
+    """
+    (over, push, under) del total de goles. Over es i+j > line (y la
+    cola fuera de la matriz); en líneas enteras i+j == line es push.
+    En líneas de cuarto (2.25, 2.75) la apuesta se divide entre
+    line±0.25 y se promedian las dos mitades, como el hándicap.
+    """
+    if (line * 4) % 2 == 1:
+        o1, p1, u1 = _ou_simple(m, line - 0.25)
+        o2, p2, u2 = _ou_simple(m, line + 0.25)
+        return (o1 + o2) / 2, (p1 + p2) / 2, (u1 + u2) / 2
+    return _ou_simple(m, line)
+
+
+def _ah_simple(m, line):
+    g = m.shape[-1]
+    i, j   = _masks(g)
+    margin = i - j + line
+    total  = m.sum(axis=(-2, -1))
+    win  = (m * (margin > 0)).sum(axis=(-2, -1)) / total
+    push = (m * (margin == 0)).sum(axis=(-2, -1)) / total
+    return win, push, 1 - win - push
+
+
+def prob_asian_handicap(m, line):
+    """
+    Hándicap asiático para el LOCAL (line=-0.5, -1, -0.25...).
+    Devuelve (win, push, lose). En líneas de cuarto la apuesta se
+    divide entre line±0.25 y se promedian las dos mitades.
+    """
+    if (line * 4) % 2 == 1:
+        w1, p1, l1 = _ah_simple(m, line - 0.25)
+        w2, p2, l2 = _ah_simple(m, line + 0.25)
+        return (w1 + w2) / 2, (p1 + p2) / 2, (l1 + l2) / 2
+    return _ah_simple(m, line)
+
+
+# ── LIBRO POR PARTIDO / SCAN ─────────────────────────────────
+class MarketBook:
+    """Matrices de un partido (o de un lote, con eje inicial de partidos)."""
+
+    def __init__(self, xh, xa, var_total, max_goals=MAX_GOALS):
+        self.xh = np.asarray(xh, dtype=float)
+        self.xa = np.asarray(xa, dtype=float)
+        xt = self.xh + self.xa
+        ratio = np.asarray(var_total, dtype=float) / xt
+        self.goals  = score_matrix(poisson_pmf_vec(self.xh, max_goals),
+                                   poisson_pmf_vec(self.xa, max_goals))
+        self.totals = score_matrix(negbin_pmf_vec(self.xh, self.xh * ratio, max_goals),
+                                   negbin_pmf_vec(self.xa, self.xa * ratio, max_goals))
+
+    def __getitem__(self, idx):
+        book = MarketBook.__new__(MarketBook)
+        book.xh, book.xa = self.xh[idx], self.xa[idx]
+        book.goals, book.totals = self.goals[idx], self.totals[idx]
+        return book
+
+    def one_x_two(self):
+        return prob_1x2(self.goals)
+
+    def double_chance(self):
+        return prob_double_chance(self.goals)
+
+    def correct_score(self, home_goals, away_goals):
+        return prob_correct_score(self.goals, home_goals, away_goals)
+
+    def btts(self):
+        return prob_btts(self.goals)
+
+    def over_under(self, line=2.5):
+        return prob_over_under(self.totals, line)
+
+    def asian_handicap(self, line):
+        return prob_asian_handicap(self.goals, line)
+
+
+def price_batch(xh, xa, var_total, max_goals=MAX_GOALS):
+    """Libro para todos los partidos del scan en una sola operación."""
+    return MarketBook(np.asarray(xh, dtype=float), np.asarray(xa, dtype=float),
+                      np.asarray(var_total, dtype=float), max_goals)
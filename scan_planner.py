@@ -0,0 +1,194 @@
+# ============================================================
+# MÓDULO: SCAN PLANNER — Qué partidos pedir con la cuota que queda
+# Versión: 1.0 | Compatible con main.py V5.13
+# ============================================================
+#
+# run_daily_scan ordenaba por kickoff y cortaba en
+# MAX_FIXTURES_PER_SCAN sin mirar si la cuota del día alcanzaba, y
+# gastaba /odds + /injuries igual en un partido con xG en caché que
+# en uno cuyos equipos obligan a pedir días de /fixtures.
+#
+# plan_scan() puntúa cada candidato ANTES de la primera cuota:
+#
+#   valor = rendimiento_liga × liquidez × calidad_xG × horizonte
+#
+#     rendimiento_liga  picks / partidos evaluados de la liga en los
+#                       últimos YIELD_WINDOW_DAYS (picks_log +
+#                       decision_log), suavizado hacia la media global
+#     liquidez          LIQUIDITY_TIERS
+#     calidad_xG        por equipo: caché fresca HIGH 1.0, fresca MED
+#                       XG_MED_WEIGHT, sin caché o caducada
+#                       XG_MISS_WEIGHT (media de los dos)
+#     horizonte         KO en < MIN_LEAD_H: sin margen para la captura
+#                       de cierre; KO en > LAST_CALL_H: mañana hay
+#                       otro scan antes del partido
+#
+#   coste (requests marginales, dado lo ya elegido):
+#     /injuries         1
+#     /odds             peor caso de odds_loader por liga,
+#                       odds_requests_bound(k): k por partido, k + 1
+#                       en bloque (páginas + los que caen a
+#                       /odds?fixture=), el mismo tope que respeta
+#                       OddsIndex.load
+#     xG                días de /fixtures que faltan en FIXTURE_STORE
+#                       (xg_gap_cost), una sola vez si algún equipo
+#                       elegido no tiene caché
+#
+# y elige de forma voraz por valor/coste marginal hasta agotar el
+# presupuesto (cuota restante − reserva de capturas) o el tope de
+# partidos. Los elegidos se devuelven en el orden de entrada (el
+# scan los pasa por kickoff): decision_log sale en el mismo orden.
+# ============================================================
+
+from datetime import datetime, timedelta, timezone
+
+from odds_loader import odds_requests_bound
+
+
+# ── CONSTANTES ───────────────────────────────────────────────
+YIELD_WINDOW_DAYS  = 60
+YIELD_PRIOR_WEIGHT = 10      # partidos "virtuales" con la tasa global
+DEFAULT_YIELD      = 0.10    # tasa global si aún no hay historial
+XG_MED_WEIGHT      = 0.85
+XG_MISS_WEIGHT     = 0.70
+MIN_LEAD_H         = 1.0
+LAST_CALL_H        = 24.0
+SHORT_LEAD_WEIGHT  = 0.30
+DEFERRABLE_WEIGHT  = 0.60
+DEFAULT_LIQUIDITY  = 0.70
+XG_GAP_DAYS        = 14      # días de /fixtures que suele pedir un equipo sin caché
+
+
+def league_yields(db, league_names, days=YIELD_WINDOW_DAYS):
+    """
+    league_id → picks por partido evaluado, suavizado hacia la tasa
+    global con YIELD_PRIOR_WEIGHT partidos de peso. decision_log guarda
+    la liga en el label del partido: "Local vs Visitante (LIGA)".
+    """
+    since   = (datetime.now(timezone.utc) - timedelta(days=days)).isoformat()
+    by_name = {name: lid for lid, name in league_names.items()}
+    seen    = {}
+    for fid, label in db.fetchall(
+            "SELECT DISTINCT fixture_id, match FROM decision_log WHERE timestamp >= ?", (since,)):
+        name = label.rsplit(" (", 1)[-1].rstrip(")") if label else None
+        if name in by_name:
+            seen[fid] = by_name[name]
+    picks = {}
+    for fid, name in db.fetchall(
+            "SELECT DISTINCT fixture_id, league FROM picks_log WHERE pick_time >= ?", (since,)):
+        if name in by_name:
+            seen[fid] = by_name[name]
+            picks[by_name[name]] = picks.get(by_name[name], 0) + 1
+    fixtures = {}
+    for lid in seen.values():
+        fixtures[lid] = fixtures.get(lid, 0) + 1
+    total   = sum(fixtures.values())
+    overall = sum(picks.values()) / total if total else DEFAULT_YIELD
+    return {lid: (picks.get(lid, 0) + YIELD_PRIOR_WEIGHT * overall)
+                 / (fixtures.get(lid, 0) + YIELD_PRIOR_WEIGHT)
+            for lid in league_names}
+
+
+class Candidate:
+    __slots__ = ("idx", "match", "fid", "league_id", "hours", "value", "xg_miss")
+
+    def __init__(self, idx, match, league_id, hours, value, xg_miss):
+        self.idx       = idx
+        self.match     = match
+        self.fid       = match["fixture"]["id"]
+        self.league_id = league_id
+        self.hours     = hours
+        self.value     = value
+        self.xg_miss   = xg_miss
+
+
+class ScanPlan:
+    def __init__(self, selected, skipped, requests, expected, budget):
+        self.selected = selected        # partidos (dicts API) en el orden de entrada
+        self.skipped  = skipped         # [(partido, motivo)]
+        self.requests = requests        # requests estimados del plan
+        self.expected = expected        # picks esperados (Σ valor)
+        self.budget   = budget
+
+    def summary(self):
+        return (f"{len(self.selected)} partidos, ~{self.requests} req de {self.budget}, "
+                f"~{self.expected:.1f} picks esperados, {len(self.skipped)} fuera")
+
+
+def _xg_quality(team_ids, xg, ttl_h, now):
+    """Media por equipo: 1.0 fresco HIGH, XG_MED_WEIGHT fresco MED, si no XG_MISS_WEIGHT."""
+    weights, miss = [], False
+    for tid in team_ids:
+        i = xg.row.get(tid) if xg is not None else None
+        fresh = False
+        if i is not None and xg.updated_at[i]:
+            try:
+                age_h = (now - datetime.fromisoformat(xg.updated_at[i])).total_seconds() / 3600
+                fresh = age_h < ttl_h
+            except (TypeError, ValueError):
+                pass
+        if not fresh:
+            weights.append(XG_MISS_WEIGHT)
+            miss = True
+        else:
+            weights.append(1.0 if xg.confidence[i] == "HIGH" else XG_MED_WEIGHT)
+    return sum(weights) / len(weights), miss
+
+
+def _horizon_weight(hours):
+    if hours < MIN_LEAD_H:
+        return SHORT_LEAD_WEIGHT
+    if hours > LAST_CALL_H:
+        return DEFERRABLE_WEIGHT
+    return 1.0
+
+
+def plan_scan(matches, budget, league_names, liquidity, yields=None, xg=None,
+              ttl_h=20, xg_gap_cost=0, bulk_odds=True, max_fixtures=40, now=None):
+    """
+    Elige qué partidos del scan pedir. matches: dicts de /fixtures con
+    fixture.date; budget: requests disponibles para el scan.
+    """
+    now    = now or datetime.now(timezone.utc)
+    yields = yields or {}
+    cands  = []
+    for idx, m in enumerate(matches):
+        lid = m["league"]["id"]
+        try:
+            ko    = datetime.fromisoformat(m["fixture"]["date"].replace("Z", "+00:00"))
+            hours = (ko - now).total_seconds() / 3600
+        except (KeyError, TypeError, ValueError):
+            hours = 999
+        quality, miss = _xg_quality(
+            (m["teams"]["home"]["id"], m["teams"]["away"]["id"]), xg, ttl_h, now)
+        value = (yields.get(lid, DEFAULT_YIELD)
+                 * liquidity.get(league_names.get(lid), DEFAULT_LIQUIDITY)
+                 * quality * _horizon_weight(hours))
+        cands.append(Candidate(idx, m, lid, hours, value, miss))
+
+    chosen, per_league, spent, gap_paid = [], {}, 0, False
+    left = list(cands)
+    while left and len(chosen) < max_fixtures:
+        best, best_cost, best_ratio = None, 0, -1.0
+        for c in left:
+            k    = per_league.get(c.league_id, 0)
+            cost = (1 + odds_requests_bound(k + 1, bulk_odds)
+                    - odds_requests_bound(k, bulk_odds)
+                    + (xg_gap_cost if c.xg_miss and not gap_paid else 0))
+            ratio = c.value / cost
+            # a igual ratio, el que antes juega (orden estable de kickoff)
+            if spent + cost <= budget and ratio > best_ratio:
+                best, best_cost, best_ratio = c, cost, ratio
+        if best is None:
+            break
+        chosen.append(best)
+        left.remove(best)
+        spent += best_cost
+        per_league[best.league_id] = per_league.get(best.league_id, 0) + 1
+        gap_paid = gap_paid or best.xg_miss
+
+    reason = "tope de partidos" if len(chosen) >= max_fixtures else "presupuesto"
+    skipped = [(c.match, reason) for c in left]
+    chosen.sort(key=lambda c: c.idx)
+    return ScanPlan([c.match for c in chosen], skipped, spent,
+                    sum(c.value for c in chosen), budget)
@@ -0,0 +1,189 @@
+# ============================================================
+# MÓDULO: XG SERIES — Series de goles empaquetadas en binario
+# Versión: 1.0 | Compatible con main.py V5.13
+# ============================================================
+#
+# team_xg_cache guardaba gf_series / ga_series como texto JSON:
+# cada cache hit y cada fila del ingest hacía json.loads/json.dumps
+# de listas de 6-10 enteros pequeños.
+#
+# Ahora cada serie es un BLOB de ancho fijo por partido, del más
+# reciente al más antiguo:
+#
+#   gf_pack / ga_pack    uint8    goles (0..255)
+#   day_pack             uint16   días desde 1970-01-01 (0 = desconocido)
+#   league_pack          uint16   league_id (0 = desconocido)
+#
+# Las filas migradas desde JSON no tienen fecha ni liga → 0.
+#
+# XgMatrix.load(db) sube la caché entera en UNA consulta a matrices
+# NumPy equipos × SERIES_MAX (goles + máscara de partidos válidos),
+# y decayed() calcula el xG ponderado de todos los equipos de una
+# vez. El scan la carga al empezar y sirve los cache hits desde ahí
+# (numpy se importa solo entonces).
+#
+# Si la fila ya tiene el estado decaído (xg_num_*/xg_den, ver
+# xg_state.py) decayed() usa num/den directamente; la suma por
+# columnas queda para las filas sin estado.
+# ============================================================
+
+import sys
+import threading
+from array import array
+from datetime import date, datetime
+
+SERIES_MAX = 10
+_EPOCH     = date(1970, 1, 1)
+
+
+# ── empaquetado ──────────────────────────────────────────────
+def _u16(values):
+    a = array("H", values)
+    if sys.byteorder != "little":
+        a.byteswap()
+    return a.tobytes()
+
+
+def _from_u16(blob):
+    a = array("H")
+    a.frombytes(blob or b"")
+    if sys.byteorder != "little":
+        a.byteswap()
+    return a.tolist()
+
+
+def pack_goals(values):
+    return bytes(min(max(int(v), 0), 255) for v in values)
+
+
+def unpack_goals(blob):
+    return list(blob or b"")
+
+
+def day_number(day):
+    """'YYYY-MM-DD' (o ISO con hora) → días desde 1970; 0 si no se sabe."""
+    if not day:
+        return 0
+    try:
+        return (date.fromisoformat(str(day)[:10]) - _EPOCH).days
+    except ValueError:
+        return 0
+
+
+def day_string(n):
+    return date.fromordinal(_EPOCH.toordinal() + n).isoformat() if n else None
+
+
+def pack_days(days):
+    return _u16(day_number(d) for d in days)
+
+
+def unpack_days(blob):
+    return [day_string(n) for n in _from_u16(blob)]
+
+
+def pack_leagues(ids):
+    return _u16(int(i or 0) & 0xFFFF for i in ids)
+
+
+def unpack_leagues(blob):
+    return _from_u16(blob)
+
+
+def pack_series(gf, ga, days=None, leagues=None):
+    """(gf_pack, ga_pack, day_pack, league_pack) con la misma longitud."""
+    n = len(gf)
+    return (pack_goals(gf), pack_goals(ga),
+            pack_days(days if days is not None else [None] * n),
+            pack_leagues(leagues if leagues is not None else [0] * n))
+
+
+# ── carga en bloque ──────────────────────────────────────────
+class XgMatrix:
+    """
+    Caché xG entera en memoria: team_id → fila de matrices equipos ×
+    SERIES_MAX. Se construye una vez por scan; lo que se escriba
+    después en team_xg_cache no aparece aquí (el llamador consulta la
+    DB si un equipo no está).
+    """
+
+    _SQL = ("SELECT team_id, gf_pack, ga_pack, confidence, updated_at, "
+            "xg_num_for, xg_num_against, xg_den "
+            "FROM team_xg_cache WHERE gf_pack IS NOT NULL")
+
+    def __init__(self, team_ids, gf, ga, n, confidence, updated_at, state=None):
+        self.team_ids   = team_ids
+        self.row        = {t: i for i, t in enumerate(team_ids)}
+        self.gf         = gf                # uint8 equipos × SERIES_MAX
+        self.ga         = ga
+        self.n          = n                 # partidos válidos por equipo
+        self.confidence = confidence
+        self.updated_at = updated_at
+        self.state      = state             # (num_f, num_a, den) float; den 0 = sin estado
+        self.xg_for = self.xg_against = None
+        self._lock  = threading.Lock()
+
+    @classmethod
+    def load(cls, db, depth=SERIES_MAX):
+        import numpy as np
+        rows = db.fetchall(cls._SQL)
+        gf = np.zeros((len(rows), depth), dtype=np.uint8)
+        ga = np.zeros((len(rows), depth), dtype=np.uint8)
+        n  = np.zeros(len(rows), dtype=np.int64)
+        st = np.zeros((3, len(rows)))
+        ids, conf, upd = [], [], []
+        for i, (tid, gfp, gap, c, u, nf, na, den) in enumerate(rows):
+            k = min(len(gfp), len(gap), depth)
+            gf[i, :k] = np.frombuffer(gfp, dtype=np.uint8, count=k)
+            ga[i, :k] = np.frombuffer(gap, dtype=np.uint8, count=k)
+            n[i] = k
+            if den:
+                st[:, i] = (nf, na, den)
+            ids.append(tid); conf.append(c); upd.append(u)
+        return cls(ids, gf, ga, n, conf, upd, state=st)
+
+    def __len__(self):
+        return len(self.team_ids)
+
+    def __contains__(self, team_id):
+        return team_id in self.row
+
+    def decayed(self, decay):
+        """
+        xG de todos los equipos: num/den del estado incremental cuando la
+        fila lo tiene; si no, ponderado decay**i (i=0 el más reciente).
+        """
+        import numpy as np
+        teams, depth = self.gf.shape
+        num_f = np.zeros(teams)
+        num_a = np.zeros(teams)
+        den   = np.zeros(teams)
+        has   = self.state[2] > 0 if self.state is not None else np.zeros(teams, dtype=bool)
+        if not has.all():
+            # columna a columna (vectorizado sobre equipos): mismo orden de
+            # suma que _weighted_avg → resultado idéntico bit a bit
+            for j in range(depth):
+                wj    = np.where(j < self.n, decay ** j, 0.0)
+                num_f = num_f + self.gf[:, j] * wj
+                num_a = num_a + self.ga[:, j] * wj
+                den   = den + wj
+        if has.any():
+            num_f = np.where(has, self.state[0], num_f)
+            num_a = np.where(has, self.state[1], num_a)
+            den   = np.where(has, self.state[2], den)
+        safe       = np.where(den > 0, den, 1.0)
+        xg_for     = np.where(den > 0, num_f / safe, 0.0)
+        xg_against = np.where(den > 0, num_a / safe, 0.0)
+        with self._lock:
+            self.xg_for, self.xg_against = xg_for, xg_against
+        return xg_for, xg_against
+
+    def get(self, team_id):
+        """(xg_for, xg_against, confidence, gf, ga, updated_at) o None."""
+        i = self.row.get(team_id)
+        if i is None or self.xg_for is None:
+            return None
+        k = int(self.n[i])
+        return (float(self.xg_for[i]), float(self.xg_against[i]), self.confidence[i],
+                self.gf[i, :k].tolist(), self.ga[i, :k].tolist(),
+                datetime.fromisoformat(self.updated_at[i]) if self.updated_at[i] else None)
@@ -0,0 +1,152 @@
+# ============================================================
+# MÓDULO: XG STATE — xG decaído incremental por equipo
+# Versión: 1.0 | Compatible con main.py V5.13
+# ============================================================
+#
+# _weighted_avg rehacía los pesos decay**i y la suma completa cada
+# vez que cambiaba la serie; el ingest anteponía un resultado,
+# truncaba a 10 y recalculaba.
+#
+# XgState guarda por equipo los acumulados decaídos:
+#
+#   num_f = Σ w_i · gf_i      num_a = Σ w_i · ga_i      den = Σ w_i
+#   n     = partidos en el estado
+#   last_day = fecha del partido más reciente (YYYY-MM-DD)
+#
+# y xg_for = num_f / den, xg_against = num_a / den. Añadir un
+# resultado es O(1):
+#
+#   MODE "index" (por defecto, igual que _weighted_avg):
+#       w_i = decay**i con i = posición en la serie (0 = último) y
+#       ventana de SERIES_MAX partidos:
+#           num' = v + decay · (num − decay**(W−1) · v_saliente)
+#           den' = 1 + decay · (den − decay**(W−1))       (si n == W)
+#       El valor que sale de la ventana lo da la serie empaquetada
+#       (un byte, sin desempaquetar).
+#
+#   MODE "days": w = 0.5 ** (días hasta last_day / half_life), con
+#       la misma ventana de SERIES_MAX partidos que la serie guardada:
+#           num' = v + num · 0.5 ** (Δdías / half_life)
+#           num' −= w_saliente · v_saliente               (si n == W)
+#       Un resultado más antiguo que last_day entra con su peso sin
+#       reescalar lo que ya había.
+#
+# La serie sigue guardándose (xg_series.py): from_series() rehace
+# el estado cuando se reconstruye el equipo entero o cambia el
+# modo, la vida media o el decay (main.py guarda con qué parámetros
+# se calculó el estado en xg_state_params). En modo "index"
+# from_series suma en el mismo orden que _weighted_avg → mismo
+# resultado bit a bit; tras pushes sucesivos la diferencia queda en
+# el orden de 1e-15 (check_xg_state.py).
+# ============================================================
+
+from datetime import date
+
+SERIES_MAX     = 10
+MODES          = ("index", "days")
+HALF_LIFE_DAYS = 45.0
+
+
+def _days_between(a, b):
+    """Días de a a b ('YYYY-MM-DD'); 0 si falta alguno."""
+    if not a or not b:
+        return 0
+    try:
+        return (date.fromisoformat(b[:10]) - date.fromisoformat(a[:10])).days
+    except ValueError:
+        return 0
+
+
+class XgState:
+    __slots__ = ("num_f", "num_a", "den", "n", "last_day")
+
+    def __init__(self, num_f=0.0, num_a=0.0, den=0.0, n=0, last_day=None):
+        self.num_f    = num_f
+        self.num_a    = num_a
+        self.den      = den
+        self.n        = n
+        self.last_day = last_day
+
+    @classmethod
+    def from_row(cls, num_f, num_a, den, n, last_day):
+        if den is None:
+            return None
+        return cls(num_f, num_a, den, n or 0, last_day)
+
+    def as_row(self):
+        return self.num_f, self.num_a, self.den, self.n, self.last_day
+
+    @property
+    def xg_for(self):
+        return self.num_f / self.den if self.den > 0 else 0.0
+
+    @property
+    def xg_against(self):
+        return self.num_a / self.den if self.den > 0 else 0.0
+
+    # ── reconstrucción ───────────────────────────────────────
+    @classmethod
+    def from_series(cls, gf, ga, days=None, decay=0.85, mode="index",
+                    half_life=HALF_LIFE_DAYS):
+        """Estado de una serie completa (del más reciente al más antiguo)."""
+        days = list(days) if days is not None else [None] * len(gf)
+        last = max((d[:10] for d in days if d), default=None)
+        st   = cls(n=len(gf), last_day=last)
+        num_f = num_a = den = 0
+        for i, (f, a) in enumerate(zip(gf, ga)):
+            if mode == "days":
+                w = 0.5 ** (max(_days_between(days[i], last), 0) / half_life)
+            else:
+                w = decay ** i
+            num_f += f * w
+            num_a += a * w
+            den   += w
+        st.num_f, st.num_a, st.den = float(num_f), float(num_a), float(den)
+        return st
+
+    # ── actualización O(1) ───────────────────────────────────
+    def push(self, gf, ga, day=None, evicted=None, decay=0.85, mode="index",
+             window=SERIES_MAX, half_life=HALF_LIFE_DAYS):
+        """
+        Añade un resultado. evicted = (gf, ga, día) que sale de la ventana
+        (None si la serie aún no estaba llena); el día solo cuenta en
+        modo "days".
+        """
+        if mode == "days":
+            delta = _days_between(self.last_day, day)
+            if delta >= 0:
+                k = 0.5 ** (delta / half_life)
+                self.num_f = gf + self.num_f * k
+                self.num_a = ga + self.num_a * k
+                self.den   = 1.0 + self.den * k
+                if day:
+                    self.last_day = day[:10]
+            else:
+                # resultado atrasado: entra con su peso, el resto no cambia
+                w = 0.5 ** (-delta / half_life)
+                self.num_f += gf * w
+                self.num_a += ga * w
+                self.den   += w
+            if evicted is not None and self.n >= window:
+                e_day = evicted[2] if len(evicted) > 2 else None
+                w = 0.5 ** (max(_days_between(e_day, self.last_day), 0) / half_life)
+                self.num_f -= evicted[0] * w
+                self.num_a -= evicted[1] * w
+                self.den   -= w
+            else:
+                self.n += 1
+            return self
+
+        tail = decay ** (window - 1)
+        if evicted is not None and self.n >= window:
+            self.num_f -= tail * evicted[0]
+            self.num_a -= tail * evicted[1]
+            self.den   -= tail
+        else:
+            self.n += 1
+        self.num_f = gf + decay * self.num_f
+        self.num_a = ga + decay * self.num_a
+        self.den   = 1.0 + decay * self.den
+        if day and (not self.last_day or day[:10] > self.last_day):
+            self.last_day = day[:10]
+        return self